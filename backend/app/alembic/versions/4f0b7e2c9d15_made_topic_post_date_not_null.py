@@ -0,0 +1,31 @@
+"""Made topic.post_date NOT NULL
+
+Revision ID: 4f0b7e2c9d15
+Revises: e8c2d5a7f901
+Create Date: 2026-10-18 20:00:00.000000
+
+Keyset pagination orders by (post_date DESC, id DESC) and compares the
+row value (post_date, id) with the cursor. A NULL post_date sorts first
+under DESC, cannot be encoded in the cursor and never compares as less,
+so such rows broke paging. Every writer already sets post_date, and a
+missing one means today for the bulk import, so existing NULLs are
+backfilled with the current date.
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4f0b7e2c9d15"
+down_revision = "e8c2d5a7f901"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE topic SET post_date = CURRENT_DATE WHERE post_date IS NULL")
+    op.alter_column("topic", "post_date", existing_type=sa.Date(), nullable=False)
+
+
+def downgrade():
+    op.alter_column("topic", "post_date", existing_type=sa.Date(), nullable=True)
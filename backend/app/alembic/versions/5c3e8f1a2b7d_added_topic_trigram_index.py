@@ -0,0 +1,39 @@
+"""Added trigram index for topic search
+
+Revision ID: 5c3e8f1a2b7d
+Revises: 0a9d132df0a9
+Create Date: 2026-10-18 12:30:00.000000
+
+pg_trgm treats multibyte characters as word characters only when the
+database LC_CTYPE is a UTF-8 locale, so Japanese prompts are indexed
+as expected on a UTF-8 database. The index is skipped on other dialects,
+where app.db.search falls back to an in-process n-gram index.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c3e8f1a2b7d"
+down_revision = "0a9d132df0a9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_topic_topic_trgm",
+        "topic",
+        ["topic"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"topic": "gin_trgm_ops"},
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_topic_topic_trgm", table_name="topic")
@@ -0,0 +1,79 @@
+"""Added topic indexes for the topic_crud access patterns
+
+Revision ID: 7d41b2c9e6a3
+Revises: 5c3e8f1a2b7d
+Create Date: 2026-10-18 14:00:00.000000
+
+Listings never show hidden topics, so the indexes used by them are partial
+on is_visible. The predicates are written as the bare boolean columns so
+that the planner can match them against the WHERE clauses SQLAlchemy
+emits for filter(models.Topic.is_visible). contributor_id also gets a
+plain index, which serves get_all_topics_by_user and the foreign key check
+when a user is deleted.
+
+On PostgreSQL the indexes are built CONCURRENTLY so that writes to a large
+topic table are not blocked while the migration runs.
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7d41b2c9e6a3"
+down_revision = "5c3e8f1a2b7d"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_topic_contributor_id", ["contributor_id"], None),
+    (
+        "ix_topic_visible_contributor_id",
+        ["contributor_id", "is_adopted"],
+        "is_visible",
+    ),
+    (
+        "ix_topic_visible_adopted",
+        [sa.text("post_date DESC"), sa.text("id DESC")],
+        "is_visible AND is_adopted",
+    ),
+    (
+        "ix_topic_visible_post_date",
+        [sa.text("post_date DESC"), sa.text("id DESC")],
+        "is_visible",
+    ),
+]
+
+
+def _create_indexes(concurrently):
+    for name, columns, where in INDEXES:
+        predicate = None if where is None else sa.text(where)
+        op.create_index(
+            name,
+            "topic",
+            columns,
+            unique=False,
+            postgresql_where=predicate,
+            postgresql_concurrently=concurrently,
+            sqlite_where=predicate,
+        )
+
+
+def _drop_indexes(concurrently):
+    for name, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="topic", postgresql_concurrently=concurrently)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        _create_indexes(False)
+        return
+    with op.get_context().autocommit_block():
+        _create_indexes(True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        _drop_indexes(False)
+        return
+    with op.get_context().autocommit_block():
+        _drop_indexes(True)
@@ -0,0 +1,36 @@
+"""Added table_version table
+
+Revision ID: b3f6a0d4c18e
+Revises: 7d41b2c9e6a3
+Create Date: 2026-10-18 15:00:00.000000
+
+Holds one row per tracked table with a counter that topic_crud bumps in
+the same transaction as every write. The topic endpoints derive ETag and
+Last-Modified from it, so a conditional GET is a primary key lookup.
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b3f6a0d4c18e"
+down_revision = "7d41b2c9e6a3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_version = op.create_table(
+        "table_version",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.execute(
+        table_version.insert().values(name="topic", version=0, updated_at=sa.func.now())
+    )
+
+
+def downgrade():
+    op.drop_table("table_version")
@@ -0,0 +1,35 @@
+"""Added daily_topic table
+
+Revision ID: e8c2d5a7f901
+Revises: b3f6a0d4c18e
+Create Date: 2026-10-18 18:00:00.000000
+
+Stores the topics the daily selection job adopts for each day, so
+/api/v1/topics/today reads a handful of rows by primary key instead of
+scoring every candidate on each request.
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e8c2d5a7f901"
+down_revision = "b3f6a0d4c18e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "daily_topic",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("topic_id", sa.Integer(), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["topic_id"], ["topic.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "position"),
+    )
+
+
+def downgrade():
+    op.drop_table("daily_topic")
@@ -25,7 +25,7 @@ async def login(db=Depends(get_db), form_data: OAuth2PasswordRequestForm = Depen
     Returns:
         Dict: アクセストークン
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,7 +61,7 @@ async def signup(db=Depends(get_db), form_data: OAuth2PasswordRequestForm = Depe
     Returns:
         [type]: [description]
     """
-    user = sign_up_new_user(db, form_data.username, form_data.password)
+    user = await sign_up_new_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -0,0 +1,247 @@
+import os
+import shutil
+import typing as t
+import uuid
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.core import config
+from app.core.auth import get_current_active_superuser
+from app.core.celery_app import get_celery_app
+from app.core.task_files import task_file_path
+from app.db.export import CHUNK_SIZE
+from app.db.schemas.tasks import TaskAccepted, TaskStatus
+
+tasks_router = r = APIRouter()
+
+
+async def _enqueue(response: Response, name: str, **kwargs: t.Any) -> TaskAccepted:
+    """
+    _enqueue タスクを送り、状態を取得するURLを Location ヘッダーに入れる
+
+    Args:
+        response (Response): レスポンス
+        name (str): タスクの名前
+        **kwargs (Any): タスクに渡すキーワード引数
+
+    Returns:
+        TaskAccepted: 受け付けたジョブ
+    """
+    result = await run_in_threadpool(get_celery_app().send_task, name, kwargs=kwargs)
+    status_url = f"{config.API_V1_STR}/tasks/{result.id}"
+    response.headers["Location"] = status_url
+    return TaskAccepted(id=result.id, status_url=status_url)
+
+
+def _async_result(task_id: str) -> t.Any:
+    """
+    _async_result ジョブの結果を取得するオブジェクトを作る
+
+    Args:
+        task_id (str): ジョブのID
+
+    Returns:
+        Any: celery.result.AsyncResult
+    """
+    return get_celery_app().AsyncResult(task_id)
+
+
+def _task_status(task_id: str) -> TaskStatus:
+    """
+    _task_status 結果バックエンドからジョブの状態を取得する
+
+    Args:
+        task_id (str): ジョブのID
+
+    Returns:
+        TaskStatus: ジョブの状態
+    """
+    result = _async_result(task_id)
+    state = result.state
+    if state == "SUCCESS":
+        return TaskStatus(id=task_id, status=state, result=result.result)
+    if state == "FAILURE":
+        return TaskStatus(id=task_id, status=state, error=repr(result.result))
+    return TaskStatus(id=task_id, status=state)
+
+
+@r.post(
+    "/tasks/topics-import",
+    response_model=TaskAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def topics_import_job(
+    response: Response,
+    file: UploadFile = File(...),
+    import_format: t.Optional[str] = Query(
+        None, alias="format", regex="^(ndjson|csv)$"
+    ),
+    batch_size: int = Query(config.IMPORT_BATCH_SIZE, ge=1, le=10000),
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    topics_import_job お題の一括登録をバックグラウンドで行う。管理者のみ。
+
+    ファイルを config.TASK_FILE_DIR に保存してすぐに 202 を返す。
+    結果は Location ヘッダーのURLで取得する。
+
+    Args:
+        response (Response): レスポンス
+        file (UploadFile): 登録するお題のファイル
+        import_format (Optional[str], optional):
+            ndjson か csv。初期値はNone（ファイル名の拡張子で判断し、分からなければ ndjson）。
+        batch_size (int, optional): まとめて登録する件数。初期値は config.IMPORT_BATCH_SIZE。
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        TaskAccepted: 受け付けたジョブ
+    """
+    file_format = import_format or (
+        "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+    )
+    path = task_file_path("imports", f"{uuid.uuid4().hex}.{file_format}")
+
+    def save() -> None:
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file.file, out)
+
+    await run_in_threadpool(save)
+    return await _enqueue(
+        response,
+        "app.tasks.import_topics_task",
+        path=path,
+        file_format=file_format,
+        contributor_id=current_user.id,
+        batch_size=batch_size,
+    )
+
+
+@r.post(
+    "/tasks/topics-export",
+    response_model=TaskAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def topics_export_job(
+    response: Response,
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    compress: bool = False,
+    include_hidden: bool = True,
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    topics_export_job 全てのお題のファイルへの書き出しをバックグラウンドで行う。管理者のみ。
+
+    書き出したファイルは /tasks/{task_id}/file から取得する。
+
+    Args:
+        response (Response): レスポンス
+        export_format (str, optional): ndjson か csv。初期値は ndjson。
+        compress (bool, optional): gzip で圧縮するか。初期値は False。
+        include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は True。
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        TaskAccepted: 受け付けたジョブ
+    """
+    return await _enqueue(
+        response,
+        "app.tasks.export_topics_task",
+        file_format=export_format,
+        compress=compress,
+        include_hidden=include_hidden,
+    )
+
+
+@r.post(
+    "/tasks/search-index-rebuild",
+    response_model=TaskAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def search_index_rebuild_job(
+    response: Response,
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    search_index_rebuild_job お題検索用の索引の作り直しをバックグラウンドで行う。管理者のみ。
+
+    Args:
+        response (Response): レスポンス
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        TaskAccepted: 受け付けたジョブ
+    """
+    return await _enqueue(response, "app.tasks.rebuild_search_index_task")
+
+
+@r.get("/tasks/{task_id}", response_model=TaskStatus, response_model_exclude_none=True)
+async def task_status(
+    task_id: str,
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    task_status バックグラウンドジョブの状態を取得する。管理者のみ。
+
+    Args:
+        task_id (str): ジョブのID
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        TaskStatus: ジョブの状態
+    """
+    return await run_in_threadpool(_task_status, task_id)
+
+
+@r.get("/tasks/{task_id}/file")
+async def task_file(
+    task_id: str,
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    task_file 書き出しジョブが作ったファイルを取得する。管理者のみ。
+
+    Args:
+        task_id (str): ジョブのID
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Raises:
+        HTTPException: ジョブが終わっていないかファイルが無い旨の HTTP 404 エラー
+
+    Returns:
+        StreamingResponse: 書き出したファイル
+    """
+    job = await run_in_threadpool(_task_status, task_id)
+    filename = job.result.get("file") if isinstance(job.result, dict) else None
+    if filename is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="File not found")
+    path = task_file_path("exports", filename)
+    if not os.path.exists(path):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    def read_chunks() -> t.Iterator[bytes]:
+        with open(path, "rb") as file:
+            yield from iter(lambda: file.read(CHUNK_SIZE), b"")
+
+    return StreamingResponse(
+        read_chunks(),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": f'attachment; filename="{os.path.basename(path)}"'
+        },
+    )
@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.api_v1.routers import tasks as tasks_routes
+from app.core import config
+from app.core.celery_app import celery_app
+
+
+@pytest.fixture
+def sent_tasks(monkeypatch, tmp_path):
+    """
+    sent_tasks ブローカーに送る代わりに送ったタスクを記録する
+
+    Args:
+        monkeypatch (Any): モンキーパッチ
+        tmp_path (Any): 一時ディレクトリ
+
+    Returns:
+        list: 送ったタスクの名前とキーワード引数の組
+    """
+    sent = []
+
+    def send_task(name, kwargs=None):
+        sent.append((name, kwargs))
+        return SimpleNamespace(id=f"job-{len(sent)}")
+
+    monkeypatch.setattr(celery_app, "send_task", send_task)
+    monkeypatch.setattr(config, "TASK_FILE_DIR", str(tmp_path))
+    return sent
+
+
+def test_export_job_is_accepted(
+    client, sent_tasks, superuser_token_headers, user_token_headers
+):
+    """
+    test_export_job_is_accepted 書き出しジョブを受け付けて 202 を返すかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        sent_tasks (Any): 送ったタスク
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+        user_token_headers (Any): テスト用一般ユーザーの認証用JWTトークンヘッダー
+    """
+    response = client.post(
+        "/api/v1/tasks/topics-export",
+        params={"format": "csv", "compress": True},
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 202
+    assert response.json() == {"id": "job-1", "status_url": "/api/v1/tasks/job-1"}
+    assert response.headers["Location"] == "/api/v1/tasks/job-1"
+    assert sent_tasks == [
+        (
+            "app.tasks.export_topics_task",
+            {"file_format": "csv", "compress": True, "include_hidden": True},
+        )
+    ]
+
+    response = client.post("/api/v1/tasks/topics-export", headers=user_token_headers)
+    assert response.status_code == 403
+
+
+def test_import_job_saves_file(
+    client, sent_tasks, test_superuser, superuser_token_headers
+):
+    """
+    test_import_job_saves_file 一括登録ジョブがファイルを保存してから送られるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        sent_tasks (Any): 送ったタスク
+        test_superuser (Any): テスト用管理者ユーザー
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+    """
+    response = client.post(
+        "/api/v1/tasks/topics-import",
+        files={"file": ("topics.csv", b"topic\na\n")},
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 202
+    name, kwargs = sent_tasks[0]
+    assert name == "app.tasks.import_topics_task"
+    assert kwargs["file_format"] == "csv"
+    assert kwargs["contributor_id"] == test_superuser.id
+    with open(kwargs["path"], "rb") as file:
+        assert file.read() == b"topic\na\n"
+
+
+def test_task_status(client, sent_tasks, superuser_token_headers, monkeypatch):
+    """
+    test_task_status ジョブの状態と、書き出したファイルを取得できるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        sent_tasks (Any): 送ったタスク
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+        monkeypatch (Any): モンキーパッチ
+    """
+    states = {
+        "running": ("STARTED", None),
+        "done": ("SUCCESS", {"file": "done.ndjson", "bytes": 3}),
+        "broken": ("FAILURE", ValueError("boom")),
+    }
+
+    class FakeResult:
+        def __init__(self, task_id):
+            self.state, self.result = states.get(task_id, ("PENDING", None))
+
+    monkeypatch.setattr(tasks_routes, "_async_result", FakeResult)
+    with open(tasks_routes.task_file_path("exports", "done.ndjson"), "wb") as file:
+        file.write(b"{}\n")
+
+    response = client.get("/api/v1/tasks/running", headers=superuser_token_headers)
+    assert response.json() == {"id": "running", "status": "STARTED"}
+    response = client.get("/api/v1/tasks/done", headers=superuser_token_headers)
+    assert response.json()["result"] == {"file": "done.ndjson", "bytes": 3}
+    response = client.get("/api/v1/tasks/broken", headers=superuser_token_headers)
+    assert response.json()["status"] == "FAILURE"
+    assert "boom" in response.json()["error"]
+
+    response = client.get("/api/v1/tasks/done/file", headers=superuser_token_headers)
+    assert response.status_code == 200
+    assert response.content == b"{}\n"
+    response = client.get("/api/v1/tasks/running/file", headers=superuser_token_headers)
+    assert response.status_code == 404
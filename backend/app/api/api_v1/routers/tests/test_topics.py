@@ -1,4 +1,16 @@
-from app.db import models
+import csv
+import gzip
+import io
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app.core import config
+from app.db import models, topic_pool
+from app.db.crud.daily_topic_crud import select_daily_topics
 
 
 def test_get_topics(client, test_topic, user_token_headers):
@@ -25,6 +37,460 @@ def test_get_topics(client, test_topic, user_token_headers):
     ]
 
 
+def test_get_topics_paginated(client, test_db, test_user):
+    """
+    test_get_topics_paginated お題一覧をカーソルで順にたどれるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+    """
+    for day in range(1, 6):
+        test_db.add(
+            models.Topic(
+                topic=f"お題{day}",
+                post_date=date(2020, 1, day),
+                is_visible=True,
+                contributor_id=test_user.id,
+            )
+        )
+    test_db.commit()
+
+    response = client.get("/api/v1/topics", params={"limit": 2})
+    assert response.status_code == 200
+    assert [t["topic"] for t in response.json()] == ["お題5", "お題4"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/v1/topics", params={"limit": 2, "cursor": cursor})
+    assert [t["topic"] for t in response.json()] == ["お題3", "お題2"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/v1/topics", params={"limit": 2, "cursor": cursor})
+    assert [t["topic"] for t in response.json()] == ["お題1"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_topics_paginated_within_same_date(client, test_db, test_user):
+    """
+    test_get_topics_paginated_within_same_date 同じ投稿日のお題をIDでたどれるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+    """
+    topics = [
+        models.Topic(
+            topic=f"お題{i}",
+            post_date=date(2020, 1, 1),
+            is_visible=True,
+            contributor_id=test_user.id,
+        )
+        for i in range(3)
+    ]
+    test_db.add_all(topics)
+    test_db.commit()
+
+    seen = []
+    params = {"limit": 1}
+    while True:
+        response = client.get("/api/v1/topics", params=params)
+        seen += [t["id"] for t in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == sorted((topic.id for topic in topics), reverse=True)
+
+
+def test_topic_without_post_date_is_rejected(test_db, test_user):
+    """
+    test_topic_without_post_date_is_rejected
+    カーソルにできない投稿日の無いお題を登録できないかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+    """
+    test_db.add(models.Topic(topic="日付なし", post_date=None, contributor_id=test_user.id))
+    with pytest.raises(IntegrityError):
+        test_db.flush()
+    test_db.rollback()
+
+
+def test_get_topics_invalid_cursor(client):
+    """
+    test_get_topics_invalid_cursor 不正なカーソルを渡したときのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+    """
+    response = client.get("/api/v1/topics", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_get_topics_with_contributor_query_count(client, test_db):
+    """
+    test_get_topics_with_contributor_query_count 投稿者付きお題一覧のクエリ数が件数に依らないかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+    """
+
+    def add_topics(start: int, stop: int) -> None:
+        for i in range(start, stop):
+            user = models.User(
+                email=f"contributor{i}@email.com", hashed_password="x", is_active=True
+            )
+            test_db.add(user)
+            test_db.flush()
+            test_db.add(
+                models.Topic(
+                    topic=f"お題{i}",
+                    post_date=date(2020, 1, 1),
+                    is_visible=True,
+                    contributor_id=user.id,
+                )
+            )
+        test_db.commit()
+        test_db.expunge_all()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def query_count() -> int:
+        statements.clear()
+        event.listen(test_db.get_bind(), "before_cursor_execute", count)
+        try:
+            response = client.get("/api/v1/topics/with-contributor")
+        finally:
+            event.remove(test_db.get_bind(), "before_cursor_execute", count)
+        assert response.status_code == 200
+        assert all(t["contributor"]["id"] for t in response.json())
+        return len(statements)
+
+    add_topics(0, 2)
+    few = query_count()
+    add_topics(2, 12)
+    assert query_count() == few
+
+
+def test_get_topics_with_contributor_hides_private_fields(client, test_db, test_topic):
+    """
+    test_get_topics_with_contributor_hides_private_fields
+    認証の無い投稿者付きお題一覧にメールアドレスや権限が載らないかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    test_topic.contributor.first_name = "太郎"
+    test_db.commit()
+
+    response = client.get("/api/v1/topics/with-contributor")
+    assert response.status_code == 200
+    [topic] = response.json()
+    assert topic["contributor"] == {"id": test_topic.contributor_id, "first_name": "太郎"}
+    assert "email" not in response.text
+
+
+def test_search_topics(client, test_db, test_user):
+    """
+    test_search_topics キーワードでお題を検索するテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+    """
+    for body, visible in [
+        ("猫の写真", True),
+        ("猫と犬のいる休日の写真", True),
+        ("犬の写真", True),
+        ("猫の絵", False),
+    ]:
+        test_db.add(
+            models.Topic(
+                topic=body,
+                post_date=date(2020, 1, 1),
+                is_visible=visible,
+                contributor_id=test_user.id,
+            )
+        )
+    test_db.commit()
+
+    response = client.get("/api/v1/topics/search", params={"q": "猫"})
+    assert response.status_code == 200
+    assert [t["topic"] for t in response.json()] == ["猫の写真", "猫と犬のいる休日の写真"]
+
+    response = client.get("/api/v1/topics/search", params={"q": "猫", "skip": 1})
+    assert [t["topic"] for t in response.json()] == ["猫と犬のいる休日の写真"]
+
+    response = client.get("/api/v1/topics/search", params={"q": "100%"})
+    assert response.json() == []
+
+
+def test_random_topic(client, test_db, test_user, test_superuser, monkeypatch):
+    """
+    test_random_topic 条件を指定してお題を無作為に取得するテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+        test_superuser (Any): テスト用管理者
+        monkeypatch (Any): 他のテストで読み込まれたプールを捨てる。
+    """
+    monkeypatch.setattr(topic_pool, "_pool", None)
+    # テスト用DBのデータは別のセッションからは見えないので、途中で読み込み直させない
+    monkeypatch.setattr(config, "TOPIC_POOL_CHECK_INTERVAL", 3600)
+    for day, adopted, user in [
+        (1, False, test_user),
+        (2, True, test_user),
+        (3, False, test_superuser),
+    ]:
+        test_db.add(
+            models.Topic(
+                topic=f"お題{day}",
+                post_date=date(2020, 1, day),
+                is_visible=True,
+                is_adopted=adopted,
+                contributor_id=user.id,
+            )
+        )
+    test_db.add(
+        models.Topic(
+            topic="削除済みのお題",
+            post_date=date(2020, 1, 4),
+            is_visible=False,
+            contributor_id=test_user.id,
+        )
+    )
+    test_db.commit()
+
+    response = client.get("/api/v1/topics/random")
+    assert response.status_code == 200
+    assert response.json()["topic"] in {"お題1", "お題2", "お題3"}
+
+    response = client.get("/api/v1/topics/random", params={"adopted": True})
+    assert response.json()["topic"] == "お題2"
+
+    response = client.get(
+        "/api/v1/topics/random",
+        params={"contributor_id": test_user.id, "adopted": False},
+    )
+    assert response.json()["topic"] == "お題1"
+
+    response = client.get(
+        "/api/v1/topics/random", params={"since": "2020-01-03", "until": "2020-01-04"}
+    )
+    assert response.json()["topic"] == "お題3"
+
+    response = client.get("/api/v1/topics/random", params={"since": "2020-01-04"})
+    assert response.status_code == 404
+
+
+def test_export_topics(
+    client, test_db, test_user, superuser_token_headers, user_token_headers
+):
+    """
+    test_export_topics 全てのお題を NDJSON・CSV・gzip で書き出せるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+        user_token_headers (Any): テスト用一般ユーザーの認証用JWTトークンヘッダー
+    """
+    for i, is_visible in enumerate([True, True, False]):
+        test_db.add(
+            models.Topic(
+                topic=f"お題,{i}",
+                post_date=date(2020, 1, i + 1),
+                is_visible=is_visible,
+                contributor_id=test_user.id,
+            )
+        )
+    test_db.commit()
+    url = "/api/v1/topics/export"
+
+    response = client.get(url, headers=superuser_token_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["topic"] for row in rows] == ["お題,0", "お題,1", "お題,2"]
+    assert rows[0]["post_date"] == "2020-01-01"
+    assert rows[0]["contributor_id"] == test_user.id
+
+    response = client.get(
+        url, params={"format": "csv"}, headers=superuser_token_headers
+    )
+    assert [row["topic"] for row in csv.DictReader(io.StringIO(response.text))] == [
+        "お題,0",
+        "お題,1",
+        "お題,2",
+    ]
+
+    response = client.get(
+        url,
+        params={"compress": True, "include_hidden": False},
+        headers=superuser_token_headers,
+    )
+    assert response.headers["content-disposition"].endswith('topics.ndjson.gz"')
+    lines = gzip.decompress(response.content).decode("utf-8").splitlines()
+    assert [json.loads(line)["topic"] for line in lines] == ["お題,0", "お題,1"]
+
+    response = client.get(url, headers=user_token_headers)
+    assert response.status_code == 403
+
+
+def test_import_topics(
+    client, test_db, test_superuser, superuser_token_headers, user_token_headers
+):
+    """
+    test_import_topics お題を一括登録し、失敗した行だけを報告するかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_superuser (Any): テスト用管理者ユーザー
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+        user_token_headers (Any): テスト用一般ユーザーの認証用JWTトークンヘッダー
+    """
+    lines = [
+        {"topic": "一括1", "post_date": "2020-01-01"},
+        "{not json",
+        {"picture_url": "https://example.com/a.png"},
+        {"topic": "一括2", "contributor_id": test_superuser.id + 1000},
+        {"topic": "一括3", "picture_url": "https://example.com/b.png"},
+    ]
+    body = "\n".join(
+        line if isinstance(line, str) else json.dumps(line) for line in lines
+    )
+    url = "/api/v1/topics/import"
+
+    response = client.post(
+        url,
+        params={"batch_size": 2},
+        files={"file": ("topics.ndjson", body.encode("utf-8"))},
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["inserted"] == 2
+    assert result["failed"] == 3
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4]
+    assert "topic" in result["errors"][1]["message"]
+
+    topics = test_db.query(models.Topic).order_by(models.Topic.id).all()
+    assert [topic.topic for topic in topics] == ["一括1", "一括3"]
+    assert topics[0].post_date == date(2020, 1, 1)
+    assert topics[1].post_date == date.today()
+    assert topics[1].contributor_id == test_superuser.id
+    assert topics[1].picture_url == "https://example.com/b.png"
+
+    csv_body = 'topic,is_adopted\n"改行\nあり",true\n'
+    response = client.post(
+        url,
+        files={"file": ("topics.csv", csv_body.encode("utf-8"))},
+        headers=superuser_token_headers,
+    )
+    assert response.json()["inserted"] == 1
+    topic = test_db.query(models.Topic).filter(models.Topic.is_adopted).one()
+    assert topic.topic == "改行\nあり"
+
+    response = client.post(
+        url,
+        files={"file": ("topics.ndjson", body.encode("utf-8"))},
+        headers=user_token_headers,
+    )
+    assert response.status_code == 403
+
+
+def test_topics_conditional_get(client, test_db, test_topic, user_token_headers):
+    """
+    test_topics_conditional_get 更新が無ければお題を読まずに 304 を返すかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+        user_token_headers (Any): テスト用一般ユーザーの認証用JWTトークンヘッダー
+    """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    response = client.get("/api/v1/topics")
+    etag = response.headers["ETag"]
+
+    event.listen(test_db.get_bind(), "before_cursor_execute", count)
+    try:
+        response = client.get("/api/v1/topics", headers={"If-None-Match": etag})
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", count)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert len(statements) == 1
+    assert "table_version" in statements[0]
+
+    response = client.delete(
+        f"/api/v1/topics/{test_topic.id}", headers=user_token_headers
+    )
+    response = client.get("/api/v1/topics", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    last_modified = response.headers["Last-Modified"]
+    response = client.get(
+        f"/api/v1/topics/{test_topic.id}",
+        headers={"If-Modified-Since": last_modified},
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] != etag
+
+    response = client.get(
+        f"/api/v1/topics/{test_topic.id + 1}",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 404
+
+
+def test_topics_response_cache(client, test_topic, user_token_headers):
+    """
+    test_topics_response_cache お題一覧と詳細がキャッシュされ、削除で捨てられるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_topic (Any): テスト用お題
+        user_token_headers (Any): テスト用一般ユーザーの認証用JWTトークンヘッダー
+    """
+    for url in ("/api/v1/topics", f"/api/v1/topics/{test_topic.id}"):
+        first = client.get(url)
+        assert first.headers["X-Cache"] == "MISS"
+        second = client.get(url)
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+
+    response = client.delete(
+        f"/api/v1/topics/{test_topic.id}", headers=user_token_headers
+    )
+    assert response.status_code == 200
+
+    response = client.get("/api/v1/topics")
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json() == []
+    response = client.get(f"/api/v1/topics/{test_topic.id}")
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()["is_visible"] is False
+
+
 def test_delete_topic(client, test_topic, test_db, user_token_headers):
     """
     test_delete_topic お題の作成者がお題を削除するテスト
@@ -118,3 +584,28 @@ def test_delete_topic_is_not_found(client, test_db, superuser_token_headers):
     response = client.delete("/api/v1/topics/9999", headers=superuser_token_headers)
     assert response.status_code == 404
     assert test_db.query(models.Topic).filter(models.Topic.id == 9999).first() is None
+
+
+def test_topics_today(client, test_db, test_topic):
+    """
+    test_topics_today その日の採用お題を取得でき、2回目はキャッシュから返すかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    response = client.get("/api/v1/topics/today")
+    assert response.status_code == 404
+
+    select_daily_topics(test_db, date.today())
+
+    response = client.get("/api/v1/topics/today")
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()["day"] == date.today().isoformat()
+    assert [topic["id"] for topic in response.json()["topics"]] == [test_topic.id]
+    assert response.json()["topics"][0]["is_adopted"] is True
+
+    response = client.get("/api/v1/topics/today")
+    assert response.headers["X-Cache"] == "HIT"
@@ -22,6 +22,66 @@ def test_get_users(client, test_superuser, superuser_token_headers):
     ]
 
 
+def test_get_users_paging(client, test_db, test_superuser, superuser_token_headers):
+    """
+    test_get_users_paging ユーザーの一覧を範囲・並び順・条件を指定して取得するテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_superuser (Any): テスト用管理者
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+    """
+    for i in range(5):
+        test_db.add(
+            models.User(
+                email=f"user{i}@example.com", hashed_password="x", is_active=i % 2 == 0
+            )
+        )
+    test_db.commit()
+
+    response = client.get(
+        "/api/v1/users",
+        params={"range": "[1, 2]", "sort": '["email", "DESC"]'},
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    assert [user["email"] for user in response.json()] == [
+        "user3@example.com",
+        "user2@example.com",
+    ]
+    assert response.headers["Content-Range"] == "users 1-2/6"
+
+    response = client.get(
+        "/api/v1/users",
+        params={"filter": '{"q": "user", "is_active": false}', "limit": 1},
+        headers=superuser_token_headers,
+    )
+    assert [user["email"] for user in response.json()] == ["user1@example.com"]
+    assert response.headers["Content-Range"] == "users 0-0/2"
+
+    response = client.get(
+        "/api/v1/users",
+        params={"filter": '{"q": "nobody"}'},
+        headers=superuser_token_headers,
+    )
+    assert response.json() == []
+    assert response.headers["Content-Range"] == "users */0"
+
+    for params in (
+        {"sort": "hashed_password"},
+        {"filter": '{"password": "x"}'},
+        {"filter": '{"is_active": "false"}'},
+        {"filter": '{"id": "abc"}'},
+        {"filter": '{"id": [1, "2"]}'},
+        {"filter": '{"email": 1}'},
+    ):
+        response = client.get(
+            "/api/v1/users", params=params, headers=superuser_token_headers
+        )
+        assert response.status_code == 400
+
+
 def test_delete_user(client, test_superuser, test_db, superuser_token_headers):
     """
     test_delete_user ユーザーを削除するテスト
@@ -80,6 +140,37 @@ def test_edit_user(client, test_superuser, superuser_token_headers):
     assert response.json() == new_user
 
 
+def test_edit_user_invalidates_token_cache(
+    client, test_superuser, superuser_token_headers
+):
+    """
+    test_edit_user_invalidates_token_cache
+    ユーザーを編集すると、キャッシュされた認証情報が捨てられるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_superuser (Any): テスト用管理者
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+    """
+    response = client.get("/api/v1/users", headers=superuser_token_headers)
+    assert response.status_code == 200
+
+    response = client.put(
+        f"/api/v1/users/{test_superuser.id}",
+        json={
+            "email": test_superuser.email,
+            "is_active": True,
+            "is_superuser": False,
+            "password": "new_password",
+        },
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+
+    response = client.get("/api/v1/users", headers=superuser_token_headers)
+    assert response.status_code == 403
+
+
 def test_edit_user_not_found(client, superuser_token_headers):
     """
     test_edit_user_not_found 編集するユーザーが見当たらない場合のテスト
@@ -1,17 +1,46 @@
 import typing as t
+from datetime import date
 
-from fastapi import APIRouter, Depends, Request, Response
+from fastapi import APIRouter, Depends, File, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
-from app.core.auth import get_current_active_user
+from app.core import config
+from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.fast_json import FastJSONResponse
+from app.core.pagination import decode_cursor, split_page
+from app.core.response_cache import TOPICS_TAG, cache_key, get_response_cache, topic_tag
+from app.db.bulk_import import decode_lines, import_topics
 from app.db.crud.topic_crud import (
-    create_topic,
-    drop_topic,
-    edit_topic,
-    get_topic,
-    get_topics,
+    EXPORT_COLUMNS,
+    create_topic_async,
+    drop_topic_async,
+    edit_topic_async,
+    get_random_topic_async,
+    get_topics_async,
+    iter_all_topics,
+)
+from app.db.export import csv_chunks, gzip_chunks, ndjson_chunks
+from app.db.schemas.topics import (
+    DailyTopics,
+    Topic,
+    TopicCreate,
+    TopicEdit,
+    TopicImportResult,
+    TopicOut,
+)
+from app.db.search import search_topics_async
+from app.db.session import get_db, get_streaming_db, run_sync
+from app.db.topic_cache import (
+    daily_topics_key,
+    get_topic_detail_validators,
+    get_topic_validators_async,
+    render_daily_topics,
+    render_topic,
+    render_topics_page,
+    serialize_topic,
+    serialize_topic_out,
 )
-from app.db.schemas.topics import Topic, TopicCreate, TopicEdit
-from app.db.session import get_db
 
 topics_router = r = APIRouter()
 
@@ -21,19 +50,251 @@ topics_router = r = APIRouter()
     response_model=t.List[Topic],
     response_model_exclude_none=True,
 )
-async def topics_list(response: Response, db=Depends(get_db)):
+async def topics_list(
+    request: Request,
+    cursor: t.Optional[str] = None,
+    limit: int = Query(config.TOPICS_PAGE_SIZE, ge=1, le=config.TOPICS_MAX_PAGE_SIZE),
+    db=Depends(get_db),
+):
     """
     topics_list GETでリクエストを送るとお題リストを取得する。
 
+    お題は投稿日の新しい順に最大 limit 件返す。続きがある場合は
+    X-Next-Cursor ヘッダーにカーソルを入れるので、次のリクエストの
+    cursor に渡すと続きのページを取得できる。
+
+    レスポンスはキャッシュし、お題が作成・編集・削除されると捨てる。
+    ETag と Last-Modified を返し、条件付きGETでお題が更新されていなければ
+    お題を読まずに 304 を返す。
+
     Args:
-        response (Response): レスポンス
+        request (Request): リクエスト
+        cursor (Optional[str], optional): 前のページで返されたカーソル。初期値はNone。
+        limit (int, optional): 1ページの最大件数。初期値は config.TOPICS_PAGE_SIZE。
         db (Any, optional): DB接続。初期値はDepends(get_db)。
 
     Returns:
         Any: 現在見える状態のお題のリスト
     """
-    topics = get_topics(db)
-    return topics
+    cache = get_response_cache()
+    generation = cache.generation
+    validators = await get_topic_validators_async(db)
+    if validators.is_not_modified(request):
+        return validators.not_modified()
+    key = f"{cache_key(request)}#{validators.etag}"
+    cached = await cache.get_async(key)
+    if cached is not None:
+        return cached.to_response(hit=True)
+    rendered = await run_sync(
+        db, render_topics_page, limit, decode_cursor(cursor), validators
+    )
+    await cache.set_async(key, rendered, [TOPICS_TAG], generation)
+    return rendered.to_response(hit=False)
+
+
+@r.get(
+    "/topics/with-contributor",
+    response_model=t.List[TopicOut],
+    response_model_exclude_none=True,
+    response_class=FastJSONResponse,
+)
+async def topics_list_with_contributor(
+    cursor: t.Optional[str] = None,
+    limit: int = Query(config.TOPICS_PAGE_SIZE, ge=1, le=config.TOPICS_MAX_PAGE_SIZE),
+    db=Depends(get_db),
+):
+    """
+    topics_list_with_contributor GETでリクエストを送ると投稿者付きのお題リストを取得する。
+
+    ページングは topics_list と同じ。投稿者はお題と同じクエリで読み込むので、
+    件数が増えても発行される SELECT の数は変わらない。
+    お題は pydantic のモデルを通さずに直接 dict にして返す。
+
+    Args:
+        cursor (Optional[str], optional): 前のページで返されたカーソル。初期値はNone。
+        limit (int, optional): 1ページの最大件数。初期値は config.TOPICS_PAGE_SIZE。
+        db (Any, optional): DB接続。初期値はDepends(get_db)。
+
+    Returns:
+        Any: 現在見える状態のお題と投稿者のリスト
+    """
+    topics = await get_topics_async(
+        db, limit=limit + 1, after=decode_cursor(cursor), with_contributor=True
+    )
+    page, next_cursor = split_page(topics, limit)
+    headers = {} if next_cursor is None else {"X-Next-Cursor": next_cursor}
+    return FastJSONResponse(serialize_topic_out.many(page), headers=headers)
+
+
+@r.get(
+    "/topics/search",
+    response_model=t.List[Topic],
+    response_model_exclude_none=True,
+    response_class=FastJSONResponse,
+)
+async def topics_search(
+    q: str = Query(..., min_length=1),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(config.TOPICS_PAGE_SIZE, ge=1, le=config.TOPICS_MAX_PAGE_SIZE),
+    db=Depends(get_db),
+):
+    """
+    topics_search GETでリクエストを送るとキーワードを含むお題を関連度の高い順に取得する。
+
+    Args:
+        q (str): キーワード
+        skip (int, optional): スキップする件数。初期値は0。
+        limit (int, optional): 1ページの最大件数。初期値は config.TOPICS_PAGE_SIZE。
+        db (Any, optional): DB接続。初期値はDepends(get_db)。
+
+    Returns:
+        Any: キーワードを含む見える状態のお題のリスト
+    """
+    topics = await search_topics_async(db, q, skip=skip, limit=limit)
+    return FastJSONResponse(serialize_topic.many(topics))
+
+
+@r.get("/topics/export")
+def topics_export(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    compress: bool = False,
+    include_hidden: bool = True,
+    db=Depends(get_streaming_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    topics_export GETでリクエストを送ると全てのお題を NDJSON か CSV で書き出す。管理者のみ。
+
+    お題はサーバーサイドカーソルから少しずつ読みながら送るので、件数に依らず
+    メモリ使用量は一定。
+
+    Args:
+        export_format (str, optional): ndjson か csv。初期値は ndjson。
+        compress (bool, optional): gzip で圧縮するか。初期値は False。
+        include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は True。
+        db (Any, optional): DB接続。初期値はDepends(get_streaming_db)。
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        StreamingResponse: お題を書き出したファイル
+    """
+    columns = [column.key for column in EXPORT_COLUMNS]
+    rows = iter_all_topics(db, include_hidden, config.EXPORT_BATCH_SIZE)
+    if export_format == "csv":
+        chunks, media_type = csv_chunks(columns, rows), "text/csv"
+    else:
+        chunks, media_type = ndjson_chunks(columns, rows), "application/x-ndjson"
+    filename = f"topics.{export_format}"
+    if compress:
+        chunks, media_type = gzip_chunks(chunks), "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@r.post("/topics/import", response_model=TopicImportResult)
+async def topics_import(
+    file: UploadFile = File(...),
+    import_format: t.Optional[str] = Query(
+        None, alias="format", regex="^(ndjson|csv)$"
+    ),
+    batch_size: int = Query(config.IMPORT_BATCH_SIZE, ge=1, le=10000),
+    db=Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    """
+    topics_import NDJSON か CSV のファイルをPOSTで送るとお題を一括登録する。管理者のみ。
+
+    行ごとに TopicCreate で検証し、batch_size 件ずつまとめて登録する。
+    検証や登録に失敗した行は飛ばして、行番号と理由を返す。UTF-8 として正しくない行も
+    同じく失敗した行として返す。
+    post_date が無い行は今日、contributor_id が無い行は現在のユーザーの投稿とする。
+
+    Args:
+        file (UploadFile): 登録するお題のファイル
+        import_format (Optional[str], optional):
+            ndjson か csv。初期値はNone（ファイル名の拡張子で判断し、分からなければ ndjson）。
+        batch_size (int, optional): まとめて登録する件数。初期値は config.IMPORT_BATCH_SIZE。
+        db (Any, optional): DB接続。初期値はDepends(get_db)。
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        TopicImportResult: 一括登録の結果
+    """
+    file_format = import_format or (
+        "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+    )
+    return await run_in_threadpool(
+        import_topics,
+        getattr(db, "sync_session", db),
+        decode_lines(file.file),
+        file_format,
+        current_user.id,
+        batch_size,
+    )
+
+
+@r.get(
+    "/topics/random",
+    response_model=Topic,
+    response_model_exclude_none=True,
+)
+async def topic_random(
+    adopted: t.Optional[bool] = None,
+    contributor_id: t.Optional[int] = None,
+    since: t.Optional[date] = None,
+    until: t.Optional[date] = None,
+    db=Depends(get_db),
+):
+    """
+    topic_random GETでリクエストを送ると条件に合うお題を1つ無作為に取得する（お題ガチャ）。
+
+    Args:
+        adopted (Optional[bool], optional): 採用済みかで絞り込む。初期値はNone。
+        contributor_id (Optional[int], optional): 投稿者のIDで絞り込む。初期値はNone。
+        since (Optional[date], optional): この日以降の投稿に絞り込む。初期値はNone。
+        until (Optional[date], optional): この日以前の投稿に絞り込む。初期値はNone。
+        db (Any, optional): DB接続。初期値はDepends(get_db)。
+
+    Returns:
+        Any: 無作為に選ばれたお題
+    """
+    return await get_random_topic_async(db, adopted, contributor_id, since, until)
+
+
+@r.get(
+    "/topics/today",
+    response_model=DailyTopics,
+    response_model_exclude_none=True,
+)
+async def topics_today(db=Depends(get_db)):
+    """
+    topics_today GETでリクエストを送るとその日の採用お題を取得する。
+
+    採用お題は毎日のバッチで選んで daily_topic に保存してあり、ここでは選ばない。
+    レスポンスは日付をキーにキャッシュするので、キャッシュにあればDBを読まない。
+    その日の分がまだ選ばれていない場合は、直近の日の分を返す。
+
+    Args:
+        db (Any, optional): DB接続。初期値はDepends(get_db)。
+
+    Returns:
+        Any: 選ばれた日と採用お題のリスト
+    """
+    key = daily_topics_key(date.today())
+    cache = get_response_cache()
+    generation = cache.generation
+    cached = await cache.get_async(key)
+    if cached is not None:
+        return cached.to_response(hit=True)
+    rendered = await run_sync(db, render_daily_topics, date.today())
+    await cache.set_async(key, rendered, [TOPICS_TAG], generation)
+    return rendered.to_response(hit=False)
 
 
 @r.get(
@@ -49,6 +310,9 @@ async def topic_details(
     """
     topic_details IDを指定してGETでリクエストを送ると指定されたIDのお題の詳細を取得する。
 
+    レスポンスはキャッシュし、お題が編集・削除されると捨てる。
+    条件付きGETの扱いは topics_list と同じだが、存在しないIDには 304 ではなく 404 を返す。
+
     Args:
         request (Request): リクエスト
         topic_id (int): お題のID
@@ -57,8 +321,18 @@ async def topic_details(
     Returns:
         Any: 指定されたIDのお題
     """
-    topic = get_topic(db, topic_id)
-    return topic
+    cache = get_response_cache()
+    generation = cache.generation
+    validators = await run_sync(db, get_topic_detail_validators, topic_id)
+    if validators.is_not_modified(request):
+        return validators.not_modified()
+    key = f"{cache_key(request)}#{validators.etag}"
+    cached = await cache.get_async(key)
+    if cached is not None:
+        return cached.to_response(hit=True)
+    rendered = await run_sync(db, render_topic, topic_id, validators)
+    await cache.set_async(key, rendered, [TOPICS_TAG, topic_tag(topic_id)], generation)
+    return rendered.to_response(hit=False)
 
 
 @r.post("/topics", response_model=Topic, response_model_exclude_none=True)
@@ -81,7 +355,7 @@ async def topic_create(
     Returns:
         Topic: 作成されたお題
     """
-    return create_topic(db, topic, current_user)
+    return await create_topic_async(db, topic, current_user)
 
 
 @r.put("/topics/{topic_id}", response_model=Topic, response_model_exclude_none=True)
@@ -106,7 +380,7 @@ async def topic_edit(
     Returns:
         Any: アップデートされたお題
     """
-    return edit_topic(db, topic_id, topic, current_user)
+    return await edit_topic_async(db, topic_id, topic, current_user)
 
 
 @r.delete("/topics/{topic_id}", response_model=Topic, response_model_exclude_none=True)
@@ -129,4 +403,4 @@ async def topic_delete(
     Returns:
         Any: 削除されたお題
     """
-    return drop_topic(db, topic_id, current_user)
+    return await drop_topic_async(db, topic_id, current_user)
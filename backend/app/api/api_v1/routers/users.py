@@ -1,38 +1,81 @@
 import typing as t
 
-from fastapi import APIRouter, Depends, Request, Response
+from fastapi import APIRouter, Depends, Query, Request
 
+from app.core import config, security
 from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.fast_json import FastJSONResponse, ModelSerializer
+from app.core.pagination import content_range, parse_filter, parse_range, parse_sort
 from app.db.crud.user_crud import (
-    create_user,
-    delete_user,
-    edit_user,
-    get_user,
-    get_users,
+    count_users_async,
+    create_user_async,
+    delete_user_async,
+    edit_user_async,
+    get_user_async,
+    get_users_async,
 )
 from app.db.schemas.users import User, UserCreate, UserEdit
 from app.db.session import get_db
 
 users_router = r = APIRouter()
 
+serialize_user = ModelSerializer(User)  #: ユーザーを User の形の dict にする
+
 
 @r.get(
     "/users",
     response_model=t.List[User],
     response_model_exclude_none=True,
+    response_class=FastJSONResponse,
 )
 async def users_list(
-    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(config.USERS_PAGE_SIZE, ge=1, le=config.USERS_MAX_PAGE_SIZE),
+    range_: t.Optional[str] = Query(None, alias="range"),
+    sort: t.Optional[str] = None,
+    filter_: t.Optional[str] = Query(None, alias="filter"),
     db=Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
     """
-    Get all users
+    users_list ユーザーの一覧を取得する。管理者のみ。
+
+    skip と limit の代わりに react-admin の range（[先頭, 末尾]）も使える。
+    sort は ["項目名", "ASC|DESC"]、"項目名"、"-項目名" のどれか。
+    filter は JSON のオブジェクトで、q、id、email、is_active、is_superuser が使える。
+    全体の件数は Content-Range ヘッダーで返す。絞り込みが無くユーザーが多い場合は、
+    統計情報から見積もった件数になる。ユーザーは pydantic のモデルを通さずに
+    直接 dict にして返す。
+
+    Args:
+        skip (int, optional): スキップする件数。初期値は 0。
+        limit (int, optional): 最大件数。初期値は config.USERS_PAGE_SIZE。
+        range_ (Optional[str], optional): react-admin の range。初期値はNone。
+        sort (Optional[str], optional): 並び順。初期値はNone（IDの昇順）。
+        filter_ (Optional[str], optional): 絞り込みの条件。初期値はNone。
+        db (Any, optional): DB接続。初期値はDepends(get_db)。
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        Any: ユーザーのリスト
     """
-    users = get_users(db)
+    skip, limit = parse_range(range_, skip, limit)
+    limit = min(limit, config.USERS_MAX_PAGE_SIZE)
+    field, descending = parse_sort(sort, "id")
+    filters = parse_filter(filter_)
+    users = await get_users_async(db, skip, limit, field, descending, filters)
+    if skip == 0 and len(users) < limit:
+        total = len(users)
+    else:
+        total = await count_users_async(db, filters)
     # This is necessary for react-admin to work
-    response.headers["Content-Range"] = f"0-9/{len(users)}"
-    return users
+    headers = {
+        "Content-Range": content_range(
+            "users", skip, len(users), max(total, skip + len(users))
+        )
+    }
+    return FastJSONResponse(serialize_user.many(users), headers=headers)
 
 
 @r.get("/users/me", response_model=User, response_model_exclude_none=True)
@@ -57,7 +100,7 @@ async def user_details(
     """
     Get any user details
     """
-    user = get_user(db, user_id)
+    user = await get_user_async(db, user_id)
     return user
     # return encoders.jsonable_encoder(
     #     user, skip_defaults=True, exclude_none=True,
@@ -74,7 +117,8 @@ async def user_create(
     """
     Create a new user
     """
-    return create_user(db, user)
+    hashed_password = await security.get_password_hash_async(user.password)
+    return await create_user_async(db, user, hashed_password)
 
 
 @r.put("/users/{user_id}", response_model=User, response_model_exclude_none=True)
@@ -88,7 +132,8 @@ async def user_edit(
     """
     Update existing user
     """
-    return edit_user(db, user_id, user)
+    hashed_password = await security.get_password_hash_async(user.password)
+    return await edit_user_async(db, user_id, user, hashed_password)
 
 
 @r.delete("/users/{user_id}", response_model=User, response_model_exclude_none=True)
@@ -101,4 +146,4 @@ async def user_delete(
     """
     Delete existing user
     """
-    return delete_user(db, user_id)
+    return await delete_user_async(db, user_id)
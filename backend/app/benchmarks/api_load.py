@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+API 全体に負荷をかけて所要時間とスループットを測るベンチマーク
+
+DATABASE_URL のDBに合成したユーザーとお題を入れ、uvicorn でアプリケーションを起動して、
+お題一覧・ID指定・キーワード検索・ログイン・投稿・編集・削除を混ぜたリクエストを
+指定した並列数で送り続ける。操作ごとの p50/p95/p99 とスループットを JSON で出力する。
+DATABASE_URL には alembic upgrade head 済みの PostgreSQL か SQLite の URL を指定する
+（SQLite ではテーブルが無ければ作る）。--url を指定すると起動済みのサーバーに送る。
+--baseline に前回の結果を渡すと、p95 とスループットの比を標準エラーに出す。
+
+    DATABASE_URL=sqlite:///./bench.db python -m app.benchmarks.api_load \\
+        --users 100 --topics 10000 --concurrency 16 --duration 30 > result.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Engine
+
+from app.core import config
+from app.core.security import get_password_hash
+from app.db import models
+from app.db.session import Base
+
+EMAIL_DOMAIN = "bench.example.com"  #: 合成したユーザーのメールアドレスのドメイン
+PASSWORD = "bench-password"  #: 合成したユーザーのパスワード
+WORDS = (
+    "猫",
+    "犬",
+    "宇宙",
+    "寿司",
+    "電車",
+    "忍者",
+    "ロボット",
+    "魔法",
+    "海",
+    "山",
+    "図書館",
+    "カレー",
+    "恐竜",
+    "雪だるま",
+    "自転車",
+    "時計",
+)  #: お題の本文と検索のキーワードに使う単語
+DEFAULT_MIX = {
+    "list_topics": 30,
+    "get_topic": 30,
+    "search_topics": 15,
+    "login": 5,
+    "create_topic": 10,
+    "edit_topic": 5,
+    "drop_topic": 5,
+}  #: 操作ごとの重み
+INSERT_BATCH_SIZE = 1000  #: 合成したデータを1回で入れる件数
+
+
+class SeedResult(NamedTuple):
+    """
+    SeedResult 合成したデータ
+
+    Attributes:
+        emails (List[str]): ユーザーのメールアドレス
+        user_ids (List[int]): ユーザーのID（emails と同じ順）
+        topic_ids (List[int]): お題のID
+    """
+
+    emails: List[str]
+    user_ids: List[int]
+    topic_ids: List[int]
+
+
+def topic_text(rng: random.Random) -> str:
+    """
+    topic_text 単語を組み合わせてお題の本文を作る
+
+    Args:
+        rng (random.Random): 乱数
+
+    Returns:
+        str: お題の本文
+    """
+    first, second, third = rng.sample(WORDS, 3)
+    return f"{first}と{second}が出てくる{third}の話"
+
+
+def seed(engine: Engine, users: int, topics: int, seed_value: int) -> SeedResult:
+    """
+    seed 合成したユーザーとお題をDBに入れる
+
+    前回の実行で入れたユーザー（EMAIL_DOMAIN のメールアドレス）とそのお題は先に消す。
+    パスワードのハッシュは全員で同じものを使う。
+
+    Args:
+        engine (Engine): エンジン
+        users (int): ユーザーの数
+        topics (int): お題の数
+        seed_value (int): 乱数の種
+
+    Returns:
+        SeedResult: 入れたデータ
+    """
+    rng = random.Random(seed_value)
+    user_table = models.User.__table__
+    topic_table = models.Topic.__table__
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+    hashed = get_password_hash(PASSWORD)
+    emails = [f"user{i}@{EMAIL_DOMAIN}" for i in range(users)]
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        old_ids = select([user_table.c.id]).where(
+            user_table.c.email.like(f"%@{EMAIL_DOMAIN}")
+        )
+        conn.execute(
+            topic_table.delete().where(topic_table.c.contributor_id.in_(old_ids))
+        )
+        conn.execute(
+            user_table.delete().where(user_table.c.email.like(f"%@{EMAIL_DOMAIN}"))
+        )
+        for start in range(0, users, INSERT_BATCH_SIZE):
+            conn.execute(
+                insert(user_table),
+                [
+                    {
+                        "email": email,
+                        "first_name": "Bench",
+                        "last_name": str(i),
+                        "hashed_password": hashed,
+                        "is_active": True,
+                        "is_superuser": False,
+                    }
+                    for i, email in enumerate(
+                        emails[start : start + INSERT_BATCH_SIZE], start
+                    )
+                ],
+            )
+        ids = dict(
+            conn.execute(
+                select([user_table.c.email, user_table.c.id]).where(
+                    user_table.c.email.like(f"%@{EMAIL_DOMAIN}")
+                )
+            ).fetchall()
+        )
+        user_ids = [ids[email] for email in emails]
+        for start in range(0, topics, INSERT_BATCH_SIZE):
+            conn.execute(
+                insert(topic_table),
+                [
+                    {
+                        "topic": topic_text(rng),
+                        "post_date": today
+                        - datetime.timedelta(days=rng.randrange(1000)),
+                        "is_visible": True,
+                        "is_adopted": False,
+                        "contributor_id": rng.choice(user_ids),
+                    }
+                    for _ in range(start, min(start + INSERT_BATCH_SIZE, topics))
+                ],
+            )
+        topic_ids = [
+            row[0]
+            for row in conn.execute(
+                select([topic_table.c.id]).where(
+                    topic_table.c.contributor_id.in_(user_ids)
+                )
+            )
+        ]
+    return SeedResult(emails, user_ids, topic_ids)
+
+
+def _start_server(
+    database_url: str, port: int, workers: int, log_path: str
+) -> subprocess.Popen:
+    """
+    _start_server uvicorn でアプリケーションを起動し、応答するまで待つ
+
+    リクエストごとのログで結果が読みにくくならないように、サーバーの出力は
+    log_path に書く。
+
+    Args:
+        database_url (str): DBのURL
+        port (int): ポート番号
+        workers (int): uvicorn のワーカー数
+        log_path (str): サーバーの出力を書くファイル
+
+    Returns:
+        subprocess.Popen: サーバーのプロセス
+    """
+    with open(log_path, "ab") as log:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app.main:app",
+                "--port",
+                str(port),
+                "--workers",
+                str(workers),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+            ],
+            env={**os.environ, "DATABASE_URL": database_url},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited before becoming ready, see {log_path}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/v1", timeout=0.5)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not respond within 30 seconds")
+
+
+def percentile(timings: List[float], fraction: float) -> float:
+    """
+    percentile 最近傍順位法でパーセンタイルを求める
+
+    Args:
+        timings (List[float]): 昇順に並んだ値
+        fraction (float): 0 から 1 の割合（p95 なら 0.95）
+
+    Returns:
+        float: パーセンタイル。値が無ければ 0.0。
+    """
+    if not timings:
+        return 0.0
+    index = min(max(math.ceil(fraction * len(timings)) - 1, 0), len(timings) - 1)
+    return timings[index]
+
+
+def summarize(timings: List[float], errors: int, elapsed: float) -> dict:
+    """
+    summarize 所要時間のリストを集計する
+
+    Args:
+        timings (List[float]): 成功したリクエストの所要時間（秒）
+        errors (int): 失敗したリクエストの数
+        elapsed (float): 計測した時間（秒）
+
+    Returns:
+        dict: 件数、失敗数、スループットとミリ秒単位のパーセンタイル
+    """
+    timings = sorted(timings)
+    count = len(timings)
+    return {
+        "count": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(timings) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+        "max_ms": round(timings[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+class Client:
+    """
+    Client 1つの並列分のリクエストを送る
+
+    ログインしたユーザーが投稿したお題だけを編集・削除する。編集・削除するお題が
+    無いときは代わりに投稿する。
+
+    Args:
+        base_url (str): サーバーのURL
+        data (SeedResult): 合成したデータ
+        mix (Dict[str, int]): 操作ごとの重み
+        rng (random.Random): 乱数
+    """
+
+    def __init__(
+        self, base_url: str, data: SeedResult, mix: Dict[str, int], rng: random.Random
+    ):
+        self.base_url = base_url
+        self.data = data
+        self.rng = rng
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.session = requests.Session()
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.own_topics: List[int] = []
+        index = rng.randrange(len(data.emails))
+        self.email = data.emails[index]
+        self.user_id = data.user_ids[index]
+        self.session.headers["Authorization"] = f"Bearer {self._login()}"
+
+    def _login(self) -> str:
+        response = self.session.post(
+            f"{self.base_url}/api/token",
+            data={"username": self.email, "password": PASSWORD},
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    def _topic_body(self) -> dict:
+        return {
+            "topic": topic_text(self.rng),
+            "post_date": datetime.date.today().isoformat(),
+            "contributor_id": self.user_id,
+        }
+
+    def request(self, operation: str) -> Tuple[str, requests.Response]:
+        """
+        request 操作を1回行う
+
+        Args:
+            operation (str): 操作の名前
+
+        Returns:
+            Tuple[str, requests.Response]: 実際に行った操作の名前とレスポンス
+        """
+        url = f"{self.base_url}/api/v1/topics"
+        if operation in ("edit_topic", "drop_topic") and not self.own_topics:
+            operation = "create_topic"
+        if operation == "list_topics":
+            return operation, self.session.get(url)
+        if operation == "get_topic":
+            return operation, self.session.get(
+                f"{url}/{self.rng.choice(self.data.topic_ids)}"
+            )
+        if operation == "search_topics":
+            return operation, self.session.get(
+                f"{url}/search", params={"q": self.rng.choice(WORDS)}
+            )
+        if operation == "login":
+            return operation, self.session.post(
+                f"{self.base_url}/api/token",
+                data={"username": self.email, "password": PASSWORD},
+            )
+        if operation == "create_topic":
+            response = self.session.post(url, json=self._topic_body())
+            if response.ok:
+                self.own_topics.append(response.json()["id"])
+            return operation, response
+        if operation == "edit_topic":
+            topic_id = self.rng.choice(self.own_topics)
+            return operation, self.session.put(
+                f"{url}/{topic_id}", json=self._topic_body()
+            )
+        if operation == "drop_topic":
+            return operation, self.session.delete(f"{url}/{self.own_topics.pop()}")
+        raise ValueError(f"unknown operation: {operation}")
+
+    def run(self, warmup_until: float, deadline: float) -> None:
+        """
+        run deadline まで操作を繰り返す。warmup_until までの結果は記録しない。
+
+        Args:
+            warmup_until (float): 記録を始める時刻（time.monotonic）
+            deadline (float): 終える時刻（time.monotonic）
+        """
+        while True:
+            started = time.monotonic()
+            if started >= deadline:
+                return
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            try:
+                operation, response = self.request(operation)
+                ok = response.ok
+            except requests.RequestException:
+                ok = False
+            finished = time.monotonic()
+            if started < warmup_until:
+                continue
+            if ok:
+                self.timings[operation].append(finished - started)
+            else:
+                self.errors[operation] += 1
+
+
+def _git_commit() -> Optional[str]:
+    """
+    _git_commit 現在のコミットのハッシュを取得する
+
+    Returns:
+        Optional[str]: ハッシュ。git が使えなければNone。
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    users: int,
+    topics: int,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    mix: Dict[str, int],
+    seed_value: int,
+    url: Optional[str],
+    port: int,
+    workers: int,
+    server_log: str,
+) -> dict:
+    """
+    run データを入れてサーバーに負荷をかけ、結果を集計する
+
+    Args:
+        users (int): ユーザーの数
+        topics (int): お題の数
+        concurrency (int): 並列数
+        duration (float): 計測する秒数
+        warmup (float): 計測の前に負荷をかける秒数
+        mix (Dict[str, int]): 操作ごとの重み
+        seed_value (int): 乱数の種
+        url (Optional[str]): 起動済みのサーバーのURL。None なら起動する。
+        port (int): 起動するサーバーのポート番号
+        workers (int): 起動するサーバーのワーカー数
+        server_log (str): 起動するサーバーの出力を書くファイル
+
+    Returns:
+        dict: 設定と、操作ごとと全体の集計結果
+    """
+    database_url = config.SQLALCHEMY_DATABASE_URI
+    if database_url is None:
+        raise RuntimeError("DATABASE_URL is not set")
+    engine = create_engine(database_url)
+    data = seed(engine, users, topics, seed_value)
+    server = None if url else _start_server(database_url, port, workers, server_log)
+    base_url = url or f"http://127.0.0.1:{port}"
+    try:
+        clients = [
+            Client(base_url, data, mix, random.Random(seed_value + i))
+            for i in range(concurrency)
+        ]
+        warmup_until = time.monotonic() + warmup
+        deadline = warmup_until + duration
+        threads = [
+            threading.Thread(target=client.run, args=(warmup_until, deadline))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    operations = {}
+    everything: List[float] = []
+    for name in mix:
+        timings = [t for client in clients for t in client.timings[name]]
+        errors = sum(client.errors[name] for client in clients)
+        operations[name] = summarize(timings, errors, duration)
+        everything.extend(timings)
+    total_errors = sum(op["errors"] for op in operations.values())
+    return {
+        "commit": _git_commit(),
+        "database": engine.dialect.name,
+        "users": users,
+        "topics": topics,
+        "concurrency": concurrency,
+        "duration_seconds": duration,
+        "warmup_seconds": warmup,
+        "server_workers": None if url else workers,
+        "mix": mix,
+        "seed": seed_value,
+        "overall": summarize(everything, total_errors, duration),
+        "operations": operations,
+    }
+
+
+def compare(result: dict, baseline: dict) -> List[str]:
+    """
+    compare 前回の結果と比べた表を作る
+
+    Args:
+        result (dict): 今回の結果
+        baseline (dict): 前回の結果
+
+    Returns:
+        List[str]: 操作ごとの p95 とスループットの比（今回 / 前回）の行
+    """
+    lines = [
+        f"baseline {baseline.get('commit')} -> {result.get('commit')}",
+        f"{'operation':<16}{'p95 ms':>20}{'ratio':>8}{'rps':>20}{'ratio':>8}",
+    ]
+    rows = [("overall", result["overall"], baseline.get("overall"))] + [
+        (name, stats, baseline.get("operations", {}).get(name))
+        for name, stats in result["operations"].items()
+    ]
+    for name, now, before in rows:
+        if not before or not before["count"] or not now["count"]:
+            continue
+        p95 = f"{before['p95_ms']:.1f} -> {now['p95_ms']:.1f}"
+        rps = f"{before['throughput_rps']:.1f} -> {now['throughput_rps']:.1f}"
+        p95_ratio = now["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 0.0
+        rps_ratio = now["throughput_rps"] / before["throughput_rps"]
+        lines.append(
+            f"{name:<16}{p95:>20}{p95_ratio:>7.2f}x{rps:>20}{rps_ratio:>7.2f}x"
+        )
+    return lines
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """
+    parse_mix name=weight をカンマで区切った文字列を操作ごとの重みにする
+
+    Args:
+        value (str): list_topics=50,get_topic=50 のような文字列
+
+    Raises:
+        argparse.ArgumentTypeError: 知らない操作か、重みが整数でない
+
+    Returns:
+        Dict[str, int]: 操作ごとの重み
+    """
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"invalid mix entry: {part!r}")
+        mix[name] = int(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100, help="ユーザーの数")
+    parser.add_argument("--topics", type=int, default=10_000, help="お題の数")
+    parser.add_argument("--concurrency", type=int, default=8, help="並列数")
+    parser.add_argument("--duration", type=float, default=30.0, help="計測する秒数")
+    parser.add_argument("--warmup", type=float, default=5.0, help="計測の前に負荷をかける秒数")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="操作ごとの重み（list_topics=30,get_topic=30,... の形）",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--url", help="起動済みのサーバーのURL。指定しなければ起動する。")
+    parser.add_argument("--port", type=int, default=8890, help="起動するサーバーのポート番号")
+    parser.add_argument("--workers", type=int, default=1, help="起動するサーバーのワーカー数")
+    parser.add_argument("--server-log", default=os.devnull, help="起動するサーバーの出力を書くファイル")
+    parser.add_argument("--baseline", help="比べる前回の結果の JSON ファイル")
+    args = parser.parse_args()
+    result = run(
+        args.users,
+        args.topics,
+        args.concurrency,
+        args.duration,
+        args.warmup,
+        args.mix,
+        args.seed,
+        args.url,
+        args.port,
+        args.workers,
+        args.server_log,
+    )
+    print(json.dumps(result, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\n".join(compare(result, json.load(f))), file=sys.stderr)
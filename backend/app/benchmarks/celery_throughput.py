@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Celery ワーカーのスループットを測るベンチマーク
+
+REDIS_URL のブローカーに作業用のキューを作り、example_task を大量に送って、
+送信にかかった時間と、ワーカーが全て処理し終えるまでの時間から1秒あたりの件数を測る。
+--batch-size を 2 以上にすると send_batched でまとめて送る。
+ワーカーは指定したプール・並列数・プリフェッチ数で子プロセスとして起動する。
+
+    python -m app.benchmarks.celery_throughput --tasks 100000 --batch-size 100
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import redis
+
+from app.core import config
+from app.core.celery_app import celery_app
+from app.core.task_batch import send_batched
+
+QUEUE = "bench-queue"  #: 作業用のキュー
+TASK = "app.tasks.example_task"  #: 送るタスク
+UNACKED_KEY = "unacked"  #: kombu の Redis トランスポートが未確認のメッセージを置くキー
+
+
+def _start_worker(pool: str, concurrency: int, prefetch: int) -> subprocess.Popen:
+    """
+    _start_worker 作業用のキューだけを読むワーカーを起動し、応答するまで待つ
+
+    Args:
+        pool (str): プール（prefork か solo）
+        concurrency (int): 並列数
+        prefetch (int): プリフェッチ数の倍率
+
+    Returns:
+        subprocess.Popen: ワーカーのプロセス
+    """
+    hostname = f"bench-{os.getpid()}@{socket.gethostname()}"
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "celery",
+            "-A",
+            "app.tasks",
+            "worker",
+            "-Q",
+            QUEUE,
+            "-P",
+            pool,
+            "-c",
+            str(concurrency),
+            "--prefetch-multiplier",
+            str(prefetch),
+            "-n",
+            hostname,
+            "--loglevel",
+            "WARNING",
+            "--without-gossip",
+            "--without-mingle",
+        ]
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if worker.poll() is not None:
+            raise RuntimeError("worker exited before becoming ready")
+        if celery_app.control.ping(destination=[hostname], timeout=0.5):
+            return worker
+    worker.terminate()
+    raise RuntimeError("worker did not respond within 30 seconds")
+
+
+def _wait_drained(client: redis.Redis, timeout: float) -> None:
+    """
+    _wait_drained キューが空になり、処理中のメッセージも無くなるまで待つ
+
+    Args:
+        client (redis.Redis): ブローカーの Redis
+        timeout (float): 待つ最大の秒数
+    """
+    deadline = time.monotonic() + timeout
+    while client.llen(QUEUE) or client.hlen(UNACKED_KEY):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{client.llen(QUEUE)} messages left in {QUEUE}")
+        time.sleep(0.05)
+
+
+def _publish(tasks: int, batch_size: int) -> int:
+    """
+    _publish example_task を tasks 件送る
+
+    Args:
+        tasks (int): 件数
+        batch_size (int): 1通にまとめる件数。1 ならまとめない。
+
+    Returns:
+        int: 送ったメッセージの数
+    """
+    options = {"queue": QUEUE, "ignore_result": True}
+    if batch_size > 1:
+        argsets = (("bench",) for _ in range(tasks))
+        return len(send_batched(TASK, argsets, batch_size, **options))
+    task = celery_app.signature(TASK)
+    with celery_app.producer_or_acquire() as producer:
+        for _ in range(tasks):
+            task.apply_async(args=("bench",), producer=producer, **options)
+    return tasks
+
+
+def run(
+    tasks: int, batch_size: int, pool: str, concurrency: int, prefetch: int
+) -> dict:
+    """
+    run ワーカーを起動して tasks 件を処理させ、所要時間を測る
+
+    Args:
+        tasks (int): 件数
+        batch_size (int): 1通にまとめる件数
+        pool (str): プール
+        concurrency (int): 並列数
+        prefetch (int): プリフェッチ数の倍率
+
+    Returns:
+        dict: 設定と測定結果
+    """
+    client = redis.Redis.from_url(config.REDIS_URL)
+    client.delete(QUEUE)
+    worker = _start_worker(pool, concurrency, prefetch)
+    try:
+        started = time.perf_counter()
+        messages = _publish(tasks, batch_size)
+        published = time.perf_counter()
+        _wait_drained(client, timeout=max(60.0, tasks / 100))
+        finished = time.perf_counter()
+    finally:
+        worker.terminate()
+        worker.wait()
+        client.delete(QUEUE)
+    return {
+        "tasks": tasks,
+        "messages": messages,
+        "batch_size": batch_size,
+        "pool": pool,
+        "concurrency": concurrency,
+        "prefetch_multiplier": prefetch,
+        "compression": config.CELERY_COMPRESSION or None,
+        "publish_seconds": round(published - started, 3),
+        "publish_per_second": round(tasks / (published - started)),
+        "total_seconds": round(finished - started, 3),
+        "tasks_per_second": round(tasks / (finished - started)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000, help="送るタスクの件数")
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="1通にまとめる件数。1 ならまとめない。"
+    )
+    parser.add_argument(
+        "--pool", choices=("prefork", "solo"), default="prefork", help="ワーカーのプール"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=os.cpu_count() or 1, help="ワーカーの並列数"
+    )
+    parser.add_argument("--prefetch", type=int, default=4, help="プリフェッチ数の倍率")
+    args = parser.parse_args()
+    result = run(
+        args.tasks, args.batch_size, args.pool, args.concurrency, args.prefetch
+    )
+    print(json.dumps(result, indent=2))
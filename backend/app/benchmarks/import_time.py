@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+モジュールの import にかかる時間を -X importtime で測り、予算と比べる
+
+新しい Python プロセスで --runs 回 import して、累積時間の中央値と、自身の時間が
+長いモジュールの上位を表示する。中央値が --budget ミリ秒を超えたら終了コード 1 で終わる。
+既定では app.main を測る。celery や uvicorn などの重いモジュールは --forbid で
+指定すると、import されていた場合も失敗にする。
+
+    python -m app.benchmarks.import_time --budget 400 --forbid celery uvicorn passlib
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_MODULE = "app.main"  #: 既定で測るモジュール
+DEFAULT_FORBIDDEN = (
+    "celery",
+    "kombu",
+    "uvicorn",
+    "passlib",
+    "psycopg2",
+)  #: app.main の import で読み込まないモジュール
+
+
+class ImportProfile(NamedTuple):
+    """
+    ImportProfile 1回の import の測定結果
+
+    Attributes:
+        total_ms (float): 測ったモジュールの累積時間（ミリ秒）
+        self_ms (Dict[str, float]): モジュールごとの自身の時間（ミリ秒）
+        modules (List[str]): import の後に読み込まれていたモジュール
+    """
+
+    total_ms: float
+    self_ms: Dict[str, float]
+    modules: List[str]
+
+
+def parse_importtime(output: str, module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    parse_importtime -X importtime の出力を読む
+
+    Args:
+        output (str): 標準エラーに出た -X importtime の出力
+        module (str): 累積時間を取るモジュール
+
+    Raises:
+        ValueError: module の行が無い
+
+    Returns:
+        Tuple[float, Dict[str, float]]: module の累積時間と、モジュールごとの自身の時間（ミリ秒）
+    """
+    total: Optional[float] = None
+    self_ms: Dict[str, float] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|", 2)
+        name = name.strip()
+        self_ms[name] = int(own) / 1000
+        if name == module:
+            total = int(cumulative) / 1000
+    if total is None:
+        raise ValueError(f"{module} was not imported")
+    return total, self_ms
+
+
+def profile_import(module: str) -> ImportProfile:
+    """
+    profile_import 新しいプロセスで module を import して時間を測る
+
+    Args:
+        module (str): モジュール名
+
+    Returns:
+        ImportProfile: 測定結果
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    total, self_ms = parse_importtime(completed.stderr, module)
+    return ImportProfile(total, self_ms, json.loads(completed.stdout))
+
+
+def run(
+    module: str, runs: int, budget: float, forbidden: Sequence[str], top: int
+) -> List[str]:
+    """
+    run import の時間を runs 回測って表示し、予算を超えていないか調べる
+
+    Args:
+        module (str): モジュール名
+        runs (int): 測る回数
+        budget (float): 累積時間の中央値の予算（ミリ秒）。0 なら調べない。
+        forbidden (Sequence[str]): 読み込まれていてはいけないモジュール
+        top (int): 表示する自身の時間が長いモジュールの数
+
+    Returns:
+        List[str]: 予算を超えた・読み込まれていたモジュールの説明。問題が無ければ空。
+    """
+    profiles = [profile_import(module) for _ in range(runs)]
+    median = statistics.median(profile.total_ms for profile in profiles)
+    slowest = sorted(profiles[-1].self_ms.items(), key=lambda item: -item[1])[:top]
+    print(f"import {module}: median {median:.1f} ms of {runs} runs")
+    for name, elapsed in slowest:
+        print(f"{elapsed:>10.1f} ms  {name}")
+
+    problems = []
+    if budget and median > budget:
+        problems.append(f"import {module} took {median:.1f} ms > {budget:.1f} ms")
+    loaded = set(profiles[-1].modules)
+    for name in forbidden:
+        if name in loaded:
+            problems.append(f"import {module} loaded {name}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="測るモジュール")
+    parser.add_argument("--runs", type=int, default=5, help="測る回数")
+    parser.add_argument(
+        "--budget", type=float, default=0.0, help="累積時間の予算（ミリ秒）。0 なら調べない。"
+    )
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=list(DEFAULT_FORBIDDEN),
+        help="読み込まれていてはいけないモジュール",
+    )
+    parser.add_argument("--top", type=int, default=15, help="表示するモジュールの数")
+    args = parser.parse_args()
+    problems = run(args.module, args.runs, args.budget, args.forbid, args.top)
+    for problem in problems:
+        print(f"FAIL {problem}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+よく呼ばれる CRUD・認証・シリアライズの関数のマイクロベンチマーク
+
+関数ごとに1ラウンドが --min-time 秒以上になる回数を決め、それを --rounds ラウンド
+実行して1回あたりの時間の最小値と中央値を測る。--save で結果を JSON に保存し、
+--compare で保存した結果と比べて、中央値が --max-regression パーセントより遅く
+なった関数があれば終了コード 1 で終わる。保存した結果と DB の種類か Python の
+バージョン（マイナーまで）が違う場合は、比べても意味が無いので警告を出して比べない。
+DBを使う関数は DATABASE_URL のDBに外側のトランザクションの中で合成したデータを入れ、
+最後にロールバックする。SQLite（sqlite:// でメモリ上）でも動く。
+
+基準の結果は app/benchmarks/micro_baseline.json としてリポジトリに入れておく。
+時間はマシンによって変わるので、CI で比べるときは同じランナーで --save し直したものを
+コミットし、関数を速くしたり遅くしたりする変更ではその変更と一緒に更新する。
+基準は SQLite で取っているので、CI でも DATABASE_URL=sqlite:// で比べる。
+
+    DATABASE_URL=sqlite:// python -m app.benchmarks.micro --save app/benchmarks/micro_baseline.json
+    DATABASE_URL=sqlite:// python -m app.benchmarks.micro --compare app/benchmarks/micro_baseline.json
+"""
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+import jwt
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.benchmarks.api_load import WORDS, _git_commit, topic_text
+from app.core import config, security
+from app.db import models, search
+from app.db.crud import topic_crud, user_crud
+from app.db.schemas.topics import Topic
+from app.db.session import Base
+
+Factory = Callable[[Connection], Callable[[], object]]
+
+
+class Result(NamedTuple):
+    """
+    Result 1つの関数の測定結果
+
+    Attributes:
+        name (str): ベンチマークの名前
+        loops (int): 1ラウンドで呼んだ回数
+        rounds (int): ラウンド数
+        min_us (float): 1回あたりの時間の最小値（マイクロ秒）
+        median_us (float): 1回あたりの時間の中央値（マイクロ秒）
+    """
+
+    name: str
+    loops: int
+    rounds: int
+    min_us: float
+    median_us: float
+
+
+BENCHMARKS: Dict[str, Factory] = {}  #: 名前と、測る関数を作る関数
+
+
+def benchmark(name: str) -> Callable[[Factory], Factory]:
+    """
+    benchmark ベンチマークを BENCHMARKS に登録するデコレーター
+
+    登録する関数はDB接続を受け取り、引数なしで呼べる測る対象の関数を返す。
+
+    Args:
+        name (str): ベンチマークの名前
+
+    Returns:
+        Callable[[Factory], Factory]: デコレーター
+    """
+
+    def register(factory: Factory) -> Factory:
+        BENCHMARKS[name] = factory
+        return factory
+
+    return register
+
+
+def _with_session(conn: Connection, fn: Callable[[Session], object]) -> object:
+    """
+    _with_session リクエストごとと同じように、セッションを作って fn を呼んでから閉じる
+
+    Args:
+        conn (Connection): 外側のトランザクションを持つDB接続
+        fn (Callable[[Session], object]): セッションを受け取る関数
+
+    Returns:
+        object: fn の戻り値
+    """
+    db = Session(bind=conn)
+    try:
+        return fn(db)
+    finally:
+        db.close()
+
+
+@benchmark("topic_crud.get_topics")
+def _get_topics(conn: Connection) -> Callable[[], object]:
+    return lambda: _with_session(
+        conn,
+        lambda db: topic_crud.get_topics(
+            db, limit=config.TOPICS_PAGE_SIZE, with_contributor=True
+        ),
+    )
+
+
+@benchmark("topic_crud.get_topics_by_keyword")
+def _get_topics_by_keyword(conn: Connection) -> Callable[[], object]:
+    keywords = itertools.cycle(WORDS)
+    return lambda: _with_session(
+        conn, lambda db: topic_crud.get_topics_by_keyword(db, next(keywords))
+    )
+
+
+@benchmark("user_crud.get_user_by_email")
+def _get_user_by_email(conn: Connection) -> Callable[[], object]:
+    return lambda: _with_session(
+        conn, lambda db: user_crud.get_user_by_email(db, "user0@micro.example.com")
+    )
+
+
+@benchmark("security.create_access_token")
+def _create_access_token(conn: Connection) -> Callable[[], object]:
+    expires = datetime.timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
+    data = {"sub": "user0@micro.example.com", "permissions": "user"}
+    return lambda: security.create_access_token(data=data, expires_delta=expires)
+
+
+@benchmark("jwt.decode")
+def _jwt_decode(conn: Connection) -> Callable[[], object]:
+    token = security.create_access_token(
+        data={"sub": "user0@micro.example.com", "permissions": "user"},
+        expires_delta=datetime.timedelta(days=1),
+    )
+    return lambda: jwt.decode(
+        token, security.SECRET_KEY, algorithms=[security.ALGORITHM]
+    )
+
+
+@benchmark("Topic.from_orm x1000")
+def _topic_from_orm(conn: Connection) -> Callable[[], object]:
+    topics = Session(bind=conn).query(models.Topic).limit(1000).all()
+    return lambda: [Topic.from_orm(topic) for topic in topics]
+
+
+def seed(conn: Connection, users: int, topics: int) -> None:
+    """
+    seed 合成したユーザーとお題を入れる。コミットはしない。
+
+    Args:
+        conn (Connection): 外側のトランザクションを持つDB接続
+        users (int): ユーザーの数
+        topics (int): お題の数
+    """
+    rng = random.Random(0)
+    conn.execute(
+        insert(models.User.__table__),
+        [
+            {
+                "email": f"user{i}@micro.example.com",
+                "hashed_password": "not-a-real-hash",
+                "is_active": True,
+                "is_superuser": False,
+            }
+            for i in range(users)
+        ],
+    )
+    user_ids = [
+        row[0]
+        for row in conn.execute(
+            select([models.User.id]).where(
+                models.User.email.like("%@micro.example.com")
+            )
+        )
+    ]
+    today = datetime.date.today()
+    conn.execute(
+        insert(models.Topic.__table__),
+        [
+            {
+                "topic": topic_text(rng),
+                "post_date": today - datetime.timedelta(days=rng.randrange(1000)),
+                "is_visible": True,
+                "is_adopted": False,
+                "contributor_id": rng.choice(user_ids),
+            }
+            for _ in range(topics)
+        ],
+    )
+    search.reset_fallback_index()
+
+
+def measure(
+    name: str, fn: Callable[[], object], rounds: int, min_time: float
+) -> Result:
+    """
+    measure 関数を繰り返し呼んで1回あたりの時間を測る
+
+    timeit と同じく、測っている間はガベージコレクションを止める。
+
+    Args:
+        name (str): ベンチマークの名前
+        fn (Callable[[], object]): 測る関数
+        rounds (int): ラウンド数
+        min_time (float): 1ラウンドの最短の秒数
+
+    Returns:
+        Result: 測定結果
+    """
+
+    def run_round(loops: int) -> float:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return time.perf_counter() - started
+
+    fn()
+    loops = 1
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while True:
+            elapsed = run_round(loops)
+            if elapsed >= min_time:
+                break
+            loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+        timings = [run_round(loops) / loops * 1e6 for _ in range(rounds)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return Result(name, loops, rounds, min(timings), statistics.median(timings))
+
+
+def environment() -> Dict[str, str]:
+    """
+    environment 結果と一緒に保存する実行環境
+
+    Returns:
+        Dict[str, str]: Python のバージョンと DB の種類
+    """
+    return {
+        "python": platform.python_version(),
+        "database": (config.SQLALCHEMY_DATABASE_URI or "sqlite://").split(":")[0],
+    }
+
+
+def environment_mismatches(stored: dict, current: Dict[str, str]) -> List[str]:
+    """
+    environment_mismatches 保存した結果と今回で、比べられない違いがあるか調べる
+
+    Python はパッチバージョンの違いでは速さがほとんど変わらないので、マイナーまで比べる。
+
+    Args:
+        stored (dict): --save で保存した結果
+        current (Dict[str, str]): 今回の実行環境（environment の戻り値）
+
+    Returns:
+        List[str]: 違いの説明。無ければ空。
+    """
+    mismatches = []
+    if stored.get("database") != current["database"]:
+        mismatches.append(
+            f"database: {stored.get('database')} (stored) != {current['database']}"
+        )
+    stored_python = str(stored.get("python", "")).split(".")[:2]
+    if stored_python != current["python"].split(".")[:2]:
+        mismatches.append(
+            f"python: {stored.get('python')} (stored) != {current['python']}"
+        )
+    return mismatches
+
+
+def compare(results: List[Result], stored: dict, max_regression: float) -> List[str]:
+    """
+    compare 保存した結果と中央値を比べる
+
+    保存した結果に無いものと、保存した中央値が 0 以下のものは比べない。
+
+    Args:
+        results (List[Result]): 今回の結果
+        stored (dict): --save で保存した結果
+        max_regression (float): 許す遅くなり方（パーセント）
+
+    Returns:
+        List[str]: max_regression を超えて遅くなったベンチマークの説明。無ければ空。
+    """
+    regressions = []
+    before = stored.get("results", {})
+    for result in results:
+        if result.name not in before:
+            continue
+        baseline = before[result.name]["median_us"]
+        if baseline <= 0:
+            # 測れないほど速かった結果とは比べられないので、基準が無いものとして扱う
+            continue
+        change = (result.median_us / baseline - 1) * 100
+        if change > max_regression:
+            regressions.append(
+                f"{result.name}: {baseline:.1f} us -> {result.median_us:.1f} us "
+                f"(+{change:.1f}% > {max_regression:.1f}%)"
+            )
+    return regressions
+
+
+def run(
+    names: List[str], rounds: int, min_time: float, users: int, topics: int
+) -> List[Result]:
+    """
+    run 合成したデータを入れて、指定したベンチマークを順に測る
+
+    Args:
+        names (List[str]): ベンチマークの名前
+        rounds (int): ラウンド数
+        min_time (float): 1ラウンドの最短の秒数
+        users (int): ユーザーの数
+        topics (int): お題の数
+
+    Returns:
+        List[Result]: 測定結果
+    """
+    engine = create_engine(config.SQLALCHEMY_DATABASE_URI or "sqlite://")
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+    conn = engine.connect()
+    trans = conn.begin()
+    try:
+        seed(conn, users, topics)
+        results = []
+        for name in names:
+            result = measure(name, BENCHMARKS[name](conn), rounds, min_time)
+            print(
+                f"{name:<36}{result.median_us:>12.1f} us{result.min_us:>12.1f} us",
+                file=sys.stderr,
+            )
+            results.append(result)
+        return results
+    finally:
+        trans.rollback()
+        conn.close()
+        search.reset_fallback_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "names", nargs="*", default=list(BENCHMARKS), help="測るベンチマーク。初期値は全て。"
+    )
+    parser.add_argument("--rounds", type=int, default=7, help="ラウンド数")
+    parser.add_argument("--min-time", type=float, default=0.2, help="1ラウンドの最短の秒数")
+    parser.add_argument("--users", type=int, default=1000, help="ユーザーの数")
+    parser.add_argument("--topics", type=int, default=10_000, help="お題の数")
+    parser.add_argument("--save", help="結果を保存する JSON ファイル")
+    parser.add_argument("--compare", help="比べる結果の JSON ファイル")
+    parser.add_argument(
+        "--max-regression", type=float, default=20.0, help="許す遅くなり方（パーセント）"
+    )
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    results = run(args.names, args.rounds, args.min_time, args.users, args.topics)
+    report = {
+        "commit": _git_commit(),
+        **environment(),
+        "results": {result.name: result._asdict() for result in results},
+    }
+    print(json.dumps(report, indent=2))
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            stored = json.load(f)
+        mismatches = environment_mismatches(stored, environment())
+        for line in mismatches:
+            print(f"SKIPPED comparison, {line}", file=sys.stderr)
+        regressions = (
+            [] if mismatches else compare(results, stored, args.max_regression)
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
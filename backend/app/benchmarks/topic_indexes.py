@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+topic テーブルの索引の効果を測るベンチマーク
+
+DATABASE_URL の PostgreSQL に作業用のスキーマを作り、合成したお題を投入して、
+topic_crud と同じ形のクエリの実行計画と所要時間を索引の追加前後で比べる。
+作業用のスキーマは最後に削除する。
+
+    python -m app.benchmarks.topic_indexes --rows 1000000
+"""
+import argparse
+import datetime
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import MetaData, Table, and_, create_engine, select, text
+from sqlalchemy.engine import Connection
+
+from app.core import config
+from app.db import models
+from app.db.crud.topic_crud import keyset_before
+
+SCHEMA = "bench_topic_indexes"  #: 作業用のスキーマ
+INDEX_NAMES = {
+    "ix_topic_contributor_id",
+    "ix_topic_visible_contributor_id",
+    "ix_topic_visible_adopted",
+    "ix_topic_visible_post_date",
+}  #: 効果を測る索引
+
+
+def _copy_tables(metadata: MetaData) -> Tuple[Table, Table]:
+    """
+    _copy_tables user と topic のテーブル定義を作業用のスキーマに複製する
+
+    Args:
+        metadata (MetaData): 複製先のメタデータ
+
+    Returns:
+        Tuple[Table, Table]: user と topic のテーブル
+    """
+    user = models.User.__table__.tometadata(metadata, schema=SCHEMA)
+    topic = models.Topic.__table__.tometadata(metadata, schema=SCHEMA)
+    return user, topic
+
+
+def _populate(conn: Connection, rows: int, users: int) -> None:
+    """
+    _populate 合成したユーザーとお題を投入する
+
+    お題の9割は見える状態で、そのうち5%が採用済み。投稿日は約4年に散らばる。
+
+    Args:
+        conn (Connection): DB接続
+        rows (int): お題の件数
+        users (int): ユーザーの件数
+    """
+    conn.execute(
+        text(
+            f'INSERT INTO {SCHEMA}."user" (email, hashed_password, is_active) '
+            "SELECT 'user' || g || '@example.com', 'x', true "
+            "FROM generate_series(1, :users) AS g"
+        ),
+        users=users,
+    )
+    conn.execute(
+        text(
+            f"INSERT INTO {SCHEMA}.topic "
+            "(topic, post_date, is_visible, is_adopted, contributor_id) "
+            "SELECT 'お題' || g, DATE '2020-01-01' + (g % 1500), "
+            "random() < 0.9, random() < 0.05, 1 + (g % :users) "
+            "FROM generate_series(1, :rows) AS g"
+        ),
+        rows=rows,
+        users=users,
+    )
+    conn.execute(text(f"ANALYZE {SCHEMA}.topic"))
+    conn.execute(text(f'ANALYZE {SCHEMA}."user"'))
+
+
+def _queries(topic: Table, contributor_id: int, after_id: int) -> Dict[str, object]:
+    """
+    _queries topic_crud と同じ形のクエリを組み立てる
+
+    2ページ目以降の条件は get_topics と同じ keyset_before で作る。
+
+    Args:
+        topic (Table): topic テーブル
+        contributor_id (int): 投稿者で絞り込むクエリに使うユーザーID
+        after_id (int): 2ページ目以降のクエリでカーソルに使うお題のID
+
+    Returns:
+        Dict[str, object]: クエリ名とクエリ
+    """
+    c = topic.c
+    page_order = (c.post_date.desc(), c.id.desc())
+    return {
+        "get_topics (first page)": select([topic])
+        .where(c.is_visible)
+        .order_by(*page_order)
+        .limit(config.TOPICS_PAGE_SIZE + 1),
+        "get_topics (keyset page)": select([topic])
+        .where(
+            and_(
+                c.is_visible,
+                keyset_before(c.post_date, c.id, (datetime.date(2022, 1, 1), after_id)),
+            )
+        )
+        .order_by(*page_order)
+        .limit(config.TOPICS_PAGE_SIZE + 1),
+        "get_topics_by_user": select([topic]).where(
+            and_(c.is_visible, c.contributor_id == contributor_id)
+        ),
+        "get_all_topics_by_user": select([topic]).where(
+            c.contributor_id == contributor_id
+        ),
+        "get_adopted_topics": select([topic]).where(and_(c.is_visible, c.is_adopted)),
+        "get_adopted_topics_by_user": select([topic]).where(
+            and_(c.is_visible, c.is_adopted, c.contributor_id == contributor_id)
+        ),
+    }
+
+
+def _measure(conn: Connection, query, repeat: int) -> Tuple[str, float]:
+    """
+    _measure クエリの実行計画と所要時間の中央値を測る
+
+    Args:
+        conn (Connection): DB接続
+        query (Any): クエリ
+        repeat (int): 所要時間を測る回数
+
+    Returns:
+        Tuple[str, float]: 実行計画と所要時間の中央値（ミリ秒）
+    """
+    # 日付は literal_binds で埋め込めないので、パラメーターのまま psycopg2 に渡す
+    compiled = query.compile(conn)
+    plan = "\n".join(
+        row[0]
+        for row in conn.execute(
+            f"EXPLAIN (ANALYZE, BUFFERS) {compiled}", compiled.params
+        )
+    )
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(query).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return plan, statistics.median(timings)
+
+
+def run(rows: int, users: int, repeat: int, show_plans: bool) -> None:
+    """
+    run ベンチマークを実行して結果を表示する
+
+    Args:
+        rows (int): お題の件数
+        users (int): ユーザーの件数
+        repeat (int): クエリごとに所要時間を測る回数
+        show_plans (bool): 実行計画を表示するか
+    """
+    engine = create_engine(config.SQLALCHEMY_DATABASE_URI)
+    metadata = MetaData()
+    user, topic = _copy_tables(metadata)
+    new_indexes = [index for index in topic.indexes if index.name in INDEX_NAMES]
+    for index in new_indexes:
+        topic.indexes.discard(index)
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        try:
+            metadata.create_all(conn)
+            print(f"populating {rows} topics by {users} users ...")
+            _populate(conn, rows, users)
+            queries = _queries(topic, contributor_id=users // 2, after_id=rows // 2)
+
+            results: Dict[str, Dict[str, Tuple[str, float]]] = {}
+            for phase in ("before", "after"):
+                if phase == "after":
+                    for index in new_indexes:
+                        index.create(conn)
+                    conn.execute(text(f"ANALYZE {SCHEMA}.topic"))
+                results[phase] = {
+                    name: _measure(conn, query, repeat)
+                    for name, query in queries.items()
+                }
+
+            print(f"{'query':<30}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+            for name in queries:
+                before = results["before"][name][1]
+                after = results["after"][name][1]
+                print(f"{name:<30}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+            if show_plans:
+                for name in queries:
+                    for phase in ("before", "after"):
+                        print(f"\n== {name} ({phase}) ==")
+                        print(results[phase][name][0])
+        finally:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="お題の件数")
+    parser.add_argument("--users", type=int, default=10_000, help="ユーザーの件数")
+    parser.add_argument("--repeat", type=int, default=5, help="所要時間を測る回数")
+    parser.add_argument("--no-plans", action="store_true", help="実行計画を表示しない")
+    args = parser.parse_args()
+    run(args.rows, args.users, args.repeat, not args.no_plans)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+お題一覧のシリアライズの速さを測るベンチマーク
+
+DBを使わずに ORM のお題を作り、FastAPI の既定の経路（from_orm、jsonable_encoder、
+JSONResponse）と、ModelSerializer で直接 dict にする経路を比べる。
+orjson がインストールされていれば、orjson で直列化する場合も測る。
+
+    python -m app.benchmarks.topic_serialization --rows 10000
+"""
+import argparse
+import datetime
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.core import fast_json
+from app.core.fast_json import ModelSerializer
+from app.db import models
+from app.db.schemas.topics import Topic, TopicOut
+
+
+def _make_topics(rows: int) -> List[models.Topic]:
+    """
+    _make_topics 投稿者付きの ORM のお題を作る
+
+    Args:
+        rows (int): お題の件数
+
+    Returns:
+        List[models.Topic]: お題のリスト
+    """
+    users = [
+        models.User(
+            id=i, email=f"user{i}@example.com", is_active=True, is_superuser=False
+        )
+        for i in range(1, 101)
+    ]
+    start = datetime.date(2020, 1, 1)
+    return [
+        models.Topic(
+            id=i,
+            topic=f"ベンチマーク用のお題 {i}",
+            picture_url=None if i % 3 else f"https://example.com/{i}.png",
+            post_date=start + datetime.timedelta(days=i % 1000),
+            is_visible=True,
+            is_adopted=i % 20 == 0,
+            contributor_id=users[i % 100].id,
+            contributor=users[i % 100],
+        )
+        for i in range(1, rows + 1)
+    ]
+
+
+def _measure(render: Callable[[], bytes], repeat: int) -> float:
+    """
+    _measure シリアライズを repeat 回実行し、所要時間の中央値を返す
+
+    Args:
+        render (Callable[[], bytes]): シリアライズする関数
+        repeat (int): 実行する回数
+
+    Returns:
+        float: 所要時間の中央値（ミリ秒）
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run(rows: int, repeat: int) -> None:
+    """
+    run それぞれの経路でシリアライズする時間を測って表にする
+
+    Args:
+        rows (int): お題の件数
+        repeat (int): 所要時間を測る回数
+    """
+    topics = _make_topics(rows)
+    orjson = fast_json.orjson
+    results = {}
+    for label, model in (("Topic", Topic), ("TopicOut", TopicOut)):
+        serializer = ModelSerializer(model)
+
+        def pydantic_path(model=model) -> bytes:
+            content = [model.from_orm(topic) for topic in topics]
+            return JSONResponse(jsonable_encoder(content, exclude_none=True)).body
+
+        def direct_json(serializer=serializer) -> bytes:
+            setattr(fast_json, "orjson", None)
+            try:
+                return fast_json.dumps(serializer.many(topics))
+            finally:
+                setattr(fast_json, "orjson", orjson)
+
+        def direct_orjson(serializer=serializer) -> bytes:
+            return fast_json.dumps(serializer.many(topics))
+
+        results[f"{label} pydantic + json"] = _measure(pydantic_path, repeat)
+        results[f"{label} direct + json"] = _measure(direct_json, repeat)
+        if orjson is not None:
+            results[f"{label} direct + orjson"] = _measure(direct_orjson, repeat)
+
+    print(f"{rows} topics, median of {repeat} runs")
+    print(f"{'path':<32}{'time (ms)':>12}{'speedup':>10}")
+    baseline: Dict[str, float] = {}
+    for name, elapsed in results.items():
+        label = name.split()[0]
+        baseline.setdefault(label, elapsed)
+        print(f"{name:<32}{elapsed:>12.1f}{baseline[label] / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000, help="お題の件数")
+    parser.add_argument("--repeat", type=int, default=5, help="所要時間を測る回数")
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
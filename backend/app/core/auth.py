@@ -4,9 +4,9 @@ import jwt
 from fastapi import Depends, HTTPException, status
 from jwt import PyJWTError
 
-from app.core import security
+from app.core import security, token_cache
 from app.db import models, session
-from app.db.crud.user_crud import create_user, get_user_by_email
+from app.db.crud.user_crud import create_user_async, get_user_by_email_async
 from app.db.schemas import tokens, users
 
 
@@ -16,6 +16,9 @@ async def get_current_user(
     """
     get_current_user 現在のユーザーを取得する
 
+    デコードしたトークンとユーザー情報は token_cache にキャッシュするので、
+    同じトークンでの2回目以降のリクエストではDBに問い合わせない。
+
     Args:
         db (Any, optional): DB接続。初期値は Depends(session.get_db)。
         token (str, optional): JWTトークン。初期値は Depends(security.oauth2_scheme)。
@@ -26,6 +29,10 @@ async def get_current_user(
     Returns:
         Any: ユーザー情報
     """
+    cached_user = token_cache.get_cached_user(token)
+    if cached_user is not None:
+        return cached_user
+    generation = token_cache.current_generation()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,9 +51,10 @@ async def get_current_user(
         token_data = tokens.TokenData(email=email, permissions=permissions)
     except PyJWTError:
         raise credentials_exception
-    user = get_user_by_email(db, str(token_data.email))
+    user = await get_user_by_email_async(db, str(token_data.email))
     if user is None:
         raise credentials_exception
+    token_cache.cache_user(token, payload, user, generation)
     return user
 
 
@@ -94,10 +102,12 @@ async def get_current_active_superuser(
     return current_user
 
 
-def authenticate_user(db, email: str, password: str):
+async def authenticate_user(db, email: str, password: str):
     """
     authenticate_user ユーザー認証を行う
 
+    パスワードの照合は security のスレッドプールで行い、イベントループを止めない。
+
     Args:
         db (Any): DB接続
         email (str): Eメールアドレス
@@ -106,18 +116,20 @@ def authenticate_user(db, email: str, password: str):
     Returns:
         Any: ユーザー情報（無い場合はFalse）
     """
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email_async(db, email)
     if not user:
         return False
-    if not security.verify_password(password, user.hashed_password):
+    if not await security.verify_password_async(password, user.hashed_password):
         return False
     return user
 
 
-def sign_up_new_user(db, email: str, password: str):
+async def sign_up_new_user(db, email: str, password: str):
     """
     sign_up_new_user ユーザーのサインアップ
 
+    パスワードのハッシュ化は security のスレッドプールで行い、イベントループを止めない。
+
     Args:
         db (Any): DB接続
         email (str): Eメールアドレス
@@ -126,10 +138,10 @@ def sign_up_new_user(db, email: str, password: str):
     Returns:
         User: 新しいユーザー
     """
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email_async(db, email)
     if user:
         return False  # User already exists
-    new_user = create_user(
+    new_user = await create_user_async(
         db,
         users.UserCreate(
             email=email,
@@ -137,5 +149,6 @@ def sign_up_new_user(db, email: str, password: str):
             is_active=True,
             is_superuser=False,
         ),
+        hashed_password=await security.get_password_hash_async(password),
     )
     return new_user
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    TTLCache 有効期限付きの LRU キャッシュ
+
+    件数が maxsize を超えると、最も長く使われていないものから捨てる。
+    スレッドプールから呼ばれても壊れないように、操作はロックで守る。
+
+    Args:
+        maxsize (int): 保持する最大件数
+        ttl (float): 有効期限（秒）
+        timer (Callable[[], float], optional): 現在時刻を返す関数。初期値は time.monotonic。
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        get キャッシュから値を取得する
+
+        Args:
+            key (Hashable): キー
+            default (Any, optional): 無い場合や期限切れの場合の値。初期値は None。
+
+        Returns:
+            Any: キャッシュされた値
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._timer():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        set 値をキャッシュする
+
+        Args:
+            key (Hashable): キー
+            value (Any): 値
+            ttl (Optional[float], optional): この値だけの有効期限（秒）。初期値は None。
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._timer() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        pop キャッシュから値を取り除く
+
+        Args:
+            key (Hashable): キー
+            default (Any, optional): 無い場合の値。初期値は None。
+
+        Returns:
+            Any: 取り除いた値
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        """
+        clear キャッシュを空にする
+        """
+        with self._lock:
+            self._data.clear()
+
+
+_MISSING = object()
@@ -1,5 +1,36 @@
-from celery import Celery
+import threading
+from typing import TYPE_CHECKING, Any, Optional
 
-celery_app = Celery("worker", broker="redis://redis:6379/0")
+if TYPE_CHECKING:  # celery の import は重いので、API からは使うときまで遅らせる
+    from celery import Celery
 
-celery_app.conf.task_routes = {"app.tasks.*": "main-queue"}
+_celery_app: Optional["Celery"] = None
+_celery_app_lock = threading.Lock()
+
+
+def get_celery_app() -> "Celery":
+    """
+    get_celery_app Celery アプリケーションを取得する。初回に celery を import して作る。
+
+    複数のスレッドから同時に初めて呼ばれても、作るのは1つだけにする。
+
+    Returns:
+        Celery: Celery アプリケーション
+    """
+    global _celery_app
+    if _celery_app is None:
+        with _celery_app_lock:
+            if _celery_app is None:
+                from celery import Celery
+
+                app = Celery("worker", include=["app.tasks"])
+                app.config_from_object("app.core.celery_config")
+                _celery_app = app
+    return _celery_app
+
+
+def __getattr__(name: str) -> Any:
+    # ワーカーや既存のコードの from app.core.celery_app import celery_app のため
+    if name == "celery_app":
+        return get_celery_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
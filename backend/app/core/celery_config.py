@@ -0,0 +1,54 @@
+"""
+Celery の設定
+
+celery_app.config_from_object で読み込む。並列数とプリフェッチ数はワーカーごとに
+環境変数で変えられるので、docker-compose では CPU を使うタスク用と I/O 待ちが長い
+タスク用でワーカーを分けて起動する。celery 5.0 の worker コマンドは worker_pool の
+設定を見ないため、プールは -P で指定する。
+"""
+from celery.schedules import crontab
+from kombu import Queue
+
+from app.core import config
+
+DEFAULT_QUEUE = "main-queue"  #: 振り分け先が決まっていないタスクのキュー
+CPU_QUEUE = "cpu-queue"  #: 直列化や圧縮で CPU を使うタスクのキュー
+IO_QUEUE = "io-queue"  #: DB や Redis の応答待ちが長いタスクのキュー
+
+broker_url = config.REDIS_URL
+result_backend = config.CELERY_RESULT_BACKEND
+result_expires = config.CELERY_RESULT_EXPIRES
+
+task_serializer = "json"
+result_serializer = "json"
+accept_content = ["json"]
+task_compression = config.CELERY_COMPRESSION or None
+result_compression = config.CELERY_COMPRESSION or None
+task_track_started = True
+
+task_default_queue = DEFAULT_QUEUE
+task_queues = (Queue(DEFAULT_QUEUE), Queue(CPU_QUEUE), Queue(IO_QUEUE))
+task_routes = {
+    "app.tasks.import_topics_task": {"queue": CPU_QUEUE},
+    "app.tasks.export_topics_task": {"queue": CPU_QUEUE},
+    "app.tasks.rebuild_search_index_task": {"queue": IO_QUEUE},
+    "app.tasks.warm_topic_cache_task": {"queue": IO_QUEUE},
+    "app.tasks.select_daily_topics_task": {"queue": IO_QUEUE},
+    "app.tasks.*": {"queue": DEFAULT_QUEUE},
+}
+
+worker_concurrency = config.CELERY_CONCURRENCY or None
+worker_prefetch_multiplier = config.CELERY_PREFETCH_MULTIPLIER
+
+beat_schedule = {
+    "select-daily-topics": {
+        "task": "app.tasks.select_daily_topics_task",
+        "schedule": crontab(hour=config.DAILY_TOPIC_HOUR, minute=0),
+    },
+}
+if config.RESPONSE_CACHE_BACKEND == "redis":
+    # メモリ上のキャッシュはワーカーからは温められないので、Redis のときだけ登録する
+    beat_schedule["warm-topic-cache"] = {
+        "task": "app.tasks.warm_topic_cache_task",
+        "schedule": float(config.CACHE_WARM_INTERVAL),
+    }
@@ -0,0 +1,76 @@
+import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+class Validators(NamedTuple):
+    """
+    Validators 条件付きGETに使う ETag と Last-Modified の組
+
+    Attributes:
+        etag (str): 引用符付きの ETag
+        last_modified (Optional[datetime.datetime]): 最終更新日時
+    """
+
+    etag: str
+    last_modified: Optional[datetime.datetime] = None
+
+    def headers(self) -> Dict[str, str]:
+        """
+        headers レスポンスに付けるヘッダーを作る
+
+        Returns:
+            Dict[str, str]: ETag と Last-Modified のヘッダー
+        """
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            last_modified = self.last_modified.astimezone(datetime.timezone.utc)
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        return headers
+
+    def is_not_modified(self, request: Request) -> bool:
+        """
+        is_not_modified リクエストの条件からクライアントの内容が最新か判定する
+
+        If-None-Match がある場合は弱い比較で ETag を比べ、If-Modified-Since は無視する。
+
+        Args:
+            request (Request): リクエスト
+
+        Returns:
+            bool: 304 Not Modified を返してよいか
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            etag = _strip_weak(self.etag)
+            return any(
+                _strip_weak(tag.strip()) == etag for tag in if_none_match.split(",")
+            )
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return self.last_modified.replace(microsecond=0) <= since
+
+    def not_modified(self) -> Response:
+        """
+        not_modified 本文の無い 304 Not Modified のレスポンスを作る
+
+        Returns:
+            Response: レスポンス
+        """
+        return Response(status_code=304, headers=self.headers())
@@ -1,7 +1,93 @@
 import os
 
+
+def _getenv_bool(name: str, default: bool = False) -> bool:
+    """
+    _getenv_bool 環境変数を真偽値として読む
+
+    Args:
+        name (str): 環境変数の名前
+        default (bool, optional): 環境変数が無い場合の値。初期値は False。
+
+    Returns:
+        bool: 値が 1, true, yes のいずれかなら True
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
 PROJECT_NAME = "odaikun"
 
 SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _getenv_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", PROJECT_NAME)
+DB_PGBOUNCER = _getenv_bool("DB_PGBOUNCER")
+
 API_V1_STR = "/api/v1"
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", "86400"))
+CELERY_CONCURRENCY = int(os.getenv("CELERY_CONCURRENCY", "0"))
+CELERY_PREFETCH_MULTIPLIER = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "1"))
+CELERY_COMPRESSION = os.getenv("CELERY_COMPRESSION", "zlib")
+CELERY_BATCH_SIZE = int(os.getenv("CELERY_BATCH_SIZE", "100"))
+TASK_OUTBOX_SIZE = int(os.getenv("TASK_OUTBOX_SIZE", "10000"))
+TASK_OUTBOX_BATCH_SIZE = int(os.getenv("TASK_OUTBOX_BATCH_SIZE", "100"))
+TASK_OUTBOX_MAX_ATTEMPTS = int(os.getenv("TASK_OUTBOX_MAX_ATTEMPTS", "10"))
+TASK_OUTBOX_SHUTDOWN_TIMEOUT = float(os.getenv("TASK_OUTBOX_SHUTDOWN_TIMEOUT", "5"))
+TASK_FILE_DIR = os.getenv("TASK_FILE_DIR", "/tmp/odaikun-tasks")
+CACHE_WARM_INTERVAL = int(os.getenv("CACHE_WARM_INTERVAL", "60"))
+CACHE_WARM_TOPICS = int(os.getenv("CACHE_WARM_TOPICS", "20"))
+
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "100"))
+USERS_MAX_PAGE_SIZE = int(os.getenv("USERS_MAX_PAGE_SIZE", "1000"))
+USERS_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv("USERS_COUNT_ESTIMATE_THRESHOLD", "100000")
+)
+
+TOPICS_PAGE_SIZE = int(os.getenv("TOPICS_PAGE_SIZE", "50"))
+TOPICS_MAX_PAGE_SIZE = int(os.getenv("TOPICS_MAX_PAGE_SIZE", "200"))
+TOPIC_POOL_TTL = int(os.getenv("TOPIC_POOL_TTL", "300"))
+TOPIC_POOL_CHECK_INTERVAL = float(os.getenv("TOPIC_POOL_CHECK_INTERVAL", "1"))
+
+DAILY_TOPIC_COUNT = int(os.getenv("DAILY_TOPIC_COUNT", "3"))
+DAILY_TOPIC_HOUR = int(os.getenv("DAILY_TOPIC_HOUR", "0"))
+DAILY_TOPIC_AGE_WEIGHT = float(os.getenv("DAILY_TOPIC_AGE_WEIGHT", "1.0"))
+DAILY_TOPIC_AGE_HORIZON_DAYS = int(os.getenv("DAILY_TOPIC_AGE_HORIZON_DAYS", "365"))
+DAILY_TOPIC_FAIRNESS_WEIGHT = float(os.getenv("DAILY_TOPIC_FAIRNESS_WEIGHT", "2.0"))
+DAILY_TOPIC_MAX_PER_CONTRIBUTOR = int(os.getenv("DAILY_TOPIC_MAX_PER_CONTRIBUTOR", "1"))
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+# 有効にすると問い合わせを専用のスレッドプールで実行し、イベントループを止めない。
+# 問い合わせごとにスレッドの受け渡しが入り、同時に実行できる問い合わせは
+# DB_EXECUTOR_WORKERS 本までになる。無効にするとイベントループの上で実行する。
+DB_ASYNC_MODE = _getenv_bool("DB_ASYNC_MODE", True)
+DB_EXECUTOR_WORKERS = int(
+    os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW))
+)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+REQUEST_TIME_BUDGET_MS = float(os.getenv("REQUEST_TIME_BUDGET_MS", "500"))
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "20"))
+SERVER_TIMING = _getenv_bool("SERVER_TIMING", True)
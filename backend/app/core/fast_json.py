@@ -0,0 +1,126 @@
+import datetime
+import json
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Type
+
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Pipfile で入るが、入っていない環境でも動くように標準の json を使う
+    orjson = None  # type: ignore
+
+
+def _default(value: Any) -> str:
+    """
+    _default 標準の json で直列化できない値を文字列にする
+
+    Args:
+        value (Any): 値
+
+    Raises:
+        TypeError: 文字列にできない値である
+
+    Returns:
+        str: ISO 8601 形式の日付・日時
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    dumps dict や list をJSONのバイト列にする
+
+    orjson（Pipfile の依存）を使う。入っていない環境では標準の json で orjson と
+    同じ形（ensure_ascii=False、区切りの空白なし）にする。
+
+    Args:
+        content (Any): dict や list
+
+    Returns:
+        bytes: JSONのバイト列
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    FastJSONResponse dumps で直列化する JSONResponse
+
+    中身は jsonable_encoder を通さないので、dict や list か ModelSerializer の結果を渡す。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ModelSerializer:
+    """
+    ModelSerializer ORM のオブジェクトを pydantic のモデルを通さずに dict にする
+
+    モデルの項目名と入れ子のモデルを最初に調べておき、オブジェクトからは属性を
+    読むだけにする。値の検証はしないので、DBから読んだ行のように型が合っている
+    ことが分かっているものに使う。結果は response_model_exclude_none=True と同じく
+    None の項目を含まない。
+
+    Args:
+        model (Type[BaseModel]): 出力の形を決める pydantic のモデル
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        names = []
+        nested: List[Tuple[int, Callable[[Any], Any]]] = []
+        for index, field in enumerate(model.__fields__.values()):
+            names.append(field.name)
+            if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+                serializer = ModelSerializer(field.type_)
+                if field.shape == SHAPE_SINGLETON:
+                    nested.append((index, serializer))
+                elif field.shape == SHAPE_LIST:
+                    nested.append((index, serializer.many))
+        self._names = tuple(names)
+        self._get = attrgetter(*names)
+        self._nested = nested
+
+    def __call__(self, obj: Any) -> Dict[str, Any]:
+        """
+        __call__ オブジェクトを dict にする
+
+        Args:
+            obj (Any): ORM のオブジェクト
+
+        Returns:
+            Dict[str, Any]: None の項目を除いた dict
+        """
+        values: Any = self._get(obj)
+        if len(self._names) == 1:
+            values = (values,)
+        if self._nested:
+            values = list(values)
+            for index, serialize in self._nested:
+                if values[index] is not None:
+                    values[index] = serialize(values[index])
+        return {
+            name: value for name, value in zip(self._names, values) if value is not None
+        }
+
+    def many(self, objs: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        many オブジェクトのリストを dict のリストにする
+
+        Args:
+            objs (Iterable[Any]): ORM のオブジェクト
+
+        Returns:
+            List[Dict[str, Any]]: dict のリスト
+        """
+        return [self(obj) for obj in objs]
@@ -0,0 +1,200 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import config
+
+logger = logging.getLogger("app.request")
+
+STATEMENT_LOG_LENGTH = 200  #: ログに残す SQL 文の最大の長さ
+
+
+class RequestStats:
+    """
+    RequestStats 1つのリクエストの所要時間とDBへの問い合わせの記録
+
+    Attributes:
+        started (float): リクエストを受け取った時刻（time.perf_counter）
+        queries (int): 問い合わせの回数
+        db_time (float): 問い合わせにかかった時間の合計（秒）
+        slowest_time (float): 最も遅かった問い合わせの時間（秒）
+        slowest_statement (Optional[str]): 最も遅かった問い合わせの SQL 文
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed: float) -> None:
+        """
+        record 問い合わせを1回記録する
+
+        Args:
+            statement (str): SQL 文
+            elapsed (float): かかった時間（秒）
+        """
+        self.queries += 1
+        self.db_time += elapsed
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    def elapsed(self) -> float:
+        """
+        elapsed リクエストを受け取ってからの時間を取得する
+
+        Returns:
+            float: 経過時間（秒）
+        """
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """
+        server_timing Server-Timing ヘッダーの値を作る
+
+        Args:
+            total (float): リクエスト全体の時間（秒）
+
+        Returns:
+            str: db（問い合わせの合計）、app（それ以外）、total の3項目
+        """
+        db_ms = self.db_time * 1000
+        total_ms = total * 1000
+        return (
+            f'db;dur={db_ms:.1f};desc="{self.queries} queries", '
+            f"app;dur={max(total_ms - db_ms, 0.0):.1f}, "
+            f"total;dur={total_ms:.1f}"
+        )
+
+    def over_budget(self, total: float) -> List[str]:
+        """
+        over_budget 予算を超えた項目を取得する
+
+        Args:
+            total (float): リクエスト全体の時間（秒）
+
+        Returns:
+            List[str]: 超えた項目（latency と queries）。0 の予算は見ない。
+        """
+        exceeded = []
+        if 0 < config.REQUEST_TIME_BUDGET_MS < total * 1000:
+            exceeded.append("latency")
+        if 0 < config.REQUEST_QUERY_BUDGET < self.queries:
+            exceeded.append("queries")
+        return exceeded
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def start_request() -> RequestStats:
+    """
+    start_request 現在のリクエストの記録を始める
+
+    記録はコンテキスト変数に置くので、同じコンテキストを引き継いだスレッドでの
+    問い合わせも同じ記録に数えられる。
+
+    Returns:
+        RequestStats: このリクエストの記録
+    """
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def current_stats() -> Optional[RequestStats]:
+    """
+    current_stats 現在のリクエストの記録を取得する
+
+    Returns:
+        Optional[RequestStats]: 記録。リクエストの外ではNone。
+    """
+    return _current.get()
+
+
+# 開始時刻は実行ごとの context に置く。失敗した文では after_cursor_execute が
+# 呼ばれないので、プールで使い回すコネクションに積むと残り続けて対応がずれるため。
+# context の無い文（列の既定値の事前実行など）はコネクションに1つだけ置き、上書きする。
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = time.perf_counter()
+    if context is not None:
+        context._instrumentation_started = started
+    else:
+        conn.info["query_started"] = started
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        started = getattr(context, "_instrumentation_started", None)
+    else:
+        started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    instrument_engine エンジンの問い合わせを現在のリクエストの記録に数えるようにする
+
+    同じエンジンに何度呼んでもリスナーは1つだけ付く。
+
+    Args:
+        engine (Engine): エンジン
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def log_request(
+    stats: RequestStats, method: str, path: str, status_code: int, total: float
+) -> Dict[str, Any]:
+    """
+    log_request リクエストの記録を1行のJSONでログに出す
+
+    予算を超えた場合は WARNING、それ以外は INFO で出す。
+
+    Args:
+        stats (RequestStats): リクエストの記録
+        method (str): HTTP メソッド
+        path (str): パス
+        status_code (int): ステータスコード
+        total (float): リクエスト全体の時間（秒）
+
+    Returns:
+        Dict[str, Any]: ログに出した項目
+    """
+    exceeded = stats.over_budget(total)
+    record: Dict[str, Any] = {
+        "event": "request",
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "duration_ms": round(total * 1000, 2),
+        "db_queries": stats.queries,
+        "db_ms": round(stats.db_time * 1000, 2),
+    }
+    if stats.slowest_statement is not None:
+        record["slowest_ms"] = round(stats.slowest_time * 1000, 2)
+        record["slowest_statement"] = " ".join(stats.slowest_statement.split())[
+            :STATEMENT_LOG_LENGTH
+        ]
+    if exceeded:
+        record["over_budget"] = exceeded
+        logger.warning(json.dumps(record, ensure_ascii=False))
+    else:
+        logger.info(json.dumps(record, ensure_ascii=False))
+    return record
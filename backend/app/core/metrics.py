@@ -0,0 +1,392 @@
+import logging
+import math
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  #: Response が charset を付け足す
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+Collected = Tuple[str, str, float]  #: collector が返す (名前, 説明, 値)
+
+
+def _format_value(value: float) -> str:
+    """
+    _format_value 値を Prometheus のテキスト形式にする
+
+    Args:
+        value (float): 値
+
+    Returns:
+        str: 整数は小数点なし、無限大は +Inf
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    """
+    _format_labels ラベルを Prometheus のテキスト形式にする
+
+    Args:
+        labels (Iterable[Tuple[str, str]]): ラベル名と値の組
+
+    Returns:
+        str: {name="value",...}。ラベルが無ければ空文字列。
+    """
+    pairs = [
+        '{}="{}"'.format(
+            name,
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in labels
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterValue:
+    """
+    _CounterValue ラベルの値ごとのカウンター
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """
+        inc カウンターを増やす
+
+        Args:
+            amount (float, optional): 増やす量。初期値は 1.0。
+        """
+        self.value += amount
+
+
+class _HistogramValue:
+    """
+    _HistogramValue ラベルの値ごとのヒストグラム
+
+    バケットごとの件数は累積せずに持ち、出力するときに累積する。
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        observe 値を1つ記録する
+
+        Args:
+            value (float): 値（秒など）
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    """
+    _Metric 名前とラベルを持つメトリクスの基底クラス
+
+    ラベルの値ごとの子は最初に使われたときに作り、以降は使い回す。
+    ラベルが無い場合は子を1つだけ持ち、inc や observe を直接呼べる。
+
+    Args:
+        name (str): メトリクスの名前
+        documentation (str): 説明
+        labelnames (Tuple[str, ...], optional): ラベル名。初期値は ()。
+        registry (Optional[Registry], optional): 登録先。初期値は None（REGISTRY）。
+    """
+
+    type_ = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        registry: Optional["Registry"] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        """
+        labels ラベルの値に対応する子を取得する
+
+        Args:
+            *values (str): labelnames の順のラベルの値
+
+        Raises:
+            ValueError: ラベルの値の数が labelnames と合わない
+
+        Returns:
+            Any: 子（_CounterValue か _HistogramValue）
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Counter 増えるだけの値
+    """
+
+    type_ = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """
+        inc ラベルの無いカウンターを増やす
+
+        Args:
+            amount (float, optional): 増やす量。初期値は 1.0。
+        """
+        self._default.value += amount
+
+    def samples(self) -> Iterator[Sample]:
+        for values, child in list(self._children.items()):
+            yield self.name + "_total", tuple(zip(self.labelnames, values)), child.value
+
+
+class Histogram(_Metric):
+    """
+    Histogram 値の分布をバケットごとの件数で記録する
+
+    Args:
+        name (str): メトリクスの名前
+        documentation (str): 説明
+        labelnames (Tuple[str, ...], optional): ラベル名。初期値は ()。
+        buckets (Tuple[float, ...], optional): バケットの上限。初期値は DEFAULT_BUCKETS。
+        registry (Optional[Registry], optional): 登録先。初期値は None（REGISTRY）。
+    """
+
+    type_ = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Optional["Registry"] = None,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """
+        observe ラベルの無いヒストグラムに値を1つ記録する
+
+        Args:
+            value (float): 値
+        """
+        self._default.observe(value)
+
+    def samples(self) -> Iterator[Sample]:
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            counts = list(child.counts)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                yield self.name + "_bucket", labels + le, cumulative
+            yield self.name + "_sum", labels, child.sum
+            yield self.name + "_count", labels, cumulative
+
+
+class Registry:
+    """
+    Registry メトリクスをまとめて Prometheus のテキスト形式で出力する
+
+    カウンターとヒストグラムは記録するときにロックを取らない。GIL の下で
+    スレッドが同時に同じ値を更新すると、まれに1回分の更新が失われることがあるが、
+    監視の用途では問題にならないので速さを優先する。
+    他のオブジェクトが持っている値は、出力するときに collector を呼んで集める。
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[Callable[[], Iterable[Collected]], str]] = []
+
+    def register(self, metric: _Metric) -> None:
+        """
+        register メトリクスを登録する
+
+        Args:
+            metric (_Metric): メトリクス
+        """
+        self._metrics.append(metric)
+
+    def add_collector(
+        self, collect: Callable[[], Iterable[Collected]], metric_type: str = "gauge"
+    ) -> None:
+        """
+        add_collector 出力するときに呼ぶ collector を登録する
+
+        増えるだけの値（起動してからの回数や合計時間）は metric_type を "counter" にする。
+        Prometheus が再起動による値の減少をリセットとして扱えるように、
+        その場合は値の名前に _total を付けて出す。
+
+        Args:
+            collect (Callable[[], Iterable[Collected]]): (名前, 説明, 値) の組を返す関数
+            metric_type (str, optional): "gauge" か "counter"。初期値は "gauge"。
+        """
+        self._collectors.append((collect, metric_type))
+
+    def render(self) -> str:
+        """
+        render 登録されたメトリクスを Prometheus のテキスト形式にする
+
+        collector が例外を投げた場合は、その値を出さずに続ける。
+        カウンターは HELP と TYPE にも値と同じ _total 付きの名前を使う。
+
+        Returns:
+            str: テキスト形式のメトリクス
+        """
+        lines = []
+        for metric in self._metrics:
+            family = (
+                metric.name + "_total" if metric.type_ == "counter" else metric.name
+            )
+            lines.append(f"# HELP {family} {metric.documentation}")
+            lines.append(f"# TYPE {family} {metric.type_}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collect, metric_type in self._collectors:
+            try:
+                collected = list(collect())
+            except Exception:
+                logger.warning("metrics collector %r failed", collect, exc_info=True)
+                continue
+            suffix = "_total" if metric_type == "counter" else ""
+            for name, documentation, value in collected:
+                lines.append(f"# HELP {name}{suffix} {documentation}")
+                lines.append(f"# TYPE {name}{suffix} {metric_type}")
+                lines.append(f"{name}{suffix} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = Histogram(
+    "odaikun_http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route template.",
+    ("method", "route", "status"),
+)
+PASSWORD_VERIFY_SECONDS = Histogram(
+    "odaikun_password_verify_duration_seconds",
+    "Time spent in bcrypt password verification.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+TASK_SEND_SECONDS = Histogram(
+    "odaikun_celery_send_duration_seconds",
+    "Time spent sending one batch of tasks to the Celery broker.",
+)
+TASK_SEND_LATENCY_SECONDS = Histogram(
+    "odaikun_celery_send_latency_seconds",
+    "Time from enqueueing a task in the outbox until the broker accepted it.",
+)
+TASKS_SENT = Counter(
+    "odaikun_celery_tasks_sent", "Tasks sent to the Celery broker by the outbox."
+)
+
+_STATUS_CLASSES = ("1xx", "1xx", "2xx", "3xx", "4xx", "5xx")
+_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+)  #: ラベルにそのまま使うメソッド。それ以外は OTHER にまとめる
+_route_children: Dict[Any, Dict[str, List[Optional[_HistogramValue]]]] = {}
+
+
+def _route_path(scope: Mapping[str, Any]) -> str:
+    """
+    _route_path リクエストが一致したルートのパスのテンプレートを取得する
+
+    Args:
+        scope (Mapping[str, Any]): ASGI の scope
+
+    Returns:
+        str: /api/v1/topics/{topic_id} のようなテンプレート。一致しなければ unmatched。
+    """
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is not None and app is not None:
+        for route in app.routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                return route.path
+    return "unmatched"
+
+
+def observe_request(scope: Mapping[str, Any], status_code: int, seconds: float) -> None:
+    """
+    observe_request リクエストの所要時間をルートごとのヒストグラムに記録する
+
+    ラベルはルートのテンプレートにするので、パスパラメーターの値で系列は増えない。
+    メソッドも認証の無いリクエストで任意に送れるので、_METHODS 以外は OTHER にする。
+    ルート、メソッド、ステータスの組ごとの子は初回に作り、以降は辞書とリストから
+    探すだけにして、リクエストごとにオブジェクトを作らないようにする。
+
+    Args:
+        scope (Mapping[str, Any]): ASGI の scope（ルーティング後）
+        status_code (int): ステータスコード
+        seconds (float): 所要時間（秒）
+    """
+    endpoint = scope.get("endpoint")
+    method = scope["method"]
+    if method not in _METHODS:
+        method = "OTHER"
+    by_method = _route_children.get(endpoint)
+    if by_method is None:
+        by_method = _route_children.setdefault(endpoint, {})
+    children = by_method.get(method)
+    if children is None:
+        children = by_method.setdefault(method, [None] * 6)
+    index = min(max(status_code // 100, 1), 5)
+    child = children[index]
+    if child is None:
+        child = children[index] = REQUEST_SECONDS.labels(
+            method, _route_path(scope), _STATUS_CLASSES[index]
+        )
+    child.observe(seconds)
@@ -0,0 +1,188 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+
+Cursor = Tuple[datetime.date, int]
+
+
+def encode_cursor(post_date: datetime.date, topic_id: int) -> str:
+    """
+    encode_cursor キーセットページネーション用のカーソルを生成する
+
+    Args:
+        post_date (datetime.date): ページ末尾のお題の投稿日
+        topic_id (int): ページ末尾のお題のID
+
+    Returns:
+        str: URLセーフなBase64でエンコードされたカーソル
+    """
+    raw = f"{post_date.isoformat()}:{topic_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """
+    decode_cursor カーソルを投稿日とIDの組に戻す
+
+    Args:
+        cursor (Optional[str]): encode_cursor で生成されたカーソル
+
+    Raises:
+        HTTPException: カーソルが不正である旨の HTTP 400 エラー
+
+    Returns:
+        Optional[Cursor]: 投稿日とIDの組。カーソルが無い場合はNone。
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        post_date, topic_id = raw.split(":")
+        return datetime.date.fromisoformat(post_date), int(topic_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def split_page(topics: List, limit: int) -> Tuple[List, Optional[str]]:
+    """
+    split_page limit + 1 件取得したお題を1ページ分と次のページのカーソルに分ける
+
+    Args:
+        topics (List): (post_date, id) の降順に最大 limit + 1 件取得したお題
+        limit (int): 1ページの最大件数
+
+    Returns:
+        Tuple[List, Optional[str]]: 1ページ分のお題と、続きがある場合はカーソル
+    """
+    if len(topics) <= limit:
+        return topics, None
+    topics = topics[:limit]
+    last = topics[-1]
+    return topics, encode_cursor(last.post_date, last.id)
+
+
+def trim_page(response: Response, topics: List, limit: int) -> List:
+    """
+    trim_page limit + 1 件取得したお題を1ページ分に切り詰める
+
+    続きがある場合は、最後のお題を指すカーソルを X-Next-Cursor ヘッダーに入れる。
+
+    Args:
+        response (Response): レスポンス
+        topics (List): (post_date, id) の降順に最大 limit + 1 件取得したお題
+        limit (int): 1ページの最大件数
+
+    Returns:
+        List: 1ページ分のお題
+    """
+    page, next_cursor = split_page(topics, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def parse_range(range_: Optional[str], skip: int, limit: int) -> Tuple[int, int]:
+    """
+    parse_range react-admin の range パラメーター（[先頭, 末尾]）をスキップ件数と最大件数にする
+
+    Args:
+        range_ (Optional[str]): JSON の [先頭, 末尾]。両端を含む。
+        skip (int): range が無い場合のスキップ件数
+        limit (int): range が無い場合の最大件数
+
+    Raises:
+        HTTPException: range が不正である旨の HTTP 400 エラー
+
+    Returns:
+        Tuple[int, int]: スキップ件数と最大件数
+    """
+    if not range_:
+        return skip, limit
+    try:
+        start, end = json.loads(range_)
+        start, end = int(start), int(end)
+    except (TypeError, ValueError):
+        raise _bad_request("Invalid range")
+    if start < 0 or end < start:
+        raise _bad_request("Invalid range")
+    return start, end - start + 1
+
+
+def parse_sort(sort: Optional[str], default: str) -> Tuple[str, bool]:
+    """
+    parse_sort 並び順のパラメーターを項目名と降順かどうかにする
+
+    react-admin の ["項目名", "ASC|DESC"] の他に、"項目名" と "-項目名"（降順）も受け付ける。
+
+    Args:
+        sort (Optional[str]): 並び順
+        default (str): 並び順が無い場合の項目名
+
+    Raises:
+        HTTPException: 並び順が不正である旨の HTTP 400 エラー
+
+    Returns:
+        Tuple[str, bool]: 項目名と、降順か否か
+    """
+    if not sort:
+        return default, False
+    if not sort.startswith("["):
+        return sort.lstrip("-"), sort.startswith("-")
+    try:
+        field, order = json.loads(sort)
+    except ValueError:
+        raise _bad_request("Invalid sort")
+    if not isinstance(field, str) or str(order).upper() not in ("ASC", "DESC"):
+        raise _bad_request("Invalid sort")
+    return field, str(order).upper() == "DESC"
+
+
+def parse_filter(filter_: Optional[str]) -> Dict[str, Any]:
+    """
+    parse_filter react-admin の filter パラメーター（JSON のオブジェクト）を辞書にする
+
+    Args:
+        filter_ (Optional[str]): JSON のオブジェクト
+
+    Raises:
+        HTTPException: filter が不正である旨の HTTP 400 エラー
+
+    Returns:
+        Dict[str, Any]: 項目名と値の辞書
+    """
+    if not filter_:
+        return {}
+    try:
+        filters = json.loads(filter_)
+    except ValueError:
+        raise _bad_request("Invalid filter")
+    if not isinstance(filters, dict):
+        raise _bad_request("Invalid filter")
+    return filters
+
+
+def content_range(resource: str, skip: int, count: int, total: int) -> str:
+    """
+    content_range 一覧のレスポンスに付ける Content-Range ヘッダーの値を作る
+
+    Args:
+        resource (str): リソースの名前
+        skip (int): スキップした件数
+        count (int): 返した件数
+        total (int): 全体の件数
+
+    Returns:
+        str: "リソース 先頭-末尾/全体"。返した件数が0の場合は "リソース */全体"。
+    """
+    if count == 0:
+        return f"{resource} */{total}"
+    return f"{resource} {skip}-{skip + count - 1}/{total}"
@@ -0,0 +1,560 @@
+import json
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+
+import redis
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.fast_json import dumps
+from app.core.metrics import REGISTRY, Collected
+
+logger = logging.getLogger(__name__)
+
+TOPICS_TAG = "topics"  #: お題一覧のレスポンスに付けるタグ
+
+
+def topic_tag(topic_id: int) -> str:
+    """
+    topic_tag お題の詳細のレスポンスに付けるタグ
+
+    Args:
+        topic_id (int): お題のID
+
+    Returns:
+        str: タグ
+    """
+    return f"topic:{topic_id}"
+
+
+class CachedResponse(NamedTuple):
+    """
+    CachedResponse キャッシュされたレスポンス
+
+    Attributes:
+        body (bytes): JSONにシリアライズされた本文
+        headers (Dict[str, str]): 本文以外に返すヘッダー
+    """
+
+    body: bytes
+    headers: Dict[str, str]
+
+    def to_response(self, hit: bool) -> Response:
+        """
+        to_response キャッシュされた内容からレスポンスを作る
+
+        Args:
+            hit (bool): キャッシュにあったか。X-Cache ヘッダーに入れる。
+
+        Returns:
+            Response: レスポンス
+        """
+        response = Response(self.body, media_type="application/json")
+        response.headers.update(self.headers)
+        response.headers["X-Cache"] = "HIT" if hit else "MISS"
+        return response
+
+    def pack(self) -> bytes:
+        """
+        pack Redis に保存するためにバイト列にする
+
+        Returns:
+            bytes: 1行目がヘッダーのJSON、2行目以降が本文のバイト列
+        """
+        return json.dumps(self.headers).encode("utf-8") + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, raw: bytes) -> "CachedResponse":
+        """
+        unpack pack で作ったバイト列から戻す
+
+        Args:
+            raw (bytes): pack で作ったバイト列
+
+        Returns:
+            CachedResponse: キャッシュされたレスポンス
+        """
+        headers, body = raw.split(b"\n", 1)
+        return cls(body, json.loads(headers))
+
+
+class MemoryBackend:
+    """
+    MemoryBackend プロセス内の LRU に保存するバックエンド
+
+    ワーカープロセスごとに別々のキャッシュになるので、他のプロセスでの更新は
+    有効期限が切れるまで反映されない。
+
+    Args:
+        maxsize (int): 保持する最大件数
+        ttl (float): 有効期限（秒）
+    """
+
+    name = "memory"
+    blocking = False  #: 呼び出しがI/Oで待つか
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self._entries = TTLCache(maxsize, ttl)
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        get キャッシュされたレスポンスを取得する
+
+        Args:
+            key (str): キー
+
+        Returns:
+            Optional[CachedResponse]: レスポンス。無い場合はNone。
+        """
+        return self._entries.get(key)
+
+    def set(self, key: str, response: CachedResponse, tags: Iterable[str]) -> None:
+        """
+        set レスポンスをタグ付きで保存する
+
+        Args:
+            key (str): キー
+            response (CachedResponse): レスポンス
+            tags (Iterable[str]): 無効化に使うタグ
+        """
+        self._entries.set(key, response)
+        with self._lock:
+            for tag in tags:
+                keys = self._tags.setdefault(tag, set())
+                if len(keys) >= self.maxsize:
+                    keys = self._tags[tag] = {k for k in keys if k in self._entries}
+                keys.add(key)
+
+    def delete(self, key: str) -> None:
+        """
+        delete レスポンスを1つ捨てる
+
+        Args:
+            key (str): キー
+        """
+        self._entries.pop(key)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """
+        invalidate タグの付いたレスポンスを全て捨てる
+
+        Args:
+            tags (Iterable[str]): タグ
+        """
+        keys: Set[str] = set()
+        with self._lock:
+            for tag in tags:
+                keys.update(self._tags.pop(tag, ()))
+        for key in keys:
+            self._entries.pop(key)
+
+    def clear(self) -> None:
+        """
+        clear キャッシュを空にする
+        """
+        with self._lock:
+            self._tags.clear()
+        self._entries.clear()
+
+
+class RedisBackend:
+    """
+    RedisBackend Redis に保存するバックエンド
+
+    全てのワーカープロセスで共有される。タグごとにキーの集合を持ち、無効化は
+    Lua スクリプトで集合とキーをまとめて消す。Redis に繋がらない場合は
+    キャッシュが無いものとして扱い、リクエストは失敗させない。
+
+    Args:
+        url (str): Redis の URL
+        ttl (float): 有効期限（秒）
+        prefix (str, optional): キーの接頭辞。初期値は "odaikun:cache:"。
+    """
+
+    name = "redis"
+    blocking = True  #: 呼び出しがI/Oで待つか
+
+    _INVALIDATE = """
+    for _, tag in ipairs(KEYS) do
+        local keys = redis.call('SMEMBERS', tag)
+        for _, key in ipairs(keys) do
+            redis.call('DEL', key)
+        end
+        redis.call('DEL', tag)
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "odaikun:cache:"):
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+        self._invalidate = self._client.register_script(self._INVALIDATE)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}key:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for _ in self._client.scan_iter(self._key("*")))
+        except redis.RedisError:
+            return 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        get キャッシュされたレスポンスを取得する
+
+        Args:
+            key (str): キー
+
+        Returns:
+            Optional[CachedResponse]: レスポンス。無い場合はNone。
+        """
+        try:
+            raw = self._client.get(self._key(key))
+        except redis.RedisError:
+            logger.warning("response cache get failed", exc_info=True)
+            return None
+        return None if raw is None else CachedResponse.unpack(raw)
+
+    def set(self, key: str, response: CachedResponse, tags: Iterable[str]) -> None:
+        """
+        set レスポンスをタグ付きで保存する
+
+        Args:
+            key (str): キー
+            response (CachedResponse): レスポンス
+            tags (Iterable[str]): 無効化に使うタグ
+        """
+        pipe = self._client.pipeline(transaction=False)
+        pipe.set(self._key(key), response.pack(), ex=self.ttl)
+        for tag in tags:
+            pipe.sadd(self._tag(tag), self._key(key))
+            pipe.expire(self._tag(tag), self.ttl)
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("response cache set failed", exc_info=True)
+
+    def delete(self, key: str) -> None:
+        """
+        delete レスポンスを1つ捨てる
+
+        Args:
+            key (str): キー
+        """
+        try:
+            self._client.delete(self._key(key))
+        except redis.RedisError:
+            logger.warning("response cache delete failed", exc_info=True)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """
+        invalidate タグの付いたレスポンスを全て捨てる
+
+        Args:
+            tags (Iterable[str]): タグ
+        """
+        try:
+            self._invalidate(keys=[self._tag(tag) for tag in tags])
+        except redis.RedisError:
+            logger.warning("response cache invalidation failed", exc_info=True)
+
+    def clear(self) -> None:
+        """
+        clear キャッシュを空にする
+        """
+        try:
+            keys = list(self._client.scan_iter(f"{self.prefix}*"))
+            if keys:
+                self._client.delete(*keys)
+        except redis.RedisError:
+            logger.warning("response cache clear failed", exc_info=True)
+
+
+class ResponseCache:
+    """
+    ResponseCache レスポンスキャッシュ。ヒット数とミス数を数える。
+
+    レスポンスを作っている間にお題が更新されると、更新前の内容を無効化の後に
+    保存してしまうことがある。これを防ぐため、無効化のたびに generation を進め、
+    作り始める前の generation を set に渡すと、その間に無効化されていた場合は
+    保存しない（保存した直後に無効化された場合は消す）。
+    generation はプロセスごとなので、Redis を使っていて他のプロセスで更新された
+    場合だけは防げない。お題一覧と詳細はキーに topic テーブルの更新番号を含むため
+    古い内容が返ることは無いが、その日の採用お題は最長で RESPONSE_CACHE_TTL 秒の間
+    古いままになりうる。
+
+    Args:
+        backend (Any): MemoryBackend か RedisBackend。None ならキャッシュしない。
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        get キャッシュされたレスポンスを取得する
+
+        Args:
+            key (str): キー
+
+        Returns:
+            Optional[CachedResponse]: レスポンス。無い場合はNone。
+        """
+        if self.backend is None:
+            return None
+        response = self.backend.get(key)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def set(
+        self,
+        key: str,
+        response: CachedResponse,
+        tags: Iterable[str],
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        set レスポンスをタグ付きで保存する
+
+        Args:
+            key (str): キー
+            response (CachedResponse): レスポンス
+            tags (Iterable[str]): 無効化に使うタグ
+            generation (Optional[int], optional):
+                レスポンスを作り始める前の generation。初期値は None（調べない）。
+        """
+        if self.backend is None:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self.backend.set(key, response, tags)
+        if generation is not None and generation != self.generation:
+            self.backend.delete(key)
+
+    async def get_async(self, key: str) -> Optional[CachedResponse]:
+        """
+        get_async get の非同期版。Redis ではイベントループを止めないようにスレッドで呼ぶ。
+
+        Args:
+            key (str): キー
+
+        Returns:
+            Optional[CachedResponse]: レスポンス。無い場合はNone。
+        """
+        if getattr(self.backend, "blocking", False):
+            return await run_in_threadpool(self.get, key)
+        return self.get(key)
+
+    async def set_async(
+        self,
+        key: str,
+        response: CachedResponse,
+        tags: Iterable[str],
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        set_async set の非同期版。Redis ではイベントループを止めないようにスレッドで呼ぶ。
+
+        Args:
+            key (str): キー
+            response (CachedResponse): レスポンス
+            tags (Iterable[str]): 無効化に使うタグ
+            generation (Optional[int], optional):
+                レスポンスを作り始める前の generation。初期値は None（調べない）。
+        """
+        if getattr(self.backend, "blocking", False):
+            await run_in_threadpool(self.set, key, response, tags, generation)
+        else:
+            self.set(key, response, tags, generation)
+
+    def invalidate(self, *tags: str) -> None:
+        """
+        invalidate タグの付いたレスポンスを全て捨てる
+
+        Args:
+            *tags (str): タグ
+        """
+        with self._lock:
+            self.generation += 1
+        if self.backend is not None:
+            self.backend.invalidate(tags)
+
+    async def invalidate_async(self, *tags: str) -> None:
+        """
+        invalidate_async invalidate の非同期版。Redis ではイベントループを止めないようにスレッドで呼ぶ。
+
+        generation はすぐに進めるので、待っている間に作り始めたレスポンスも保存されない。
+
+        Args:
+            *tags (str): タグ
+        """
+        if not getattr(self.backend, "blocking", False):
+            self.invalidate(*tags)
+            return
+        with self._lock:
+            self.generation += 1
+        await run_in_threadpool(self.backend.invalidate, tags)
+
+    def clear(self) -> None:
+        """
+        clear キャッシュを空にしてカウンターを戻す
+        """
+        with self._lock:
+            self.generation += 1
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        stats キャッシュの利用状況を取得する
+
+        Returns:
+            dict: バックエンド名、件数、ヒット数、ミス数、ヒット率
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": None if self.backend is None else self.backend.name,
+            "size": 0 if self.backend is None else len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _make_backend():
+    if config.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(config.REDIS_URL, config.RESPONSE_CACHE_TTL)
+    if config.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryBackend(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL)
+    return None
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    get_response_cache レスポンスキャッシュを取得する。初回に config に従って作る。
+
+    Returns:
+        ResponseCache: レスポンスキャッシュ
+    """
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(_make_backend())
+    return _cache
+
+
+def _collect_cache_metrics() -> Iterator[Collected]:
+    """
+    _collect_cache_metrics レスポンスキャッシュのヒット数とミス数を集める
+
+    件数は Redis では全てのキーを数えることになるので出さない。
+
+    Returns:
+        Iterator[Collected]: ヒット数とミス数
+    """
+    if _cache is None:
+        return
+    yield "odaikun_response_cache_hits", "Response cache hits since startup.", _cache.hits
+    yield "odaikun_response_cache_misses", "Response cache misses since startup.", _cache.misses
+
+
+REGISTRY.add_collector(_collect_cache_metrics, "counter")
+
+
+def make_key(path: str, params: Iterable[Tuple[str, str]] = ()) -> str:
+    """
+    make_key パスとクエリパラメーターからキャッシュのキーを作る
+
+    クエリパラメーターは並べ替えるので、順番が違うだけのリクエストは同じキーになる。
+
+    Args:
+        path (str): パス
+        params (Iterable[Tuple[str, str]], optional): クエリパラメーター。初期値は ()。
+
+    Returns:
+        str: キー
+    """
+    query = "&".join(f"{name}={value}" for name, value in sorted(params))
+    return f"{path}?{query}"
+
+
+def cache_key(request: Request) -> str:
+    """
+    cache_key リクエストのパスとクエリ文字列からキャッシュのキーを作る
+
+    Args:
+        request (Request): リクエスト
+
+    Returns:
+        str: キー
+    """
+    return make_key(request.url.path, request.query_params.multi_items())
+
+
+def render_json(content, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+    """
+    render_json 内容をキャッシュできる形のJSONにシリアライズする
+
+    Args:
+        content (Any): dict や list。ModelSerializer で作ったもの。
+        headers (Optional[Dict[str, str]], optional): 本文以外に返すヘッダー。初期値は None。
+
+    Returns:
+        CachedResponse: シリアライズしたレスポンス
+    """
+    return CachedResponse(dumps(content), dict(headers or {}))
+
+
+def invalidate_topic(topic_id: int) -> None:
+    """
+    invalidate_topic お題の作成・編集・削除に合わせて一覧と詳細のキャッシュを捨てる
+
+    Args:
+        topic_id (int): お題のID
+    """
+    get_response_cache().invalidate(TOPICS_TAG, topic_tag(topic_id))
+
+
+async def invalidate_topic_async(topic_id: int) -> None:
+    """
+    invalidate_topic_async invalidate_topic の非同期版
+
+    Args:
+        topic_id (int): お題のID
+    """
+    await get_response_cache().invalidate_async(TOPICS_TAG, topic_tag(topic_id))
+
+
+def clear() -> None:
+    """
+    clear キャッシュを空にする
+    """
+    get_response_cache().clear()
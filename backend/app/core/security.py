@@ -1,17 +1,43 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Optional
 
 import jwt
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+
+from app.core import config
+from app.core.metrics import PASSWORD_VERIFY_SECONDS
+
+if TYPE_CHECKING:  # passlib と bcrypt の import は重いので、使うときまで遅らせる
+    from passlib.context import CryptContext
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 SECRET_KEY = "super_secret"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_pwd_context: Optional["CryptContext"] = None
+
+
+def get_pwd_context() -> "CryptContext":
+    """
+    get_pwd_context パスワードのハッシュに使う CryptContext を取得する。初回に作る。
+
+    Returns:
+        CryptContext: bcrypt の CryptContext
+    """
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 
 def get_password_hash(password: str) -> str:
     """
@@ -23,13 +49,15 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: ハッシュ化されたパスワード
     """
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     verify_password パスワードが正しいか判定する
 
+    かかった時間は PASSWORD_VERIFY_SECONDS に記録する。
+
     Args:
         plain_password (str): 平文のパスワード
         hashed_password (str): ハッシュ化されたパスワード
@@ -37,7 +65,71 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: パスワードが正しいか否か
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return get_pwd_context().verify(plain_password, hashed_password)
+    finally:
+        PASSWORD_VERIFY_SECONDS.observe(time.perf_counter() - started)
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    """
+    _get_hash_executor パスワードのハッシュ計算専用のスレッドプールを取得する
+
+    bcrypt は計算中に GIL を解放するので、スレッドで並列に計算できる。
+
+    Returns:
+        ThreadPoolExecutor: config.PASSWORD_HASH_WORKERS 本のスレッドを持つプール
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+        )
+    return _hash_executor
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    get_password_hash_async イベントループを止めずにパスワードのハッシュを取得する
+
+    Args:
+        password (str): パスワード
+
+    Returns:
+        str: ハッシュ化されたパスワード
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_hash_executor(), get_pwd_context().hash, password
+    )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password_async イベントループを止めずにパスワードが正しいか判定する
+
+    Args:
+        plain_password (str): 平文のパスワード
+        hashed_password (str): ハッシュ化されたパスワード
+
+    Returns:
+        bool: パスワードが正しいか否か
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_hash_executor(), verify_password, plain_password, hashed_password
+    )
+
+
+def shutdown_hash_executor() -> None:
+    """
+    shutdown_hash_executor パスワードのハッシュ計算用のスレッドプールを止める
+    """
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False)
+        _hash_executor = None
 
 
 def create_access_token(*, data: dict, expires_delta: timedelta = None):
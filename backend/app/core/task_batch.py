@@ -0,0 +1,61 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from app.core import config
+from app.core.celery_app import get_celery_app
+
+BATCH_TASK = "app.tasks.run_batch"  #: まとめたタスクを実行するタスクの名前
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """
+    chunked イテラブルを size 件ずつのリストに分ける
+
+    Args:
+        items (Iterable): 分ける要素
+        size (int): 1つのリストの最大件数
+
+    Yields:
+        List: size 件以下のリスト
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def send_batched(
+    task_name: str,
+    argsets: Iterable[Sequence],
+    batch_size: Optional[int] = None,
+    **options,
+) -> List[str]:
+    """
+    send_batched 同じタスクへの多数の小さな呼び出しを batch_size 件ずつ1通のメッセージにまとめて送る
+
+    ブローカーとの往復とメッセージごとのオーバーヘッドが batch_size 分の1になる。
+    ワーカーでは run_batch が1件ずつ実行し、失敗した呼び出しがあっても残りは続ける。
+    送信には1つのプロデューサーを使い回す。
+
+    Args:
+        task_name (str): 実行するタスクの名前
+        argsets (Iterable[Sequence]): 1回の呼び出しごとの位置引数
+        batch_size (Optional[int], optional): 1通にまとめる件数。初期値は None（config.CELERY_BATCH_SIZE）。
+        **options: apply_async に渡すオプション（queue など）
+
+    Returns:
+        List[str]: 送ったメッセージのタスクID
+    """
+    size = batch_size or config.CELERY_BATCH_SIZE
+    celery_app = get_celery_app()
+    task = celery_app.signature(BATCH_TASK)
+    task_ids = []
+    with celery_app.producer_or_acquire() as producer:
+        for chunk in chunked((list(args) for args in argsets), size):
+            result = task.apply_async(
+                args=(task_name, chunk), producer=producer, **options
+            )
+            task_ids.append(result.id)
+    return task_ids
@@ -0,0 +1,21 @@
+import os
+
+from app.core import config
+
+
+def task_file_path(kind: str, filename: str) -> str:
+    """
+    task_file_path API とワーカーで共有するファイルのパスを作る
+
+    config.TASK_FILE_DIR は API とワーカーの両方から見える場所にする。
+
+    Args:
+        kind (str): 用途（imports か exports）
+        filename (str): ファイル名
+
+    Returns:
+        str: ファイルのパス
+    """
+    directory = os.path.join(config.TASK_FILE_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(filename))
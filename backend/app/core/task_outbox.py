@@ -0,0 +1,438 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Iterator, List, NamedTuple, Optional, Sequence
+
+from app.core import config
+from app.core.celery_app import get_celery_app
+from app.core.metrics import (
+    REGISTRY,
+    TASK_SEND_LATENCY_SECONDS,
+    TASK_SEND_SECONDS,
+    TASKS_SENT,
+    Collected,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxFull(Exception):
+    """
+    OutboxFull 送信待ちのタスクが上限に達している
+    """
+
+
+class PublishError(Exception):
+    """
+    PublishError タスクの送信に失敗した
+
+    Args:
+        sent (int): 失敗するまでに送れた件数。先頭からこの件数は送り直さない。
+        permanent (bool): 送り直しても成功しない失敗（引数を直列化できないなど）か
+    """
+
+    def __init__(self, sent: int, permanent: bool = False):
+        super().__init__(f"failed after sending {sent} tasks")
+        self.sent = sent
+        self.permanent = permanent
+
+
+class OutboxMessage(NamedTuple):
+    """
+    OutboxMessage 送信待ちのタスク
+
+    Attributes:
+        task_id (str): タスクID
+        name (str): タスクの名前
+        args (Sequence): 位置引数
+        kwargs (dict): キーワード引数
+        options (dict): send_task に渡すオプション
+        enqueued (float): 送信待ちにした時刻（time.monotonic）
+        attempts (int): 送信に失敗した回数
+    """
+
+    task_id: str
+    name: str
+    args: Sequence
+    kwargs: dict
+    options: dict
+    enqueued: float = 0.0
+    attempts: int = 0
+
+
+def _is_permanent(error: Exception) -> bool:
+    """
+    _is_permanent 送り直しても成功しない失敗か判断する
+
+    Args:
+        error (Exception): 送信中に起きた例外
+
+    Returns:
+        bool: 引数を直列化できないなど、メッセージ自体に問題がある場合は True
+    """
+    from kombu.exceptions import EncodeError
+
+    return isinstance(error, (EncodeError, TypeError))
+
+
+def publish_messages(messages: List[OutboxMessage]) -> None:
+    """
+    publish_messages タスクをまとめてブローカーに送る
+
+    コネクションプールから取ったプロデューサー1つで全て送るので、
+    メッセージごとに接続し直すことはない。送信にかかった時間と、送信待ちにしてから
+    送り終えるまでの時間をメトリクスに記録する。
+
+    Args:
+        messages (List[OutboxMessage]): 送るタスク
+
+    Raises:
+        PublishError: 途中で失敗した。送れた件数を持つ。
+    """
+    started = time.perf_counter()
+    sent = 0
+    try:
+        celery_app = get_celery_app()
+        with celery_app.producer_or_acquire() as producer:
+            for message in messages:
+                celery_app.send_task(
+                    message.name,
+                    args=message.args,
+                    kwargs=message.kwargs,
+                    task_id=message.task_id,
+                    producer=producer,
+                    **message.options,
+                )
+                sent += 1
+    except Exception as e:
+        raise PublishError(sent, _is_permanent(e)) from e
+    finally:
+        TASKS_SENT.inc(sent)
+        now = time.monotonic()
+        for message in messages[:sent]:
+            TASK_SEND_LATENCY_SECONDS.observe(now - message.enqueued)
+    TASK_SEND_SECONDS.observe(time.perf_counter() - started)
+
+
+class TaskOutbox:
+    """
+    TaskOutbox タスクの送信をリクエストから切り離すための送信待ちキュー
+
+    enqueue はメモリ上のキューに積むだけで、ブローカーへの送信はバックグラウンドの
+    スレッドがまとめて行う。キューが maxsize に達したら OutboxFull を投げて、
+    ブローカーが遅いときに送信待ちが際限なく溜まらないようにする。
+    送信に失敗したタスクはキューに戻し、間隔を空けて送り直す。PublishError で
+    途中まで送れたことが分かる場合は、送れたものは戻さず、同じ task_id で
+    二重に実行されないようにする。失敗したタスクが max_attempts 回失敗するか、
+    直列化できないなど送り直しても成功しない場合は、後ろのタスクを止めないように
+    ログに残して捨てる。
+    プロセスが落ちると送信待ちのタスクは失われるので、失ってもよいタスクに使う。
+
+    Args:
+        maxsize (int): 送信待ちにできる最大件数
+        batch_size (int): 1回の送信でまとめて送る最大件数
+        publish (Callable[[List[OutboxMessage]], None], optional): 送信する関数。初期値は publish_messages。
+        retry_interval (float, optional): 送信に失敗したときに待つ最大の秒数。初期値は 5.0。
+        max_attempts (int, optional): 1つのタスクの送信を試す最大回数。初期値は 10。
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        batch_size: int,
+        publish: Callable[[List[OutboxMessage]], None] = publish_messages,
+        retry_interval: float = 5.0,
+        max_attempts: int = 10,
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.rejected = 0
+        self.failures = 0
+        self.dropped = 0
+        self._publish = publish
+        self._queue: Deque[OutboxMessage] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._in_flight = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def enqueue(
+        self,
+        name: str,
+        args: Optional[Sequence] = None,
+        kwargs: Optional[dict] = None,
+        **options,
+    ) -> str:
+        """
+        enqueue タスクを送信待ちにする。ブローカーとの通信はしない。
+
+        Args:
+            name (str): タスクの名前
+            args (Optional[Sequence], optional): 位置引数。初期値は None。
+            kwargs (Optional[dict], optional): キーワード引数。初期値は None。
+            **options: send_task に渡すオプション（queue など）
+
+        Raises:
+            OutboxFull: 送信待ちが maxsize に達している
+            RuntimeError: close 済み
+
+        Returns:
+            str: タスクID
+        """
+        task_id = str(uuid.uuid4())
+        message = OutboxMessage(
+            task_id, name, args or (), kwargs or {}, options, time.monotonic()
+        )
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("task outbox is closed")
+            if len(self._queue) >= self.maxsize:
+                self.rejected += 1
+                raise OutboxFull(f"{len(self._queue)} tasks are waiting to be sent")
+            self._queue.append(message)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="task-outbox", daemon=True
+                )
+                self._thread.start()
+            self._wakeup.notify()
+        return task_id
+
+    def _take(self) -> Optional[List[OutboxMessage]]:
+        """
+        _take 送信待ちのタスクを batch_size 件まで取り出す。無ければ届くまで待つ。
+
+        Returns:
+            Optional[List[OutboxMessage]]: 取り出したタスク。close されて空ならNone。
+        """
+        with self._lock:
+            while not self._queue and not self._closed:
+                self._wakeup.wait()
+            if not self._queue:
+                return None
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._in_flight = len(batch)
+            return batch
+
+    def _requeue(self, batch: List[OutboxMessage], error: Exception) -> bool:
+        """
+        _requeue 送信に失敗したバッチのうち、送れていないタスクをキューの先頭に戻す
+
+        Args:
+            batch (List[OutboxMessage]): 送ろうとしたタスク
+            error (Exception): 送信中に起きた例外
+
+        Returns:
+            bool: 送り直す前に間隔を空けるべきか。捨てたタスクのせいで失敗した場合は False。
+        """
+        sent = error.sent if isinstance(error, PublishError) else 0
+        permanent = isinstance(error, PublishError) and error.permanent
+        failed = batch[sent]._replace(attempts=batch[sent].attempts + 1)
+        rest = batch[sent + 1 :]
+        drop = permanent or failed.attempts >= self.max_attempts
+        if drop:
+            logger.error(
+                "dropped task %s (%s) after %d failed attempts",
+                failed.task_id,
+                failed.name,
+                failed.attempts,
+                exc_info=error,
+            )
+        else:
+            logger.warning("failed to send %d tasks", len(batch) - sent, exc_info=error)
+            rest.insert(0, failed)
+        with self._lock:
+            self.sent += sent
+            self.failures += 1
+            if drop:
+                self.dropped += 1
+            self._queue.extendleft(reversed(rest))
+            self._in_flight = 0
+            if not self._queue:
+                self._idle.notify_all()
+        return not drop
+
+    def _run(self) -> None:
+        """
+        _run 送信待ちのタスクをブローカーに送り続ける
+        """
+        delay = 0.0
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            try:
+                self._publish(batch)
+            except Exception as e:
+                wait = self._requeue(batch, e)
+                with self._lock:
+                    closed = self._closed
+                if closed:
+                    return
+                if wait:
+                    delay = min(self.retry_interval, max(0.1, delay * 2))
+                    self._stopped.wait(delay)
+                continue
+            delay = 0.0
+            with self._lock:
+                self.sent += len(batch)
+                self._in_flight = 0
+                if not self._queue:
+                    self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        flush 送信待ちのタスクが全て送られるまで待つ
+
+        Args:
+            timeout (Optional[float], optional): 待つ最大の秒数。初期値は None（無制限）。
+
+        Returns:
+            bool: 全て送られたか
+        """
+        with self._lock:
+            return self._idle.wait_for(
+                lambda: not self._queue and not self._in_flight, timeout
+            )
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        close 新しいタスクを受け付けるのをやめ、残りを送ってからスレッドを止める
+
+        timeout までに送れなかったタスクは捨てる。
+
+        Args:
+            timeout (Optional[float], optional): 待つ最大の秒数。初期値は 5.0。
+        """
+        self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            dropped = len(self._queue)
+            self._wakeup.notify_all()
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if dropped:
+            logger.warning("%d tasks were still unsent at shutdown", dropped)
+
+    def stats(self) -> dict:
+        """
+        stats 送信待ちの状況を取得する
+
+        Returns:
+            dict: 送信待ちの件数、上限、送信済み、拒否した件数、送信に失敗した回数、
+            送れずに捨てた件数
+        """
+        return {
+            "pending": len(self._queue),
+            "maxsize": self.maxsize,
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+
+_outbox: Optional[TaskOutbox] = None
+
+
+def get_task_outbox() -> TaskOutbox:
+    """
+    get_task_outbox 送信待ちキューを取得する。初回に config に従って作る。
+
+    Returns:
+        TaskOutbox: 送信待ちキュー
+    """
+    global _outbox
+    if _outbox is None:
+        _outbox = TaskOutbox(
+            config.TASK_OUTBOX_SIZE,
+            config.TASK_OUTBOX_BATCH_SIZE,
+            max_attempts=config.TASK_OUTBOX_MAX_ATTEMPTS,
+        )
+    return _outbox
+
+
+def _collect_outbox_gauges() -> Iterator[Collected]:
+    """
+    _collect_outbox_gauges 送信待ちの件数を集める
+
+    Returns:
+        Iterator[Collected]: 送信待ちの件数
+    """
+    if _outbox is None:
+        return
+    yield "odaikun_task_outbox_pending", "Tasks waiting in the outbox.", _outbox.stats()[
+        "pending"
+    ]
+
+
+def _collect_outbox_counters() -> Iterator[Collected]:
+    """
+    _collect_outbox_counters 起動してから拒否した件数、送信に失敗した回数、捨てた件数を集める
+
+    Returns:
+        Iterator[Collected]: 拒否した件数、送信に失敗した回数、捨てた件数
+    """
+    if _outbox is None:
+        return
+    stats = _outbox.stats()
+    yield "odaikun_task_outbox_rejected", "Tasks rejected because the outbox was full.", stats[
+        "rejected"
+    ]
+    yield "odaikun_task_outbox_failures", "Failed attempts to send a batch of tasks.", stats[
+        "failures"
+    ]
+    yield "odaikun_task_outbox_dropped", "Tasks dropped after failing to send.", stats[
+        "dropped"
+    ]
+
+
+REGISTRY.add_collector(_collect_outbox_gauges)
+REGISTRY.add_collector(_collect_outbox_counters, "counter")
+
+
+def enqueue_task(
+    name: str,
+    args: Optional[Sequence] = None,
+    kwargs: Optional[dict] = None,
+    **options,
+) -> str:
+    """
+    enqueue_task タスクを送信待ちキューに積む
+
+    Args:
+        name (str): タスクの名前
+        args (Optional[Sequence], optional): 位置引数。初期値は None。
+        kwargs (Optional[dict], optional): キーワード引数。初期値は None。
+        **options: send_task に渡すオプション（queue など）
+
+    Raises:
+        OutboxFull: 送信待ちが上限に達している
+
+    Returns:
+        str: タスクID
+    """
+    return get_task_outbox().enqueue(name, args, kwargs, **options)
+
+
+def shutdown_task_outbox() -> None:
+    """
+    shutdown_task_outbox 残りのタスクを送ってから送信待ちキューを止める
+    """
+    global _outbox
+    if _outbox is not None:
+        _outbox.close(config.TASK_OUTBOX_SHUTDOWN_TIMEOUT)
+        _outbox = None
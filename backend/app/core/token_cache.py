@@ -0,0 +1,136 @@
+"""
+デコードしたトークンとユーザー情報のキャッシュ
+
+キャッシュはプロセスごとに持つ。invalidate_user が捨てるのは呼んだプロセスの
+キャッシュだけなので、他のワーカーでは権限の変更や無効化、削除が最大で
+config.AUTH_CACHE_TTL 秒遅れて反映される。毎回DBに確かめないための割り切りで、
+すぐに反映したい場合は AUTH_CACHE_TTL を短くする。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.db import models
+
+_tokens = TTLCache(config.AUTH_CACHE_SIZE, config.AUTH_CACHE_TTL)
+_lock = threading.Lock()
+_generation = 0  #: invalidate_user のたびに増える番号
+#: ユーザーIDと、最後に invalidate_user した番号と時刻。AUTH_CACHE_TTL を過ぎたら捨てる。
+_invalidated: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+
+
+def _snapshot(user: models.User) -> models.User:
+    """
+    _snapshot セッションから切り離されたユーザー情報の複製を作る
+
+    Args:
+        user (models.User): DBから取得したユーザー
+
+    Returns:
+        models.User: どのセッションにも属さないユーザー
+    """
+    return models.User(
+        **{
+            column.key: getattr(user, column.key)
+            for column in models.User.__table__.columns
+        }
+    )
+
+
+def current_generation() -> int:
+    """
+    current_generation 今の無効化の番号を取得する
+
+    DBからユーザーを読む前に取得して cache_user に渡すと、読んでいる間に
+    invalidate_user されたユーザーをキャッシュし直さずに済む。
+
+    Returns:
+        int: 無効化の番号
+    """
+    return _generation
+
+
+def _invalidated_since(user_id: int, generation: int) -> bool:
+    entry = _invalidated.get(user_id)
+    return entry is not None and entry[0] > generation
+
+
+def get_cached_user(token: str) -> Optional[models.User]:
+    """
+    get_cached_user トークンに対応するキャッシュ済みのユーザーを取得する
+
+    Args:
+        token (str): JWTトークン
+
+    Returns:
+        Optional[models.User]: ユーザー。キャッシュに無い場合はNone。
+    """
+    entry = _tokens.get(token)
+    if entry is None:
+        return None
+    _, user, generation = entry
+    with _lock:
+        invalidated = _invalidated_since(user.id, generation)
+    if invalidated:
+        _tokens.pop(token)
+        return None
+    return user
+
+
+def cache_user(token: str, payload: dict, user: models.User, generation: int) -> None:
+    """
+    cache_user デコードしたトークンとユーザーをキャッシュする
+
+    有効期限は config.AUTH_CACHE_TTL とトークンの残り時間の短い方とする。
+    generation の後にこのユーザーが invalidate_user されていればキャッシュしない。
+
+    Args:
+        token (str): JWTトークン
+        payload (dict): デコードしたトークンの中身
+        user (models.User): トークンに対応するユーザー
+        generation (int): ユーザーを読む前に current_generation で取得した番号
+    """
+    ttl = float(config.AUTH_CACHE_TTL)
+    exp = payload.get("exp")
+    if exp is not None:
+        ttl = min(ttl, exp - time.time())
+    with _lock:
+        if _invalidated_since(user.id, generation):
+            return
+    _tokens.set(token, (payload, _snapshot(user), generation), ttl=ttl)
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    invalidate_user 指定したユーザーのキャッシュをこのプロセスで使わないようにする
+
+    トークンごとには捨てず、ユーザーIDと番号を記録して、それより前に
+    キャッシュしたものを get_cached_user で読んだときに捨てる。
+    記録は AUTH_CACHE_TTL を過ぎれば要らなくなるので、そのときに捨てる。
+
+    Args:
+        user_id (int): ユーザーID
+    """
+    global _generation
+    now = time.monotonic()
+    with _lock:
+        _generation += 1
+        _invalidated.pop(user_id, None)
+        _invalidated[user_id] = (_generation, now)
+        while _invalidated:
+            _, (_, invalidated_at) = next(iter(_invalidated.items()))
+            if now - invalidated_at <= config.AUTH_CACHE_TTL:
+                break
+            _invalidated.popitem(last=False)
+
+
+def clear() -> None:
+    """
+    clear キャッシュを空にする
+    """
+    _tokens.clear()
+    with _lock:
+        _invalidated.clear()
@@ -0,0 +1,319 @@
+import csv
+import datetime
+import io
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.response_cache import TOPICS_TAG, get_response_cache
+from app.db import models
+from app.db.crud.table_version_crud import bump_table_version
+from app.db.schemas.topics import TopicCreate, TopicImportError, TopicImportResult
+from app.db.search import reset_fallback_index
+from app.db.topic_pool import reset_topic_pool
+
+MAX_REPORTED_ERRORS = 1000  #: 結果に含める失敗した行の最大件数
+
+INSERT_COLUMNS = (
+    "topic",
+    "picture_url",
+    "post_date",
+    "is_visible",
+    "is_adopted",
+    "contributor_id",
+)  #: 一括登録で書き込む列
+
+Record = Union[Dict[str, Any], str]  #: 読み込んだ行か、読み込めなかった理由
+
+INVALID_ENCODING = "Line is not valid UTF-8"  #: 文字コードが正しくない行の理由
+_UNDECODABLE = re.compile("[\udc80-\udcff]")  #: surrogateescape で残したバイト
+
+
+def decode_lines(lines: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """
+    decode_lines バイナリのファイルを1行ずつ文字列にする
+
+    行は b"\\n" でだけ区切るので、JSON の文字列に含まれる U+2028 などで分かれない。
+    先頭の BOM は取り除く。文字コードとして正しくないバイトは例外にせず
+    surrogateescape で残し、iter_ndjson と iter_csv がその行を失敗にする。
+    途中でやめると、それまでのまとまりだけがコミットされて結果が返らないため。
+
+    Args:
+        lines (Iterable[bytes]): バイナリのファイル
+        encoding (str, optional): 文字コード。初期値は "utf-8"。
+
+    Yields:
+        str: 行
+    """
+    first = True
+    for line in lines:
+        if first:
+            first = False
+            if line.startswith(b"\xef\xbb\xbf"):
+                line = line[3:]
+        yield line.decode(encoding, "surrogateescape")
+
+
+def iter_ndjson(lines: Iterable[str]) -> Iterator[Tuple[int, Record]]:
+    """
+    iter_ndjson NDJSON を1行ずつ読む。空行は読み飛ばす。
+
+    decode_lines で残した正しくないバイトを含む行は、読み込めなかった理由を返す。
+
+    Args:
+        lines (Iterable[str]): NDJSON の行
+
+    Yields:
+        Tuple[int, Record]: 行番号と、読み込んだ行か読み込めなかった理由
+    """
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        if _UNDECODABLE.search(line):
+            yield line_no, INVALID_ENCODING
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Each line must be a JSON object"
+            continue
+        yield line_no, record
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Record]]:
+    """
+    iter_csv ヘッダー付きの CSV を1行ずつ読む。空欄は値が無いものとして扱う。
+
+    decode_lines で残した正しくないバイトを含む行は、読み込めなかった理由を返す。
+
+    Args:
+        lines (Iterable[str]): CSV の行
+
+    Yields:
+        Tuple[int, Record]: 行番号と読み込んだ行
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        if any(
+            isinstance(value, str) and _UNDECODABLE.search(value)
+            for value in row.values()
+        ):
+            yield reader.line_num, INVALID_ENCODING
+            continue
+        yield reader.line_num, {
+            key: value for key, value in row.items() if key and value != ""
+        }
+
+
+def iter_records(file: Iterable[str], file_format: str) -> Iterator[Tuple[int, Record]]:
+    """
+    iter_records 形式に合わせてファイルを1行ずつ読む
+
+    Args:
+        file (Iterable[str]): 読み込むファイル。改行は変換せずに1行ずつ返すもの。
+        file_format (str): ndjson か csv
+
+    Raises:
+        ValueError: 未対応の形式である旨のエラー
+
+    Returns:
+        Iterator[Tuple[int, Record]]: 行番号と、読み込んだ行か読み込めなかった理由
+    """
+    if file_format == "ndjson":
+        return iter_ndjson(file)
+    if file_format == "csv":
+        return iter_csv(file)
+    raise ValueError(f"Unsupported format: {file_format}")
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+class TopicImporter:
+    """
+    TopicImporter お題を検証しながら batch_size 件ずつまとめて登録する
+
+    検証は TopicCreate で1行ずつ行い、投稿者が存在するかはまとめてから1回の
+    問い合わせで確かめる。登録は PostgreSQL では COPY、それ以外では executemany で
+    1回の往復で行い、まとまりごとにコミットする。まとまりの登録に失敗した場合は
+    1件ずつ登録し直して、失敗した行だけをエラーにする。
+
+    Args:
+        db (Session): DB接続
+        default_contributor_id (int): 投稿者が指定されていない行の投稿者のID
+        batch_size (int, optional): まとめて登録する件数。初期値は 1000。
+    """
+
+    def __init__(
+        self, db: Session, default_contributor_id: int, batch_size: int = 1000
+    ):
+        self.db = db
+        self.default_contributor_id = default_contributor_id
+        self.batch_size = batch_size
+        self.result = TopicImportResult()
+        self._pending: List[Tuple[int, Dict[str, Any]]] = []
+        self._today = datetime.date.today()
+
+    def _fail(self, line: int, message: str) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(TopicImportError(line=line, message=message))
+
+    def add(self, line: int, record: Record) -> None:
+        """
+        add 1行を検証して登録待ちにする。batch_size 件たまったら登録する。
+
+        Args:
+            line (int): 行番号
+            record (Record): 読み込んだ行か、読み込めなかった理由
+        """
+        if isinstance(record, str):
+            self._fail(line, record)
+            return
+        record.setdefault("post_date", self._today)
+        record.setdefault("contributor_id", self.default_contributor_id)
+        try:
+            topic = TopicCreate(**record)
+        except ValidationError as e:
+            self._fail(line, _validation_message(e))
+            return
+        row = topic.dict(include=set(INSERT_COLUMNS))
+        if row["picture_url"] is not None:
+            row["picture_url"] = str(row["picture_url"])
+        self._pending.append((line, row))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_all(self, records: Iterable[Tuple[int, Record]]) -> TopicImportResult:
+        """
+        add_all 全ての行を登録して結果を返す
+
+        Args:
+            records (Iterable[Tuple[int, Record]]): 行番号と読み込んだ行の組
+
+        Returns:
+            TopicImportResult: 一括登録の結果
+        """
+        for line, record in records:
+            self.add(line, record)
+        return self.finish()
+
+    def flush(self) -> None:
+        """
+        flush 登録待ちの行をまとめて登録してコミットする
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        contributor_ids = {row["contributor_id"] for _, row in pending}
+        existing = {
+            user_id
+            for user_id, in self.db.query(models.User.id).filter(
+                models.User.id.in_(contributor_ids)
+            )
+        }
+        batch = []
+        for line, row in pending:
+            if row["contributor_id"] in existing:
+                batch.append((line, row))
+            else:
+                self._fail(
+                    line, f"contributor_id: user {row['contributor_id']} not found"
+                )
+        if not batch:
+            return
+        try:
+            self._insert([row for _, row in batch])
+        except SQLAlchemyError:
+            self.db.rollback()
+            self._insert_one_by_one(batch)
+            return
+        self.result.inserted += len(batch)
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        if self.db.get_bind().dialect.name == "postgresql":
+            self._copy(rows)
+        else:
+            self.db.execute(models.Topic.__table__.insert(), rows)
+        bump_table_version(self.db, models.Topic.__tablename__)
+        self.db.commit()
+
+    def _copy(self, rows: List[Dict[str, Any]]) -> None:
+        # CSV では引用符の無い空欄が NULL になるので、本文の空文字列は FORCE_NOT_NULL で
+        # 空文字列のまま入れる。picture_url の None は NULL のままにする。
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for row in rows:
+            writer.writerow(row[column] for column in INSERT_COLUMNS)
+        buffer.seek(0)
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY topic ({', '.join(INSERT_COLUMNS)}) FROM STDIN"
+                " WITH (FORMAT csv, FORCE_NOT_NULL (topic))",
+                buffer,
+            )
+        except Exception as e:
+            raise SQLAlchemyError(str(e)) from e
+        finally:
+            cursor.close()
+
+    def _insert_one_by_one(self, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for line, row in batch:
+            try:
+                self.db.execute(models.Topic.__table__.insert(), row)
+                bump_table_version(self.db, models.Topic.__tablename__)
+                self.db.commit()
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                self._fail(line, str(getattr(e, "orig", e)).strip())
+            else:
+                self.result.inserted += 1
+
+    def finish(self) -> TopicImportResult:
+        """
+        finish 残りの行を登録し、キャッシュや索引を捨てて結果を返す
+
+        Returns:
+            TopicImportResult: 一括登録の結果
+        """
+        self.flush()
+        if self.result.inserted:
+            get_response_cache().invalidate(TOPICS_TAG)
+            reset_topic_pool()
+            reset_fallback_index()
+        return self.result
+
+
+def import_topics(
+    db: Session,
+    file: Iterable[str],
+    file_format: str,
+    default_contributor_id: int,
+    batch_size: int = 1000,
+) -> TopicImportResult:
+    """
+    import_topics NDJSON か CSV のファイルからお題を一括登録する
+
+    Args:
+        db (Session): DB接続
+        file (Iterable[str]): 読み込むファイル。改行は変換せずに1行ずつ返すもの。
+        file_format (str): ndjson か csv
+        default_contributor_id (int): 投稿者が指定されていない行の投稿者のID
+        batch_size (int, optional): まとめて登録する件数。初期値は 1000。
+
+    Returns:
+        TopicImportResult: 一括登録の結果
+    """
+    importer = TopicImporter(db, default_contributor_id, batch_size)
+    return importer.add_all(iter_records(file, file_format))
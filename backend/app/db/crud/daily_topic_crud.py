@@ -0,0 +1,296 @@
+import datetime
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.core import config
+from app.core.response_cache import invalidate_topic
+from app.db import models
+from app.db.crud.table_version_crud import bump_table_version
+from app.db.session import run_sync
+from app.db.topic_pool import refresh_topic
+
+DAILY_TOPIC_LOCK = 0x64747063  #: 採用お題を選ぶときの勧告的ロックの名前空間（"dtpc"）
+
+
+class Candidate(NamedTuple):
+    """
+    Candidate 採用お題の候補
+
+    Attributes:
+        id (int): お題のID
+        contributor_id (Optional[int]): 投稿者のユーザーID
+        post_date (Optional[datetime.date]): 投稿日
+    """
+
+    id: int
+    contributor_id: Optional[int]
+    post_date: Optional[datetime.date]
+
+
+class Weights(NamedTuple):
+    """
+    Weights 採用お題を選ぶときの重み付けの設定
+
+    候補の重みは 1 + age * 古さ + fairness * 公平さ とする。古さは投稿からの日数を
+    age_horizon_days で割って 1 で頭打ちにした値、公平さは投稿者がこれまでに
+    採用された件数を n として 1 / (1 + n) とする。
+
+    Attributes:
+        age (float): 古さの重み
+        age_horizon_days (int): 古さが最大になる日数
+        fairness (float): 公平さの重み
+        max_per_contributor (int): 1日に同じ投稿者から選ぶ最大件数
+    """
+
+    age: float
+    age_horizon_days: int
+    fairness: float
+    max_per_contributor: int
+
+    @classmethod
+    def from_config(cls) -> "Weights":
+        """
+        from_config config の値から作る
+
+        Returns:
+            Weights: 重み付けの設定
+        """
+        return cls(
+            config.DAILY_TOPIC_AGE_WEIGHT,
+            config.DAILY_TOPIC_AGE_HORIZON_DAYS,
+            config.DAILY_TOPIC_FAIRNESS_WEIGHT,
+            config.DAILY_TOPIC_MAX_PER_CONTRIBUTOR,
+        )
+
+    def weight(
+        self, candidate: Candidate, day: datetime.date, adopted_count: int
+    ) -> float:
+        """
+        weight 候補の重みを計算する
+
+        Args:
+            candidate (Candidate): 候補
+            day (datetime.date): 選ぶ日
+            adopted_count (int): 投稿者がこれまでに採用された件数
+
+        Returns:
+            float: 重み（1以上）
+        """
+        age = 0.0
+        if candidate.post_date is not None and self.age_horizon_days > 0:
+            days = (day - candidate.post_date).days
+            age = min(max(days, 0) / self.age_horizon_days, 1.0)
+        fairness = 1.0 / (1 + adopted_count)
+        return 1.0 + self.age * age + self.fairness * fairness
+
+
+def pick_topics(
+    candidates: Iterable[Candidate],
+    adopted_counts: Dict[Optional[int], int],
+    day: datetime.date,
+    count: int,
+    weights: Weights,
+) -> List[Tuple[Candidate, float]]:
+    """
+    pick_topics 候補から重みに比例した確率で count 件を重複なく選ぶ
+
+    Efraimidis-Spirakis の方法で、候補ごとに乱数 u から u ** (1 / 重み) を作り、
+    大きい順に取る。乱数の種は日付にするので、同じ候補からは同じ日に同じお題が選ばれる。
+
+    Args:
+        candidates (Iterable[Candidate]): 候補
+        adopted_counts (Dict[Optional[int], int]): 投稿者ごとのこれまでに採用された件数
+        day (datetime.date): 選ぶ日
+        count (int): 選ぶ件数
+        weights (Weights): 重み付けの設定
+
+    Returns:
+        List[Tuple[Candidate, float]]: 選ばれた候補と重みの組。選ばれた順。
+    """
+    rng = random.Random(day.toordinal())
+    keyed = []
+    for candidate in candidates:
+        weight = weights.weight(
+            candidate, day, adopted_counts.get(candidate.contributor_id, 0)
+        )
+        keyed.append((rng.random() ** (1.0 / weight), candidate, weight))
+    keyed.sort(key=lambda item: item[0], reverse=True)
+
+    picked: List[Tuple[Candidate, float]] = []
+    per_contributor: Counter = Counter()
+    for _, candidate, weight in keyed:
+        if len(picked) >= count:
+            break
+        if per_contributor[candidate.contributor_id] >= weights.max_per_contributor:
+            continue
+        per_contributor[candidate.contributor_id] += 1
+        picked.append((candidate, weight))
+    return picked
+
+
+def get_daily_topics(
+    db: Session, day: datetime.date
+) -> Tuple[Optional[datetime.date], List[models.Topic]]:
+    """
+    get_daily_topics day 以前で最も新しい日に選ばれた採用お題を取得する
+
+    その日の選定がまだ終わっていなくても、前の日の結果を返せるようにする。
+    削除されたお題は除く。
+
+    Args:
+        db (Session): DB接続
+        day (datetime.date): 日付
+
+    Returns:
+        Tuple[Optional[datetime.date], List[models.Topic]]:
+            選ばれた日とお題のリスト。一度も選ばれていない場合は (None, [])。
+    """
+    latest = (
+        db.query(func.max(models.DailyTopic.day))
+        .filter(models.DailyTopic.day <= day)
+        .scalar()
+    )
+    if latest is None:
+        return None, []
+    rows = (
+        db.query(models.DailyTopic)
+        .options(joinedload(models.DailyTopic.topic))
+        .filter(models.DailyTopic.day == latest)
+        .order_by(models.DailyTopic.position)
+        .all()
+    )
+    return latest, [row.topic for row in rows if row.topic.is_visible]
+
+
+def _lock_day(db: Session, day: datetime.date) -> None:
+    """
+    _lock_day その日の採用お題を選ぶ処理をトランザクションの終わりまで1つにする
+
+    PostgreSQL では日付ごとの勧告的ロックを取る。後から来た方はロックを待ち、
+    先に選ばれた分を読んでそれを返すので、主キーの重複にならない。
+    SQLite は書き込みがデータベース全体で直列になるので何もしない。
+
+    Args:
+        db (Session): DB接続
+        day (datetime.date): 選ぶ日
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            select([func.pg_advisory_xact_lock(DAILY_TOPIC_LOCK, day.toordinal())])
+        )
+
+
+def select_daily_topics(
+    db: Session,
+    day: datetime.date,
+    count: Optional[int] = None,
+    weights: Optional[Weights] = None,
+    force: bool = False,
+) -> List[models.Topic]:
+    """
+    select_daily_topics その日の採用お題を選び、daily_topic に保存して採用済みにする
+
+    候補は見える状態でまだ採用されておらず、day までに投稿されたお題。
+    その日の分が既にある場合は、force でなければ選び直さずにそれを返す。
+    force で選び直す場合は、前に選んだお題の採用を取り消してから選ぶ。
+    候補はIDの順に読むので、同じ日・同じ候補なら同じお題が選ばれる。
+    beat と手動の実行が重なっても、同じ日の分はコミットまで1つずつ選ぶ。
+
+    Args:
+        db (Session): DB接続
+        day (datetime.date): 選ぶ日
+        count (Optional[int], optional): 選ぶ件数。初期値は None（config.DAILY_TOPIC_COUNT）。
+        weights (Optional[Weights], optional): 重み付けの設定。初期値は None（config の値）。
+        force (bool, optional): その日の分を選び直すか。初期値は False。
+
+    Returns:
+        List[models.Topic]: 選ばれたお題のリスト
+    """
+    _lock_day(db, day)
+    existing = (
+        db.query(models.DailyTopic)
+        .filter(models.DailyTopic.day == day)
+        .order_by(models.DailyTopic.position)
+        .all()
+    )
+    if existing and not force:
+        return [row.topic for row in existing]
+    previous_ids = [row.topic_id for row in existing]
+    if previous_ids:
+        db.query(models.Topic).filter(models.Topic.id.in_(previous_ids)).update(
+            {models.Topic.is_adopted: False}, synchronize_session=False
+        )
+
+    adopted_counts = dict(
+        db.query(models.Topic.contributor_id, func.count(models.Topic.id))
+        .filter(models.Topic.is_adopted)
+        .group_by(models.Topic.contributor_id)
+        .all()
+    )
+    candidates = (
+        Candidate(*row)
+        for row in db.query(
+            models.Topic.id, models.Topic.contributor_id, models.Topic.post_date
+        )
+        .filter(
+            models.Topic.is_visible,
+            models.Topic.is_adopted.isnot(True),
+            models.Topic.post_date <= day,
+        )
+        .order_by(models.Topic.id)
+        .yield_per(1000)
+    )
+    picked = pick_topics(
+        candidates,
+        adopted_counts,
+        day,
+        config.DAILY_TOPIC_COUNT if count is None else count,
+        weights or Weights.from_config(),
+    )
+
+    for row in existing:
+        db.delete(row)
+    db.flush()
+    for position, (candidate, weight) in enumerate(picked):
+        db.add(
+            models.DailyTopic(
+                day=day, position=position, topic_id=candidate.id, weight=weight
+            )
+        )
+    topic_ids = [candidate.id for candidate, _ in picked]
+    if topic_ids:
+        db.query(models.Topic).filter(models.Topic.id.in_(topic_ids)).update(
+            {models.Topic.is_adopted: True}, synchronize_session=False
+        )
+    bump_table_version(db, models.Topic.__tablename__)
+    db.commit()
+
+    changed = set(topic_ids) | set(previous_ids)
+    found: Dict[int, models.Topic] = {}
+    if changed:
+        for topic in db.query(models.Topic).filter(models.Topic.id.in_(changed)):
+            refresh_topic(topic)
+            invalidate_topic(topic.id)
+            found[topic.id] = topic
+    return [found[topic_id] for topic_id in topic_ids]
+
+
+async def get_daily_topics_async(
+    db, day: datetime.date
+) -> Tuple[Optional[datetime.date], List[models.Topic]]:
+    """
+    get_daily_topics_async get_daily_topics の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        day (datetime.date): 日付
+
+    Returns:
+        Tuple[Optional[datetime.date], List[models.Topic]]:
+            選ばれた日とお題のリスト。一度も選ばれていない場合は (None, [])。
+    """
+    return await run_sync(db, get_daily_topics, day)
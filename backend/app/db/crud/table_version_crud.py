@@ -0,0 +1,75 @@
+import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.session import run_sync
+
+
+def get_table_version(
+    db: Session, name: str
+) -> Tuple[int, Optional[datetime.datetime]]:
+    """
+    get_table_version テーブルの更新番号と最終更新日時を取得する
+
+    Args:
+        db (Session): DB接続
+        name (str): テーブル名
+
+    Returns:
+        Tuple[int, Optional[datetime.datetime]]:
+            更新番号と最終更新日時。一度も更新されていない場合は (0, None)。
+    """
+    row = (
+        db.query(models.TableVersion.version, models.TableVersion.updated_at)
+        .filter(models.TableVersion.name == name)
+        .first()
+    )
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def bump_table_version(db: Session, name: str) -> None:
+    """
+    bump_table_version テーブルの更新番号を1つ進める
+
+    コミットはしないので、テーブルを更新するのと同じトランザクションで呼ぶ。
+    同じテーブルへの書き込みはこの行のロックでコミットまで直列になる。
+
+    Args:
+        db (Session): DB接続
+        name (str): テーブル名
+    """
+    updated = (
+        db.query(models.TableVersion)
+        .filter(models.TableVersion.name == name)
+        .update(
+            {
+                models.TableVersion.version: models.TableVersion.version + 1,
+                models.TableVersion.updated_at: func.now(),
+            },
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        db.add(models.TableVersion(name=name, version=1, updated_at=func.now()))
+
+
+async def get_table_version_async(
+    db, name: str
+) -> Tuple[int, Optional[datetime.datetime]]:
+    """
+    get_table_version_async get_table_version の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        name (str): テーブル名
+
+    Returns:
+        Tuple[int, Optional[datetime.datetime]]:
+            更新番号と最終更新日時。一度も更新されていない場合は (0, None)。
+    """
+    return await run_sync(db, get_table_version, name)
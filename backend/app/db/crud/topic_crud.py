@@ -1,10 +1,55 @@
 import datetime
+from typing import Any, Iterator, Optional, Tuple
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload
 
+from app.core.pagination import Cursor
+from app.core.response_cache import invalidate_topic, invalidate_topic_async
 from app.db import models
+from app.db.crud.table_version_crud import bump_table_version
 from app.db.schemas import topics, users
+from app.db.search import index_topic, search_topics
+from app.db.session import run_sync
+from app.db.topic_pool import get_topic_pool, refresh_topic
+
+
+def _load_contributor(query, with_contributor: bool):
+    """
+    _load_contributor 投稿者を同じクエリで読み込むようにする
+
+    投稿者は多対一なので、行が増えない joinedload で一緒に取得する。
+    これをしないと、お題ごとに投稿者を取得する SELECT が発行される。
+
+    Args:
+        query (Query): お題のクエリ
+        with_contributor (bool): 投稿者を一緒に読み込むか
+
+    Returns:
+        Query: お題のクエリ
+    """
+    if with_contributor:
+        return query.options(joinedload(models.Topic.contributor))
+    return query
+
+
+def keyset_before(post_date: Any, topic_id: Any, after: Cursor) -> Any:
+    """
+    keyset_before (投稿日, ID) がカーソルより前の行に絞り込む条件を作る
+
+    行値の比較にすると、PostgreSQL は (post_date DESC, id DESC) の索引を
+    範囲で辿れる。OR で書くとカーソルより前の行を全て読んで捨てることになる。
+
+    Args:
+        post_date (Any): 投稿日の列
+        topic_id (Any): IDの列
+        after (Cursor): 前のページの末尾を表す (投稿日, ID) の組
+
+    Returns:
+        Any: WHERE に渡す条件
+    """
+    return tuple_(post_date, topic_id) < after
 
 
 def get_topic(db: Session, topic_id: int):
@@ -27,96 +72,166 @@ def get_topic(db: Session, topic_id: int):
     return topic
 
 
-def get_topics(db: Session):
+def get_topics(
+    db: Session,
+    limit: Optional[int] = None,
+    after: Optional[Cursor] = None,
+    with_contributor: bool = False,
+):
     """
     get_topics 見える状態のお題一覧を取得する
 
+    limit を指定した場合は (post_date, id) の降順に並べ、
+    after で指定したカーソルより後ろのお題を最大 limit 件取得する。
+    post_date は NOT NULL なので、行値の比較で NULL の行を取りこぼすことは無い。
+
     Args:
         db (Session): DB接続
+        limit (Optional[int], optional): 最大件数。初期値は None（全件）。
+        after (Optional[Cursor], optional):
+            前のページの末尾を表す (投稿日, ID) の組。初期値は None。
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
 
     Returns:
         Any: 見える状態のお題一覧
     """
-    return db.query(models.Topic).filter(models.Topic.is_visible).all()
+    query = db.query(models.Topic).filter(models.Topic.is_visible)
+    query = _load_contributor(query, with_contributor)
+    if limit is None and after is None:
+        return query.all()
+    if after is not None:
+        query = query.filter(
+            keyset_before(models.Topic.post_date, models.Topic.id, after)
+        )
+    query = query.order_by(models.Topic.post_date.desc(), models.Topic.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
-def get_all_topics(db: Session):
+def get_all_topics(db: Session, with_contributor: bool = False):
     """
     get_all_topics 全てのお題一覧を取得する
 
     Args:
         db (Session): DB接続
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
 
     Returns:
         Any: 全てのお題一覧
     """
-    return db.query(models.Topic).all()
+    return _load_contributor(db.query(models.Topic), with_contributor).all()
+
+
+EXPORT_COLUMNS = (
+    models.Topic.id,
+    models.Topic.topic,
+    models.Topic.picture_url,
+    models.Topic.post_date,
+    models.Topic.is_visible,
+    models.Topic.is_adopted,
+    models.Topic.contributor_id,
+)  #: iter_all_topics が返す列
+
+
+def iter_all_topics(
+    db: Session, include_hidden: bool = True, batch_size: int = 1000
+) -> Iterator[Tuple]:
+    """
+    iter_all_topics 全てのお題を少しずつ読みながら1行ずつ返す
+
+    サーバーサイドカーソルから batch_size 件ずつ取り出し、ORM のオブジェクトは
+    作らずに EXPORT_COLUMNS の値の組を返すので、件数に依らずメモリ使用量は一定。
+
+    Args:
+        db (Session): DB接続
+        include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は True。
+        batch_size (int, optional): 1回に取り出す件数。初期値は 1000。
+
+    Yields:
+        Tuple: EXPORT_COLUMNS の値の組
+    """
+    query = db.query(*EXPORT_COLUMNS)
+    if not include_hidden:
+        query = query.filter(models.Topic.is_visible)
+    query = query.order_by(models.Topic.id)
+    yield from query.execution_options(stream_results=True).yield_per(batch_size)
 
 
-def get_topics_by_user(db: Session, user_id: int):
+def get_topics_by_user(db: Session, user_id: int, with_contributor: bool = False):
     """
     get_topics_by_user 指定したIDのユーザーが作成した未削除のお題一覧を取得する
 
     Args:
         db (Session): DB接続
         user_id (int): ユーザーID
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
 
     Returns:
         Any: 指定したユーザーIDのユーザーが作成したお題一覧
     """
     return (
-        db.query(models.Topic)
+        _load_contributor(db.query(models.Topic), with_contributor)
         .filter(models.Topic.is_visible)
         .filter(models.Topic.contributor_id == user_id)
         .all()
     )
 
 
-def get_all_topics_by_user(db: Session, user_id: int):
+def get_all_topics_by_user(db: Session, user_id: int, with_contributor: bool = False):
     """
     get_all_topics_by_user 指定したIDのユーザーが作成した全てのお題を取得する
 
     Args:
         db (Session): DB接続
         user_id (int): ユーザーID
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
 
     Returns:
         Any: 指定したIDのユーザーが作成した全てのお題
     """
-    return db.query(models.Topic).filter(models.Topic.contributor_id == user_id).all()
+    return (
+        _load_contributor(db.query(models.Topic), with_contributor)
+        .filter(models.Topic.contributor_id == user_id)
+        .all()
+    )
 
 
-def get_adopted_topics(db: Session):
+def get_adopted_topics(db: Session, with_contributor: bool = False):
     """
     get_adopted_topics 採用済みのお題一覧を取得する
 
     Args:
         db (Session): DB接続
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
 
     Returns:
         Any: 採用済みのお題一覧
     """
     return (
-        db.query(models.Topic)
+        _load_contributor(db.query(models.Topic), with_contributor)
         .filter(models.Topic.is_visible)
         .filter(models.Topic.is_adopted)
         .all()
     )
 
 
-def get_adopted_topics_by_user(db: Session, user_id: int):
+def get_adopted_topics_by_user(
+    db: Session, user_id: int, with_contributor: bool = False
+):
     """
     get_adopted_topics_by_user 指定したIDのユーザーが作成した採用済みのお題を取得する
 
     Args:
         db (Session): DB接続
         user_id (int): ユーザーID
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
 
     Returns:
         Any: 指定したIDのユーザーが作成した採用済みのお題
     """
     return (
-        db.query(models.Topic)
+        _load_contributor(db.query(models.Topic), with_contributor)
         .filter(models.Topic.is_visible)
         .filter(models.Topic.contributor_id == user_id)
         .filter(models.Topic.is_adopted)
@@ -126,7 +241,7 @@ def get_adopted_topics_by_user(db: Session, user_id: int):
 
 def get_topics_by_keyword(db: Session, keyword: str):
     """
-    get_topics_by_keyword 指定したキーワードを含む未削除のお題一覧を取得する
+    get_topics_by_keyword 指定したキーワードを含む未削除のお題一覧を関連度の高い順に取得する
 
     Args:
         db (Session): DB接続
@@ -135,17 +250,12 @@ def get_topics_by_keyword(db: Session, keyword: str):
     Returns:
         Any: 指定したキーワードを含むお題一覧
     """
-    return (
-        db.query(models.Topic)
-        .filter(models.Topic.is_visible)
-        .filter(models.Topic.topic.like("%\\" + keyword + "%", escape="\\"))
-        .all()
-    )
+    return search_topics(db, keyword)
 
 
 def get_all_topics_by_keyword(db: Session, keyword: str):
     """
-    get_all_topics_by_keyword 指定したキーワードを含む全てのお題一覧を取得する
+    get_all_topics_by_keyword 指定したキーワードを含む全てのお題一覧を関連度の高い順に取得する
 
     Args:
         db (Session): DB接続
@@ -154,14 +264,52 @@ def get_all_topics_by_keyword(db: Session, keyword: str):
     Returns:
         Any: 指定したキーワードを含む全てのお題一覧
     """
-    return (
-        db.query(models.Topic)
-        .filter(models.Topic.topic.like("%\\" + keyword + "%", escape="\\"))
-        .all()
-    )
+    return search_topics(db, keyword, include_hidden=True)
+
+
+def get_random_topic(
+    db: Session,
+    adopted: Optional[bool] = None,
+    contributor_id: Optional[int] = None,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+):
+    """
+    get_random_topic 条件に合う見える状態のお題を1つ無作為に取得する
 
+    お題はメモリ上のプールから引くので、ORDER BY random() のような全件走査はしない。
+    他のワーカーで削除されたお題を引いた場合はプールから取り除いて引き直す。
 
-def create_topic(db: Session, topic: topics.TopicCreate, current_user: users.User):
+    Args:
+        db (Session): DB接続
+        adopted (Optional[bool], optional): 採用済みかで絞り込む。初期値は None。
+        contributor_id (Optional[int], optional): 投稿者のIDで絞り込む。初期値は None。
+        since (Optional[datetime.date], optional): この日以降の投稿に絞り込む。
+        until (Optional[datetime.date], optional): この日以前の投稿に絞り込む。
+
+    Raises:
+        HTTPException: 条件に合うお題が見つからない旨のHTTP 404 エラー
+
+    Returns:
+        Topic: 無作為に選ばれたお題
+    """
+    pool = get_topic_pool(db)
+    while True:
+        topic_id = pool.draw(adopted, contributor_id, since, until)
+        if topic_id is None:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        topic = db.query(models.Topic).filter(models.Topic.id == topic_id).first()
+        if topic is not None and topic.is_visible:
+            return topic
+        pool.remove(topic_id)
+
+
+def create_topic(
+    db: Session,
+    topic: topics.TopicCreate,
+    current_user: users.User,
+    invalidate: bool = True,
+):
     """
     create_topic お題を投稿する
 
@@ -169,6 +317,9 @@ def create_topic(db: Session, topic: topics.TopicCreate, current_user: users.Use
         db (Session): DB接続
         topic (topics.TopicCreate): お題
         current_user (users.User): 現在ログインしているユーザーの情報
+        invalidate (bool, optional):
+            レスポンスキャッシュを捨てるか。初期値は True。非同期版はイベントループを
+            止めないように自分で捨てるので False を渡す。
 
     Raises:
         HTTPException: 認証していない旨の HTTP 401 エラー
@@ -186,13 +337,22 @@ def create_topic(db: Session, topic: topics.TopicCreate, current_user: users.Use
         contributor_id=topic.contributor_id,
     )
     db.add(db_topic)
+    bump_table_version(db, models.Topic.__tablename__)
     db.commit()
     db.refresh(db_topic)
+    index_topic(db, db_topic)
+    refresh_topic(db_topic)
+    if invalidate:
+        invalidate_topic(db_topic.id)
     return db_topic
 
 
 def edit_topic(
-    db: Session, topic_id: int, topic: topics.TopicEdit, current_user: users.User
+    db: Session,
+    topic_id: int,
+    topic: topics.TopicEdit,
+    current_user: users.User,
+    invalidate: bool = True,
 ):
     """
     edit_topic お題を編集する
@@ -202,6 +362,9 @@ def edit_topic(
         topic_id (int): お題のID
         topic (topics.TopicEdit): 編集されたお題
         current_user (users.User): 現在ログインしているユーザーの情報
+        invalidate (bool, optional):
+            レスポンスキャッシュを捨てるか。初期値は True。非同期版はイベントループを
+            止めないように自分で捨てるので False を渡す。
 
     Raises:
         HTTPException: 認証していない旨の HTTP 401 エラー
@@ -223,12 +386,19 @@ def edit_topic(
         setattr(db_topic, key, value)
 
     db.add(db_topic)
+    bump_table_version(db, models.Topic.__tablename__)
     db.commit()
     db.refresh(db_topic)
+    index_topic(db, db_topic)
+    refresh_topic(db_topic)
+    if invalidate:
+        invalidate_topic(db_topic.id)
     return db_topic
 
 
-def drop_topic(db: Session, topic_id: int, current_user: users.User):
+def drop_topic(
+    db: Session, topic_id: int, current_user: users.User, invalidate: bool = True
+):
     """
     drop_topic お題を削除する
 
@@ -236,6 +406,9 @@ def drop_topic(db: Session, topic_id: int, current_user: users.User):
         db (Session): DB接続
         topic_id (int): お題のID
         current_user (users.User): 現在ログインしているユーザーの情報
+        invalidate (bool, optional):
+            レスポンスキャッシュを捨てるか。初期値は True。非同期版はイベントループを
+            止めないように自分で捨てるので False を渡す。
 
     Raises:
         HTTPException: 認証していない旨の HTTP 401 エラー
@@ -258,6 +431,250 @@ def drop_topic(db: Session, topic_id: int, current_user: users.User):
         )
     setattr(topic, "is_visible", False)
     db.add(topic)
+    bump_table_version(db, models.Topic.__tablename__)
     db.commit()
     db.refresh(topic)
+    index_topic(db, topic)
+    refresh_topic(topic)
+    if invalidate:
+        invalidate_topic(topic.id)
     return topic
+
+
+async def get_topic_async(db, topic_id: int):
+    """
+    get_topic_async get_topic の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        topic_id (int): お題のID
+
+    Raises:
+        HTTPException: お題が見つからない旨のHTTP 404 エラー
+
+    Returns:
+        Topic: 指定されたIDのお題
+    """
+    return await run_sync(db, get_topic, topic_id)
+
+
+async def get_topics_async(
+    db,
+    limit: Optional[int] = None,
+    after: Optional[Cursor] = None,
+    with_contributor: bool = False,
+):
+    """
+    get_topics_async get_topics の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        limit (Optional[int], optional): 最大件数。初期値は None（全件）。
+        after (Optional[Cursor], optional):
+            前のページの末尾を表す (投稿日, ID) の組。初期値は None。
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
+
+    Returns:
+        Any: 見える状態のお題一覧
+    """
+    return await run_sync(db, get_topics, limit, after, with_contributor)
+
+
+async def get_all_topics_async(db, with_contributor: bool = False):
+    """
+    get_all_topics_async get_all_topics の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
+
+    Returns:
+        Any: 全てのお題一覧
+    """
+    return await run_sync(db, get_all_topics, with_contributor)
+
+
+async def get_topics_by_user_async(db, user_id: int, with_contributor: bool = False):
+    """
+    get_topics_by_user_async get_topics_by_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user_id (int): ユーザーID
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
+
+    Returns:
+        Any: 指定したユーザーIDのユーザーが作成したお題一覧
+    """
+    return await run_sync(db, get_topics_by_user, user_id, with_contributor)
+
+
+async def get_all_topics_by_user_async(
+    db, user_id: int, with_contributor: bool = False
+):
+    """
+    get_all_topics_by_user_async get_all_topics_by_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user_id (int): ユーザーID
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
+
+    Returns:
+        Any: 指定したIDのユーザーが作成した全てのお題
+    """
+    return await run_sync(db, get_all_topics_by_user, user_id, with_contributor)
+
+
+async def get_adopted_topics_async(db, with_contributor: bool = False):
+    """
+    get_adopted_topics_async get_adopted_topics の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
+
+    Returns:
+        Any: 採用済みのお題一覧
+    """
+    return await run_sync(db, get_adopted_topics, with_contributor)
+
+
+async def get_adopted_topics_by_user_async(
+    db, user_id: int, with_contributor: bool = False
+):
+    """
+    get_adopted_topics_by_user_async get_adopted_topics_by_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user_id (int): ユーザーID
+        with_contributor (bool, optional): 投稿者も一緒に読み込むか。初期値は False。
+
+    Returns:
+        Any: 指定したIDのユーザーが作成した採用済みのお題
+    """
+    return await run_sync(db, get_adopted_topics_by_user, user_id, with_contributor)
+
+
+async def get_topics_by_keyword_async(db, keyword: str):
+    """
+    get_topics_by_keyword_async get_topics_by_keyword の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        keyword (str): キーワード
+
+    Returns:
+        Any: 指定したキーワードを含むお題一覧
+    """
+    return await run_sync(db, get_topics_by_keyword, keyword)
+
+
+async def get_all_topics_by_keyword_async(db, keyword: str):
+    """
+    get_all_topics_by_keyword_async get_all_topics_by_keyword の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        keyword (str): 指定したキーワードを含む全てのお題一覧
+
+    Returns:
+        Any: 指定したキーワードを含む全てのお題一覧
+    """
+    return await run_sync(db, get_all_topics_by_keyword, keyword)
+
+
+async def get_random_topic_async(
+    db,
+    adopted: Optional[bool] = None,
+    contributor_id: Optional[int] = None,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+):
+    """
+    get_random_topic_async get_random_topic の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        adopted (Optional[bool], optional): 採用済みかで絞り込む。初期値は None。
+        contributor_id (Optional[int], optional): 投稿者のIDで絞り込む。初期値は None。
+        since (Optional[datetime.date], optional): この日以降の投稿に絞り込む。
+        until (Optional[datetime.date], optional): この日以前の投稿に絞り込む。
+
+    Raises:
+        HTTPException: 条件に合うお題が見つからない旨のHTTP 404 エラー
+
+    Returns:
+        Topic: 無作為に選ばれたお題
+    """
+    return await run_sync(db, get_random_topic, adopted, contributor_id, since, until)
+
+
+async def create_topic_async(db, topic: topics.TopicCreate, current_user: users.User):
+    """
+    create_topic_async create_topic の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        topic (topics.TopicCreate): お題
+        current_user (users.User): 現在ログインしているユーザーの情報
+
+    Raises:
+        HTTPException: 認証していない旨の HTTP 401 エラー
+
+    Returns:
+        Topic: 作成されたお題
+    """
+    db_topic = await run_sync(db, create_topic, topic, current_user, invalidate=False)
+    await invalidate_topic_async(db_topic.id)
+    return db_topic
+
+
+async def edit_topic_async(
+    db, topic_id: int, topic: topics.TopicEdit, current_user: users.User
+):
+    """
+    edit_topic_async edit_topic の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        topic_id (int): お題のID
+        topic (topics.TopicEdit): 編集されたお題
+        current_user (users.User): 現在ログインしているユーザーの情報
+
+    Raises:
+        HTTPException: 認証していない旨の HTTP 401 エラー
+        HTTPException: お題の投稿者でない旨の HTTP 403 エラー
+        HTTPException: 指定されたIDのお題が無い旨の HTTP 404 エラー
+
+    Returns:
+        Any: 編集されたお題
+    """
+    db_topic = await run_sync(
+        db, edit_topic, topic_id, topic, current_user, invalidate=False
+    )
+    await invalidate_topic_async(db_topic.id)
+    return db_topic
+
+
+async def drop_topic_async(db, topic_id: int, current_user: users.User):
+    """
+    drop_topic_async drop_topic の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        topic_id (int): お題のID
+        current_user (users.User): 現在ログインしているユーザーの情報
+
+    Raises:
+        HTTPException: 認証していない旨の HTTP 401 エラー
+        HTTPException: 権限が無い旨の HTTP 403 エラー
+        HTTPException: 指定されたIDのお題が無い旨の HTTP 404 エラー
+
+    Returns:
+        Any: 削除されたお題
+    """
+    db_topic = await run_sync(db, drop_topic, topic_id, current_user, invalidate=False)
+    await invalidate_topic_async(db_topic.id)
+    return db_topic
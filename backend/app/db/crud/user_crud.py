@@ -1,9 +1,14 @@
+from typing import Any, Dict, Optional
+
 from fastapi import HTTPException, status
+from sqlalchemy import func, or_, text
 from sqlalchemy.orm import Session
 
+from app.core import config, token_cache
 from app.core.security import get_password_hash
 from app.db import models
 from app.db.schemas import users
+from app.db.session import run_sync
 
 
 def get_user(db: Session, user_id: int):
@@ -40,33 +45,194 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
+SORTABLE_COLUMNS = {
+    column: getattr(models.User, column)
+    for column in (
+        "id",
+        "email",
+        "first_name",
+        "last_name",
+        "is_active",
+        "is_superuser",
+    )
+}  #: 一覧の並び替えに使える項目
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _bad_filter(name: str, expected: str) -> HTTPException:
+    return HTTPException(
+        status.HTTP_400_BAD_REQUEST,
+        detail=f"Filter {name} must be {expected}",
+    )
+
+
+def _filter_users(query, filters: Optional[Dict[str, Any]]):
+    """
+    _filter_users ユーザーの一覧を絞り込む
+
+    使える条件は q（メールアドレスか名前の部分一致）、id（1つかリスト）、
+    email（完全一致）、is_active、is_superuser。値の型が合わない条件はDBに
+    渡さずに 400 にする（"false" が真と扱われたり、DBのエラーで 500 になったりしないように）。
+
+    Args:
+        query (Query): ユーザーのクエリ
+        filters (Optional[Dict[str, Any]]): 項目名と値の辞書
+
+    Raises:
+        HTTPException: 使えない条件か、値の型が合わない旨の HTTP 400 エラー
+
+    Returns:
+        Query: 絞り込んだクエリ
+    """
+    for name, value in (filters or {}).items():
+        if name == "q":
+            if not isinstance(value, str):
+                raise _bad_filter(name, "a string")
+            escaped = (
+                value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            )
+            pattern = f"%{escaped}%"
+            query = query.filter(
+                or_(
+                    models.User.email.ilike(pattern, escape="\\"),
+                    models.User.first_name.ilike(pattern, escape="\\"),
+                    models.User.last_name.ilike(pattern, escape="\\"),
+                )
+            )
+        elif name == "id":
+            ids = value if isinstance(value, list) else [value]
+            if not all(_is_int(user_id) for user_id in ids):
+                raise _bad_filter(name, "an integer or a list of integers")
+            query = query.filter(models.User.id.in_(ids))
+        elif name == "email":
+            if not isinstance(value, str):
+                raise _bad_filter(name, "a string")
+            query = query.filter(models.User.email == value)
+        elif name in ("is_active", "is_superuser"):
+            if not isinstance(value, bool):
+                raise _bad_filter(name, "a boolean")
+            query = query.filter(getattr(models.User, name).is_(value))
+        else:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST, detail=f"Unknown filter: {name}"
+            )
+    return query
+
+
+def get_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    sort: str = "id",
+    descending: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+):
     """
     get_users 複数のユーザー情報を取得する
 
+    同じ値の行の順番がページごとに変わらないように、最後にIDで並べる。
+
     Args:
         db (Session): データベース接続
         skip (int, optional): スキップする件数。デフォルトは0件
         limit (int, optional): 最大件数。デフォルトは100件
+        sort (str, optional): 並び替える項目。デフォルトは "id"
+        descending (bool, optional): 降順にするか。デフォルトは False
+        filters (Optional[Dict[str, Any]], optional): 絞り込みの条件。デフォルトは None
+
+    Raises:
+        HTTPException: 並び替えられない項目か使えない条件である旨の HTTP 400 エラー
 
     Returns:
         t.List[schemas.UserOut]: ユーザー情報のリスト
     """
-    return db.query(models.User).offset(skip).limit(limit).all()
+    column = SORTABLE_COLUMNS.get(sort)
+    if column is None:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, detail=f"Cannot sort by {sort}"
+        )
+    order = [column.desc() if descending else column.asc()]
+    if sort != "id":
+        order.append(models.User.id.desc() if descending else models.User.id.asc())
+    query = _filter_users(db.query(models.User), filters)
+    return query.order_by(*order).offset(skip).limit(limit).all()
 
 
-def create_user(db: Session, user: users.UserCreate):
+def estimate_user_count(db: Session) -> Optional[int]:
+    """
+    estimate_user_count 統計情報からユーザーの件数を見積もる
+
+    PostgreSQL の pg_class.reltuples を読むだけなので、件数によらずすぐに返る。
+    ANALYZE されていない場合など見積もりが無いときは None を返す。
+
+    Args:
+        db (Session): データベース接続
+
+    Returns:
+        Optional[int]: 見積もった件数。PostgreSQL 以外や見積もりが無い場合は None。
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    estimate = db.execute(
+        text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": f'"{models.User.__tablename__}"'},
+    ).scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def count_users(
+    db: Session,
+    filters: Optional[Dict[str, Any]] = None,
+    estimate_threshold: Optional[int] = None,
+) -> int:
+    """
+    count_users 条件に合うユーザーの件数を数える
+
+    絞り込みが無く、見積もった件数が estimate_threshold 以上なら見積もりを返す。
+    それ以外は SELECT count(*) で数える。
+
+    Args:
+        db (Session): データベース接続
+        filters (Optional[Dict[str, Any]], optional): 絞り込みの条件。デフォルトは None
+        estimate_threshold (Optional[int], optional):
+            見積もりを使う最小の件数。0 なら常に数える。
+            デフォルトは None（config.USERS_COUNT_ESTIMATE_THRESHOLD）
+
+    Returns:
+        int: ユーザーの件数
+    """
+    if estimate_threshold is None:
+        estimate_threshold = config.USERS_COUNT_ESTIMATE_THRESHOLD
+    if not filters and estimate_threshold > 0:
+        estimate = estimate_user_count(db)
+        if estimate is not None and estimate >= estimate_threshold:
+            return estimate
+    query = _filter_users(db.query(func.count(models.User.id)), filters)
+    return query.scalar()
+
+
+def create_user(
+    db: Session, user: users.UserCreate, hashed_password: Optional[str] = None
+):
     """
     create_user ユーザーを作成する
 
     Args:
         db (Session): データベース接続
         user (schemas.UserCreate): 作成するユーザーの情報
+        hashed_password (Optional[str], optional):
+            計算済みのパスワードのハッシュ。初期値は None（ここで計算する）。
 
     Returns:
         models.User: 作成されるユーザーの情報
     """
-    hashed_password = get_password_hash(user.password)
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = models.User(
         first_name=user.first_name,
         last_name=user.last_name,
@@ -100,10 +266,16 @@ def delete_user(db: Session, user_id: int):
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
     db.delete(user)
     db.commit()
+    token_cache.invalidate_user(user_id)
     return user
 
 
-def edit_user(db: Session, user_id: int, user: users.UserEdit):
+def edit_user(
+    db: Session,
+    user_id: int,
+    user: users.UserEdit,
+    hashed_password: Optional[str] = None,
+):
     """
     edit_user ユーザー情報を編集する
 
@@ -111,6 +283,8 @@ def edit_user(db: Session, user_id: int, user: users.UserEdit):
         db (Session): データベース接続
         user_id (int): 編集するユーザーのID
         user (schemas.UserEdit): 編集するユーザーのデータ
+        hashed_password (Optional[str], optional):
+            計算済みのパスワードのハッシュ。初期値は None（ここで計算する）。
 
     Raises:
         HTTPException: ユーザーが見つからない旨のHTTP 404 エラー
@@ -124,7 +298,9 @@ def edit_user(db: Session, user_id: int, user: users.UserEdit):
     update_data = user.dict(exclude_unset=True)
 
     if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(user.password)
+        update_data["hashed_password"] = hashed_password or get_password_hash(
+            user.password
+        )
         del update_data["password"]
 
     for key, value in update_data.items():
@@ -133,4 +309,141 @@ def edit_user(db: Session, user_id: int, user: users.UserEdit):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    token_cache.invalidate_user(user_id)
     return db_user
+
+
+async def get_user_async(db, user_id: int):
+    """
+    get_user_async get_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user_id (int): ユーザーのID
+
+    Raises:
+        HTTPException: ユーザーが見つからない旨のHTTP 404 エラー
+
+    Returns:
+        schemas.UserBase: ユーザー情報
+    """
+    return await run_sync(db, get_user, user_id)
+
+
+async def get_user_by_email_async(db, email: str):
+    """
+    get_user_by_email_async get_user_by_email の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        email (str): メールアドレス
+
+    Returns:
+        schemas.UserBase: 指定したメールアドレスを持つユーザー情報（無い場合はNone）
+    """
+    return await run_sync(db, get_user_by_email, email)
+
+
+async def get_users_async(
+    db,
+    skip: int = 0,
+    limit: int = 100,
+    sort: str = "id",
+    descending: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+):
+    """
+    get_users_async get_users の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        skip (int, optional): スキップする件数。デフォルトは0件
+        limit (int, optional): 最大件数。デフォルトは100件
+        sort (str, optional): 並び替える項目。デフォルトは "id"
+        descending (bool, optional): 降順にするか。デフォルトは False
+        filters (Optional[Dict[str, Any]], optional): 絞り込みの条件。デフォルトは None
+
+    Returns:
+        t.List[schemas.UserOut]: ユーザー情報のリスト
+    """
+    return await run_sync(db, get_users, skip, limit, sort, descending, filters)
+
+
+async def count_users_async(
+    db,
+    filters: Optional[Dict[str, Any]] = None,
+    estimate_threshold: Optional[int] = None,
+) -> int:
+    """
+    count_users_async count_users の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        filters (Optional[Dict[str, Any]], optional): 絞り込みの条件。デフォルトは None
+        estimate_threshold (Optional[int], optional):
+            見積もりを使う最小の件数。デフォルトは None（config の値）
+
+    Returns:
+        int: ユーザーの件数
+    """
+    return await run_sync(db, count_users, filters, estimate_threshold)
+
+
+async def create_user_async(
+    db, user: users.UserCreate, hashed_password: Optional[str] = None
+):
+    """
+    create_user_async create_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user (schemas.UserCreate): 作成するユーザーの情報
+        hashed_password (Optional[str], optional):
+            計算済みのパスワードのハッシュ。初期値は None（ここで計算する）。
+
+    Returns:
+        models.User: 作成されるユーザーの情報
+    """
+    return await run_sync(db, create_user, user, hashed_password)
+
+
+async def delete_user_async(db, user_id: int):
+    """
+    delete_user_async delete_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user_id (int): 削除するユーザーのID
+
+    Raises:
+        HTTPException: ユーザーが見つからない旨のHTTP 404 エラー
+
+    Returns:
+        schemas.UserBase: 削除されるユーザー情報
+    """
+    return await run_sync(db, delete_user, user_id)
+
+
+async def edit_user_async(
+    db,
+    user_id: int,
+    user: users.UserEdit,
+    hashed_password: Optional[str] = None,
+):
+    """
+    edit_user_async edit_user の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        user_id (int): 編集するユーザーのID
+        user (schemas.UserEdit): 編集するユーザーのデータ
+        hashed_password (Optional[str], optional):
+            計算済みのパスワードのハッシュ。初期値は None（ここで計算する）。
+
+    Raises:
+        HTTPException: ユーザーが見つからない旨のHTTP 404 エラー
+
+    Returns:
+        schemas.User: 編集されるユーザー情報
+    """
+    return await run_sync(db, edit_user, user_id, user, hashed_password)
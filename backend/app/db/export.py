@@ -0,0 +1,95 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Sequence, Tuple
+
+CHUNK_SIZE = 64 * 1024  #: まとめて送るバイト数の目安
+
+
+def _json_default(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_chunks(
+    columns: Sequence[str], rows: Iterable[Tuple], chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    ndjson_chunks 行を NDJSON にして chunk_size 程度ずつ返す
+
+    Args:
+        columns (Sequence[str]): 列名
+        rows (Iterable[Tuple]): 列名と同じ順の値の組
+        chunk_size (int, optional): まとめるバイト数の目安。初期値は CHUNK_SIZE。
+
+    Yields:
+        bytes: 1行1件の JSON
+    """
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(
+            dict(zip(columns, row)),
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=_json_default,
+        ).encode("utf-8")
+        lines.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+            size = 0
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def csv_chunks(
+    columns: Sequence[str], rows: Iterable[Tuple], chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    csv_chunks 行をヘッダー付きの CSV にして chunk_size 程度ずつ返す
+
+    None は空欄、日付は ISO 8601 で書く。
+
+    Args:
+        columns (Sequence[str]): 列名
+        rows (Iterable[Tuple]): 列名と同じ順の値の組
+        chunk_size (int, optional): まとめるバイト数の目安。初期値は CHUNK_SIZE。
+
+    Yields:
+        bytes: CSV
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    gzip_chunks バイト列の流れを gzip 形式で圧縮しながら返す
+
+    Args:
+        chunks (Iterable[bytes]): 圧縮するバイト列
+        level (int, optional): 圧縮レベル。初期値は 6。
+
+    Yields:
+        bytes: gzip 形式のバイト列
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,4 +1,13 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import Date, Text
@@ -40,10 +49,75 @@ class Topic(Base):
     id = Column(Integer, primary_key=True, index=True)  #: ID
     topic = Column(Text, index=True, nullable=False)  #: お題本文
     picture_url = Column(String)  #: 画像のURL
-    post_date = Column(Date)  #: 投稿日
+    post_date = Column(Date, nullable=False)  #: 投稿日
     is_visible = Column(Boolean, default=True)  #: 表示できる状態になっているか？
     is_adopted = Column(Boolean, default=False)  #: 採用されたか？
     contributor_id = Column(Integer, ForeignKey("user.id"))  #: 投稿者のユーザーID
     contributor = relationship(
         "User", foreign_keys=[contributor_id]
     )  #: userテーブルとのリレーション
+
+
+class TableVersion(Base):
+    """
+    TableVersion table_versionテーブルのテーブル定義
+
+    テーブルが更新されるたびに version を1つ進める。条件付きGETの ETag と
+    Last-Modified に使い、行を読まずに更新の有無を判定できるようにする。
+
+    Args:
+        Base (Type[__class_DeclarativeMeta]): テーブルのメタデータ
+    """
+
+    __tablename__ = "table_version"  #: テーブルの名前
+
+    name = Column(String, primary_key=True)  #: 対象のテーブル名
+    version = Column(BigInteger, nullable=False, default=0)  #: 更新のたびに増える番号
+    updated_at = Column(DateTime(timezone=True), nullable=False)  #: 最終更新日時
+
+
+class DailyTopic(Base):
+    """
+    DailyTopic daily_topicテーブルのテーブル定義
+
+    日ごとに選ばれた採用お題を、選ばれた順に保存する。
+
+    Args:
+        Base (Type[__class_DeclarativeMeta]): テーブルのメタデータ
+    """
+
+    __tablename__ = "daily_topic"  #: テーブルの名前
+
+    day = Column(Date, primary_key=True)  #: 選ばれた日
+    position = Column(Integer, primary_key=True)  #: その日の中での順番（0始まり）
+    topic_id = Column(
+        Integer, ForeignKey("topic.id", ondelete="CASCADE"), nullable=False
+    )  #: 選ばれたお題のID
+    weight = Column(Float, nullable=False)  #: 選ばれたときの重み
+    topic = relationship("Topic")  #: topicテーブルとのリレーション
+
+
+# topic_crud の検索条件に合わせた索引。論理削除されたお題は一覧に出ないので、
+# is_visible を条件とする部分索引にして索引の大きさを抑える。
+Index("ix_topic_contributor_id", Topic.contributor_id)
+Index(
+    "ix_topic_visible_contributor_id",
+    Topic.contributor_id,
+    Topic.is_adopted,
+    postgresql_where=Topic.is_visible,
+    sqlite_where=Topic.is_visible,
+)
+Index(
+    "ix_topic_visible_adopted",
+    Topic.post_date.desc(),
+    Topic.id.desc(),
+    postgresql_where=Topic.is_visible & Topic.is_adopted,
+    sqlite_where=Topic.is_visible & Topic.is_adopted,
+)
+Index(
+    "ix_topic_visible_post_date",
+    Topic.post_date.desc(),
+    Topic.id.desc(),
+    postgresql_where=Topic.is_visible,
+    sqlite_where=Topic.is_visible,
+)
@@ -0,0 +1,39 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class TaskAccepted(BaseModel):
+    """
+    TaskAccepted 受け付けたバックグラウンドジョブ
+
+    Args:
+        BaseModel (BaseModel): Pydanticでモデルのベースとなるクラス
+
+    Attributes:
+        id (str): ジョブのID
+        status_url (str): ジョブの状態を取得するURL
+    """
+
+    id: str
+    status_url: str
+
+
+class TaskStatus(BaseModel):
+    """
+    TaskStatus バックグラウンドジョブの状態
+
+    Args:
+        BaseModel (BaseModel): Pydanticでモデルのベースとなるクラス
+
+    Attributes:
+        id (str): ジョブのID
+        status (str): PENDING, STARTED, SUCCESS, FAILURE, RETRY のいずれか
+        result (Optional[Any]): 成功した場合の結果
+        error (Optional[str]): 失敗した場合の理由
+    """
+
+    id: str
+    status: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
@@ -1,9 +1,9 @@
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, HttpUrl
 
-from app.db.schemas.users import User
+from app.db.schemas.users import UserPublic
 
 
 class TopicBase(BaseModel):
@@ -38,10 +38,22 @@ class TopicOut(TopicBase):
         TopicBase (TopicBase): お題に関する最低限の情報を表すクラス
 
     Attributes:
-        contributor (User): 投稿者情報を格納するクラス
+        id (int): お題のID
+        contributor (UserPublic): 投稿者の公開してよい情報
     """
 
-    contributor: User
+    id: int
+    contributor: UserPublic
+
+    class Config:
+        """
+        TopicOut.Config TopicOutクラスの設定
+
+        Attributes:
+            orm_mode (bool): ORMモードか
+        """
+
+        orm_mode = True
 
 
 class TopicCreate(TopicBase):
@@ -101,3 +113,53 @@ class Topic(TopicBase):
         """
 
         orm_mode = True
+
+
+class TopicImportError(BaseModel):
+    """
+    TopicImportError 一括登録で登録できなかった行を表すクラス
+
+    Args:
+        BaseModel (BaseModel): Pydanticでモデルのベースとなるクラス
+
+    Attributes:
+        line (int): 行番号（1始まり。CSV はヘッダーを1行目と数える）
+        message (str): 登録できなかった理由
+    """
+
+    line: int
+    message: str
+
+
+class TopicImportResult(BaseModel):
+    """
+    TopicImportResult 一括登録の結果を表すクラス
+
+    Args:
+        BaseModel (BaseModel): Pydanticでモデルのベースとなるクラス
+
+    Attributes:
+        inserted (int): 登録したお題の件数
+        failed (int): 登録できなかった行の件数
+        errors (List[TopicImportError]): 登録できなかった行。多い場合は先頭の一部だけ。
+    """
+
+    inserted: int = 0
+    failed: int = 0
+    errors: List[TopicImportError] = []
+
+
+class DailyTopics(BaseModel):
+    """
+    DailyTopics その日の採用お題を表すクラス
+
+    Args:
+        BaseModel (BaseModel): Pydanticでモデルのベースとなるクラス
+
+    Attributes:
+        day (date): 選ばれた日
+        topics (List[Topic]): 選ばれたお題。選ばれた順。
+    """
+
+    day: date
+    topics: List[Topic] = []
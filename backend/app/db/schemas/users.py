@@ -106,3 +106,33 @@ class User(UserBase):
         """
 
         orm_mode = True
+
+
+class UserPublic(BaseModel):
+    """
+    UserPublic 誰にでも見せてよいユーザーの情報
+
+    認証の無いお題の一覧に投稿者として載せるので、メールアドレスや権限は含めない。
+
+    Args:
+        BaseModel (BaseModel): Pydanticでモデルのベースとなるクラス
+
+    Attributes:
+        id (int): ユーザーID
+        first_name (Optional[str]): ユーザーの名
+        last_name (Optional[str]): ユーザーの姓
+    """
+
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+    class Config:
+        """
+        UserPublic.Config UserPublicクラスの設定
+
+        Attributes:
+            orm_mode (bool): ORMモードか
+        """
+
+        orm_mode = True
@@ -0,0 +1,269 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.session import run_sync
+
+NGRAM_SIZE = 2  #: フォールバック索引で使う n-gram の長さ（日本語向けに bi-gram）
+
+
+def _escape_like(keyword: str) -> str:
+    """
+    _escape_like LIKE 検索用にワイルドカード文字をエスケープする
+
+    Args:
+        keyword (str): キーワード
+
+    Returns:
+        str: エスケープされたキーワード
+    """
+    return keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _ngrams(value: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """
+    _ngrams 文字列を n-gram の集合に分解する
+
+    Args:
+        value (str): 文字列
+        n (int, optional): n-gram の長さ。初期値は NGRAM_SIZE。
+
+    Returns:
+        Set[str]: n-gram の集合。文字列が n より短い場合は空集合。
+    """
+    return {value[i : i + n] for i in range(len(value) - n + 1)}
+
+
+class NgramIndex:
+    """
+    NgramIndex お題本文の n-gram 転置索引
+
+    pg_trgm が使えない SQLite などのテスト環境向けのフォールバック。
+    プロセスごとに保持されるため、他プロセスでの更新は反映されない。
+
+    Attributes:
+        n (int): n-gram の長さ
+    """
+
+    def __init__(self, n: int = NGRAM_SIZE):
+        self.n = n
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._documents: Dict[int, Tuple[str, bool]] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, topic_id: int, topic: str, is_visible: bool = True) -> None:
+        """
+        add お題を索引に追加する。既にある場合は置き換える。
+
+        Args:
+            topic_id (int): お題のID
+            topic (str): お題の本文
+            is_visible (bool, optional): 見える状態か。初期値は True。
+        """
+        self.remove(topic_id)
+        normalized = topic.casefold()
+        self._documents[topic_id] = (normalized, is_visible)
+        for gram in _ngrams(normalized, self.n):
+            self._postings[gram].add(topic_id)
+
+    def remove(self, topic_id: int) -> None:
+        """
+        remove お題を索引から取り除く
+
+        Args:
+            topic_id (int): お題のID
+        """
+        document = self._documents.pop(topic_id, None)
+        if document is None:
+            return
+        for gram in _ngrams(document[0], self.n):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(topic_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def search(
+        self, keyword: str, include_hidden: bool = False
+    ) -> List[Tuple[int, float]]:
+        """
+        search キーワードを含むお題を関連度の高い順に検索する
+
+        関連度は本文に占めるキーワードの割合で、同じ場合は新しいID順とする。
+
+        Args:
+            keyword (str): キーワード
+            include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は False。
+
+        Returns:
+            List[Tuple[int, float]]: お題のIDと関連度の組のリスト
+        """
+        normalized = keyword.casefold()
+        grams = _ngrams(normalized, self.n)
+        if grams:
+            candidates = set.intersection(
+                *(self._postings.get(gram, set()) for gram in grams)
+            )
+        else:
+            candidates = set(self._documents)
+        hits = []
+        for topic_id in candidates:
+            body, is_visible = self._documents[topic_id]
+            if (include_hidden or is_visible) and normalized in body:
+                hits.append((topic_id, len(normalized) / max(len(body), 1)))
+        hits.sort(key=lambda hit: (-hit[1], -hit[0]))
+        return hits
+
+
+_fallback_index: Optional[NgramIndex] = None
+_trigram_available: Dict[str, bool] = {}
+
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def has_trigram(db: Session) -> bool:
+    """
+    has_trigram 接続先のDBで pg_trgm 拡張が使えるか判定する。結果は接続先ごとに記憶する。
+
+    Args:
+        db (Session): DB接続
+
+    Returns:
+        bool: pg_trgm が使えるか否か
+    """
+    url = str(db.get_bind().engine.url)  # Connection に結び付いたセッションでも使えるように
+    if url not in _trigram_available:
+        _trigram_available[url] = (
+            db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first()
+            is not None
+        )
+    return _trigram_available[url]
+
+
+def get_fallback_index(db: Session) -> NgramIndex:
+    """
+    get_fallback_index フォールバック用の n-gram 索引を取得する。初回はDBから構築する。
+
+    Args:
+        db (Session): DB接続
+
+    Returns:
+        NgramIndex: n-gram 索引
+    """
+    global _fallback_index
+    if _fallback_index is None:
+        index = NgramIndex()
+        rows = db.query(
+            models.Topic.id, models.Topic.topic, models.Topic.is_visible
+        ).yield_per(1000)
+        for topic_id, topic, is_visible in rows:
+            index.add(topic_id, topic, bool(is_visible))
+        _fallback_index = index
+    return _fallback_index
+
+
+def index_topic(db: Session, topic: models.Topic) -> None:
+    """
+    index_topic 作成・編集・削除されたお題をフォールバック索引に反映する
+
+    PostgreSQL ではDBの索引が使われるため何もしない。
+
+    Args:
+        db (Session): DB接続
+        topic (models.Topic): 反映するお題
+    """
+    if _fallback_index is None or _is_postgresql(db):
+        return
+    _fallback_index.add(topic.id, topic.topic, bool(topic.is_visible))
+
+
+def reset_fallback_index() -> None:
+    """
+    reset_fallback_index フォールバック索引を捨てて、次に使うときにDBから構築し直させる
+
+    一括登録のように1件ずつ index_topic できない更新の後に呼ぶ。
+    """
+    global _fallback_index
+    _fallback_index = None
+
+
+def search_topics(
+    db: Session,
+    keyword: str,
+    include_hidden: bool = False,
+    skip: int = 0,
+    limit: Optional[int] = None,
+):
+    """
+    search_topics キーワードを含むお題を関連度の高い順に検索する
+
+    PostgreSQL では pg_trgm の GIN 索引が効く ILIKE で絞り込み、similarity で並べる。
+    pg_trgm が無い場合は本文の短い順に並べる。それ以外のDBでは n-gram 索引を使う。
+
+    Args:
+        db (Session): DB接続
+        keyword (str): キーワード
+        include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は False。
+        skip (int, optional): スキップする件数。初期値は 0。
+        limit (Optional[int], optional): 最大件数。初期値は None（全件）。
+
+    Returns:
+        List[models.Topic]: キーワードを含むお題一覧
+    """
+    if not _is_postgresql(db):
+        hits = get_fallback_index(db).search(keyword, include_hidden)
+        end = None if limit is None else skip + limit
+        ids = [topic_id for topic_id, _ in hits[skip:end]]
+        if not ids:
+            return []
+        found = {
+            topic.id: topic
+            for topic in db.query(models.Topic).filter(models.Topic.id.in_(ids))
+        }
+        return [found[topic_id] for topic_id in ids if topic_id in found]
+
+    query = db.query(models.Topic).filter(
+        models.Topic.topic.ilike(f"%{_escape_like(keyword)}%", escape="\\")
+    )
+    if not include_hidden:
+        query = query.filter(models.Topic.is_visible)
+    if has_trigram(db):
+        rank = func.similarity(models.Topic.topic, keyword).desc()
+    else:
+        rank = func.length(models.Topic.topic).asc()
+    query = query.order_by(rank, models.Topic.id.desc()).offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+async def search_topics_async(
+    db,
+    keyword: str,
+    include_hidden: bool = False,
+    skip: int = 0,
+    limit: Optional[int] = None,
+):
+    """
+    search_topics_async search_topics の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+        keyword (str): キーワード
+        include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は False。
+        skip (int, optional): スキップする件数。初期値は 0。
+        limit (Optional[int], optional): 最大件数。初期値は None（全件）。
+
+    Returns:
+        List[models.Topic]: キーワードを含むお題一覧
+    """
+    return await run_sync(db, search_topics, keyword, include_hidden, skip, limit)
@@ -1,27 +1,396 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from starlette.requests import Request
 
 from app.core import config
+from app.core.instrumentation import instrument_engine
+from app.core.metrics import REGISTRY, Collected
+
+
+class TimedQueuePool(QueuePool):
+    """
+    TimedQueuePool コネクションを借りるまでの待ち時間を記録する QueuePool
+
+    集計値は複数のスレッドから更新されるので、このプール自身のロックの下で更新する。
+
+    Attributes:
+        max_overflow (int): オーバーフローできるコネクションの最大数
+        checkouts (int): コネクションを借りた回数
+        wait_time (float): 借りるまでに待った時間の合計（秒）
+        max_wait_time (float): 借りるまでに待った時間の最大値（秒）
+    """
+
+    def __init__(self, creator: Callable[..., Any], max_overflow: int = 10, **kw: Any):
+        super().__init__(creator, max_overflow=max_overflow, **kw)
+        self.max_overflow = max_overflow
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time += waited
+                if waited > self.max_wait_time:
+                    self.max_wait_time = waited
+
+
+def engine_options(url: Optional[str]) -> Dict[str, Any]:
+    """
+    engine_options 設定から create_engine に渡すオプションを組み立てる
+
+    PgBouncer モードでは SQLAlchemy 側でコネクションを溜めず、NullPool を使う。
+    psycopg2 はサーバー側のプリペアドステートメントを使わないので、
+    トランザクションプーリングの PgBouncer でもそのまま使える。
+    PgBouncer は options 起動パラメーターを受け付けないため、
+    statement_timeout は PgBouncer かロールの設定で指定すること。
+
+    Args:
+        url (Optional[str]): データベースのURL
+
+    Returns:
+        Dict[str, Any]: create_engine に渡すキーワード引数
+    """
+    if url is None or make_url(url).get_backend_name() != "postgresql":
+        return {}
+    connect_args: Dict[str, Any] = {"application_name": config.DB_APPLICATION_NAME}
+    if config.DB_PGBOUNCER:
+        return {"poolclass": NullPool, "connect_args": connect_args}
+    if config.DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args[
+            "options"
+        ] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+
+def get_engine() -> Engine:
+    """
+    get_engine エンジンを取得する。初回に作る。
+
+    create_engine はDBドライバーの import を伴うので、モジュールの import では作らず、
+    起動時（main.py の startup）か最初に使うときに作る。
+    複数のスレッドから同時に初めて呼ばれても、作るのは1つだけにする。
+
+    Returns:
+        Engine: エンジン
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(
+                    config.SQLALCHEMY_DATABASE_URI,
+                    **engine_options(config.SQLALCHEMY_DATABASE_URI),
+                )
+                instrument_engine(engine)
+                _session_factory.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def SessionLocal() -> Session:
+    """
+    SessionLocal 新しいDBセッションを作る
+
+    Returns:
+        Session: DBのセッション
+    """
+    get_engine()
+    return _session_factory()
+
+
+def __getattr__(name: str) -> Any:
+    # 既存のコードの session.engine のため
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-engine = create_engine(
-    config.SQLALCHEMY_DATABASE_URI,
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+T = TypeVar("T")
 
-# Dependency
-def get_db():
+
+def pool_status() -> Dict[str, Any]:
     """
-    get_db DBに接続する
+    pool_status コネクションプールの状態を取得する
+
+    Returns:
+        Dict[str, Any]: プールの大きさ、貸出中・待機中のコネクション数、
+        オーバーフロー数と、コネクションを借りるまでの待ち時間
+    """
+    pool = get_engine().pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        status.update(
+            max_overflow=pool.max_overflow,
+            checkouts=pool.checkouts,
+            wait_time=pool.wait_time,
+            max_wait_time=pool.max_wait_time,
+        )
+    return status
+
+
+POOL_GAUGES = {
+    "size": "Configured size of the connection pool.",
+    "checked_in": "Idle connections in the pool.",
+    "checked_out": "Connections currently in use.",
+    "overflow": "Connections opened beyond the pool size.",
+    "max_overflow": "Maximum number of overflow connections.",
+    "max_wait_time": "Longest wait for a connection in seconds.",
+}
+POOL_COUNTERS = {
+    "checkouts": "Connections checked out from the pool since startup.",
+    "wait_time": "Total seconds spent waiting for a connection.",
+}
+
+
+def _collect_pool_metrics(descriptions: Dict[str, str]) -> Iterator[Collected]:
+    """
+    _collect_pool_metrics pool_status の数値のうち descriptions にあるものを集める
+
+    Args:
+        descriptions (Dict[str, str]): pool_status のキーと説明
+
+    Returns:
+        Iterator[Collected]: odaikun_db_pool_ で始まる値
+    """
+    status = pool_status()
+    for key, documentation in descriptions.items():
+        if key in status:
+            yield f"odaikun_db_pool_{key}", documentation, status[key]
+
+
+REGISTRY.add_collector(partial(_collect_pool_metrics, POOL_GAUGES))
+REGISTRY.add_collector(partial(_collect_pool_metrics, POOL_COUNTERS), "counter")
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    """
+    _get_db_executor DBへの問い合わせ専用のスレッドプールを取得する
+
+    Starlette が同期処理に使う共有のスレッドプールとは分けておき、
+    DBが遅いときにも他の同期処理が詰まらないようにする。
+
+    Returns:
+        ThreadPoolExecutor: config.DB_EXECUTOR_WORKERS 本のスレッドを持つプール
+    """
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=config.DB_EXECUTOR_WORKERS, thread_name_prefix="db"
+        )
+    return _db_executor
+
+
+class AsyncSession:
+    """
+    AsyncSession 同期の Session を専用のスレッドプールで動かす非同期のセッション
+
+    SQLAlchemy 1.3 には asyncio 対応が無いため、1.4 の AsyncSession.run_sync と
+    同じ呼び出し方で、同期の処理をスレッドプールに渡す。
+    1つのリクエストの中では await で順番に呼ばれるので、
+    同じ Session が複数のスレッドから同時に使われることは無い。
+
+    Args:
+        sync_session (Session): 中で使う同期の Session
+    """
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    async def run_sync(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        run_sync 同期の Session を第1引数に取る関数をスレッドプールで実行する
+
+        Args:
+            fn (Callable[..., T]): 実行する関数
+            *args (Any): fn に渡す位置引数
+            **kwargs (Any): fn に渡すキーワード引数
+
+        Returns:
+            T: fn の戻り値
+        """
+        loop = asyncio.get_running_loop()
+        # リクエストの計測（app.core.instrumentation）を引き継ぐため、
+        # 呼び出し元のコンテキストでスレッドの処理を実行する
+        context = contextvars.copy_context()
+        call: Callable[[], T] = partial(fn, self.sync_session, *args, **kwargs)
+        return await loop.run_in_executor(_get_db_executor(), context.run, call)
+
+    async def close(self) -> None:
+        """
+        close セッションを閉じ、コネクションをプールに返す
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_get_db_executor(), self.sync_session.close)
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """
+    AsyncSessionLocal 新しい AsyncSession を作る
+
+    Returns:
+        AsyncSession: 非同期のセッション
+    """
+    return AsyncSession(SessionLocal())
+
+
+async def run_sync(db: Any, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    run_sync DB接続の種類に合わせて同期の CRUD 関数を実行する
+
+    AsyncSession ならスレッドプールで、同期の Session ならその場で実行する。
+
+    Args:
+        db (Any): AsyncSession か Session
+        fn (Callable[..., T]): Session を第1引数に取る関数
+        *args (Any): fn に渡す位置引数
+        **kwargs (Any): fn に渡すキーワード引数
+
+    Returns:
+        T: fn の戻り値
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
+
+
+async def get_async_db():
+    """
+    get_async_db 非同期のDBセッションを取得する
 
     Yields:
-        sessionmaker: DBのセッション
+        AsyncSession: 非同期のDBセッション
+    """
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def get_streaming_db():
+    """
+    get_streaming_db ストリーミングするレスポンス用のDBセッションを取得する
+
+    リクエストごとのセッションは db_session_middleware がレスポンスの送信前に
+    閉じてしまうので、本文を送り終えるまで使うセッションは別に作る。
+    yield の後はレスポンスを送り終えてから実行される。
+
+    Yields:
+        Session: DBのセッション
     """
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def shutdown_db_executor() -> None:
+    """
+    shutdown_db_executor DBへの問い合わせ用のスレッドプールを止める
+    """
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False)
+        _db_executor = None
+
+
+def get_request_db(request: Request) -> Session:
+    """
+    get_request_db リクエストごとのDBセッションを取得する
+
+    セッションは最初に呼ばれたときに作り、同じリクエストの中では使い回す。
+    コネクションはセッションが最初に問い合わせをしたときにプールから借りる。
+
+    Args:
+        request (Request): リクエスト
+
+    Returns:
+        Session: このリクエストのDBセッション
+    """
+    db = getattr(request.state, "db", None)
+    if db is None:
+        db = SessionLocal()
+        request.state.db = db
+    return db
+
+
+async def close_request_db(request: Request) -> None:
+    """
+    close_request_db リクエストのDBセッションを閉じる。作られていない場合は何もしない。
+
+    Args:
+        request (Request): リクエスト
+    """
+    db = getattr(request.state, "db", None)
+    if db is None:
+        return
+    del request.state.db
+    if config.DB_ASYNC_MODE:
+        await AsyncSession(db).close()
+    else:
+        db.close()
+
+
+# Dependency
+def get_db(request: Request):
+    """
+    get_db DBに接続する
+
+    リクエストごとのセッションを返す。閉じるのは db_session_middleware が行う。
+    config.DB_ASYNC_MODE が有効な場合（初期値）は AsyncSession に包んで渡し、
+    *_async の CRUD 関数が専用のスレッドプールで問い合わせるようにする。
+    無効な場合は Session をそのまま渡すので、問い合わせはイベントループの上で
+    実行され、その間は他のリクエストを処理できない。
+
+    Args:
+        request (Request): リクエスト
+
+    Returns:
+        Any: DBのセッション
+    """
+    db = get_request_db(request)
+    return AsyncSession(db) if config.DB_ASYNC_MODE else db
@@ -0,0 +1,197 @@
+import datetime
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.core.conditional import Validators
+from app.core.fast_json import ModelSerializer
+from app.core.pagination import Cursor, split_page
+from app.core.response_cache import (
+    TOPICS_TAG,
+    CachedResponse,
+    get_response_cache,
+    make_key,
+    render_json,
+    topic_tag,
+)
+from app.db import models
+from app.db.crud.daily_topic_crud import get_daily_topics
+from app.db.crud.table_version_crud import get_table_version
+from app.db.crud.topic_crud import get_topic, get_topics
+from app.db.schemas.topics import Topic, TopicOut
+from app.db.session import run_sync
+
+TOPICS_PATH = f"{config.API_V1_STR}/topics"  #: お題一覧のパス
+TODAY_PATH = f"{TOPICS_PATH}/today"  #: その日の採用お題のパス
+
+serialize_topic = ModelSerializer(Topic)  #: お題を Topic の形の dict にする
+serialize_topic_out = ModelSerializer(TopicOut)  #: お題を投稿者付きの dict にする
+
+
+def get_topic_validators(db: Session) -> Validators:
+    """
+    get_topic_validators topic テーブルの更新番号から ETag と Last-Modified を作る
+
+    Args:
+        db (Session): DB接続
+
+    Returns:
+        Validators: ETag と Last-Modified
+    """
+    version, updated_at = get_table_version(db, models.Topic.__tablename__)
+    return Validators(f'"topic-{version}"', updated_at)
+
+
+def get_topic_detail_validators(db: Session, topic_id: int) -> Validators:
+    """
+    get_topic_detail_validators お題の詳細に付ける ETag と Last-Modified を作る
+
+    ETag は get_topic_validators と同じものを使う。存在しないIDに条件付きGETで
+    304 を返さないように、お題があるかを更新番号と同じ1回の問い合わせで調べる。
+
+    Args:
+        db (Session): DB接続
+        topic_id (int): お題のID
+
+    Raises:
+        HTTPException: お題が見つからない旨のHTTP 404 エラー
+
+    Returns:
+        Validators: ETag と Last-Modified
+    """
+    name = models.Topic.__tablename__
+    version = (
+        db.query(models.TableVersion.version)
+        .filter(models.TableVersion.name == name)
+        .as_scalar()
+    )
+    updated_at = (
+        db.query(models.TableVersion.updated_at)
+        .filter(models.TableVersion.name == name)
+        .as_scalar()
+    )
+    found = db.query(models.Topic.id).filter(models.Topic.id == topic_id).exists()
+    row = db.query(found, version, updated_at).one()
+    if not row[0]:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return Validators(f'"topic-{row[1] or 0}"', row[2])
+
+
+async def get_topic_validators_async(db) -> Validators:
+    """
+    get_topic_validators_async get_topic_validators の非同期版
+
+    Args:
+        db (Any): AsyncSession か Session
+
+    Returns:
+        Validators: ETag と Last-Modified
+    """
+    return await run_sync(db, get_topic_validators)
+
+
+def render_topics_page(
+    db: Session, limit: int, after: Optional[Cursor], validators: Validators
+) -> CachedResponse:
+    """
+    render_topics_page お題一覧の1ページをキャッシュできる形にシリアライズする
+
+    Args:
+        db (Session): DB接続
+        limit (int): 1ページの最大件数
+        after (Optional[Cursor]): 前のページの末尾を指すカーソル
+        validators (Validators): レスポンスに付ける ETag と Last-Modified
+
+    Returns:
+        CachedResponse: シリアライズしたレスポンス
+    """
+    page, next_cursor = split_page(get_topics(db, limit=limit + 1, after=after), limit)
+    headers = validators.headers()
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return render_json(serialize_topic.many(page), headers)
+
+
+def render_topic(db: Session, topic_id: int, validators: Validators) -> CachedResponse:
+    """
+    render_topic お題の詳細をキャッシュできる形にシリアライズする
+
+    Args:
+        db (Session): DB接続
+        topic_id (int): お題のID
+        validators (Validators): レスポンスに付ける ETag と Last-Modified
+
+    Raises:
+        HTTPException: お題が見つからない旨のHTTP 404 エラー
+
+    Returns:
+        CachedResponse: シリアライズしたレスポンス
+    """
+    return render_json(serialize_topic(get_topic(db, topic_id)), validators.headers())
+
+
+def daily_topics_key(day: datetime.date) -> str:
+    """
+    daily_topics_key その日の採用お題のキャッシュのキーを作る
+
+    Args:
+        day (datetime.date): 日付
+
+    Returns:
+        str: キー
+    """
+    return f"{make_key(TODAY_PATH)}#{day.isoformat()}"
+
+
+def render_daily_topics(db: Session, day: datetime.date) -> CachedResponse:
+    """
+    render_daily_topics その日の採用お題をキャッシュできる形にシリアライズする
+
+    Args:
+        db (Session): DB接続
+        day (datetime.date): 日付
+
+    Raises:
+        HTTPException: 採用お題がまだ選ばれていない旨のHTTP 404 エラー
+
+    Returns:
+        CachedResponse: シリアライズしたレスポンス
+    """
+    selected_day, topics = get_daily_topics(db, day)
+    if selected_day is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="No daily topics yet")
+    return render_json({"day": selected_day, "topics": serialize_topic.many(topics)})
+
+
+def warm_topic_cache(db: Session, detail_count: int) -> int:
+    """
+    warm_topic_cache お題一覧の最初のページと新しいお題の詳細をキャッシュに入れておく
+
+    キーはクエリパラメーターの無いリクエストと同じになるように作る。
+    既にキャッシュにあるものは作り直さない。
+
+    Args:
+        db (Session): DB接続
+        detail_count (int): 詳細をキャッシュする新しいお題の件数
+
+    Returns:
+        int: 新しくキャッシュに入れた件数
+    """
+    cache = get_response_cache()
+    generation = cache.generation
+    validators = get_topic_validators(db)
+    warmed = 0
+    key = f"{make_key(TOPICS_PATH)}#{validators.etag}"
+    if cache.backend is not None and cache.backend.get(key) is None:
+        page = render_topics_page(db, config.TOPICS_PAGE_SIZE, None, validators)
+        cache.set(key, page, [TOPICS_TAG], generation)
+        warmed += 1
+    for topic in get_topics(db, limit=detail_count):
+        key = f"{make_key(f'{TOPICS_PATH}/{topic.id}')}#{validators.etag}"
+        if cache.backend is not None and cache.backend.get(key) is None:
+            detail = render_json(serialize_topic(topic), validators.headers())
+            cache.set(key, detail, [TOPICS_TAG, topic_tag(topic.id)], generation)
+            warmed += 1
+    return warmed
@@ -0,0 +1,466 @@
+import bisect
+import datetime
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.db import models
+from app.db.crud.table_version_crud import get_table_version
+
+logger = logging.getLogger(__name__)
+
+MAX_REJECTIONS = 32  #: 絞り込み条件に合うお題を引き直す最大回数
+
+TopicRow = Tuple[int, Optional[datetime.date], bool, Optional[int]]
+
+
+class IndexedSet:
+    """
+    IndexedSet 追加・削除・無作為抽出がすべて O(1) でできる集合
+
+    要素の配列と、要素から配列上の位置への辞書を組にして持つ。
+    削除するときは末尾の要素と入れ替えてから取り除く。
+    """
+
+    def __init__(self):
+        self._items: List[int] = []
+        self._positions: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: int) -> bool:
+        return item in self._positions
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._items)
+
+    def add(self, item: int) -> None:
+        """
+        add 要素を追加する
+
+        Args:
+            item (int): 追加する要素
+        """
+        if item in self._positions:
+            return
+        self._positions[item] = len(self._items)
+        self._items.append(item)
+
+    def discard(self, item: int) -> None:
+        """
+        discard 要素を取り除く。無い場合は何もしない。
+
+        Args:
+            item (int): 取り除く要素
+        """
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def choice(self, rng: random.Random) -> Optional[int]:
+        """
+        choice 要素を1つ無作為に選ぶ
+
+        Args:
+            rng (random.Random): 乱数生成器
+
+        Returns:
+            Optional[int]: 選ばれた要素。空の場合はNone。
+        """
+        if not self._items:
+            return None
+        return self._items[int(rng.random() * len(self._items))]
+
+
+class _DateRange:
+    """
+    _DateRange 投稿日順の配列のうち、指定した期間に当たる部分
+
+    Args:
+        by_date (List[Tuple[int, int]]): (投稿日の序数, ID) を昇順に並べた配列
+        low (int): 期間の始まりの日の序数
+        high (int): 期間の終わりの日の序数
+    """
+
+    def __init__(self, by_date: List[Tuple[int, int]], low: int, high: int):
+        self._by_date = by_date
+        self._start = bisect.bisect_left(by_date, (low, -1))
+        self._end = bisect.bisect_left(by_date, (high + 1, -1))
+
+    def __iter__(self) -> Iterator[int]:
+        for _, topic_id in self._by_date[self._start : self._end]:
+            yield topic_id
+
+    def choice(self, rng: random.Random) -> Optional[int]:
+        if self._start >= self._end:
+            return None
+        position = self._start + int(rng.random() * (self._end - self._start))
+        return self._by_date[position][1]
+
+
+class TopicPool:
+    """
+    TopicPool お題ガチャ用に、見える状態のお題のIDをメモリ上に保持するプール
+
+    全体・採用済み・投稿者ごとの IndexedSet と、投稿日順に並べた配列を持つ。
+    絞り込みの無いガチャや、採用済み・投稿者での絞り込みは O(1) で引ける。
+    投稿日の範囲指定は二分探索で範囲を求めるため O(log n) となる。
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[int, bool, Optional[int]]] = {}
+        self._all = IndexedSet()
+        self._adopted = IndexedSet()
+        self._by_contributor: Dict[int, IndexedSet] = {}
+        self._by_date: List[Tuple[int, int]] = []
+        self.loaded_at = time.monotonic()
+        self.version = 0  #: 読み込んだときの topic テーブルの更新番号
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def __contains__(self, topic_id: int) -> bool:
+        return topic_id in self._entries
+
+    def add(
+        self,
+        topic_id: int,
+        post_date: Optional[datetime.date],
+        is_adopted: bool = False,
+        contributor_id: Optional[int] = None,
+    ) -> None:
+        """
+        add お題をプールに追加する。既にある場合は置き換える。
+
+        Args:
+            topic_id (int): お題のID
+            post_date (Optional[datetime.date]): 投稿日
+            is_adopted (bool, optional): 採用済みか。初期値は False。
+            contributor_id (Optional[int], optional): 投稿者のID。初期値は None。
+        """
+        ordinal = post_date.toordinal() if post_date else 0
+        with self._lock:
+            self._remove(topic_id)
+            self._index(topic_id, ordinal, is_adopted, contributor_id)
+            bisect.insort(self._by_date, (ordinal, topic_id))
+
+    @classmethod
+    def load(
+        cls, rows: Iterable[TopicRow], rng: Optional[random.Random] = None
+    ) -> "TopicPool":
+        """
+        load お題の行からプールを作る
+
+        add を繰り返すと投稿日順の配列への挿入で O(n²) になるため、
+        (投稿日の序数, ID) を集めてから最後に1回だけ並べ替える。
+
+        Args:
+            rows (Iterable[TopicRow]): (ID, 投稿日, 採用済みか, 投稿者のID) の行。IDは重複しないこと。
+            rng (Optional[random.Random], optional): 乱数生成器。初期値は None。
+
+        Returns:
+            TopicPool: 作ったプール
+        """
+        pool = cls(rng)
+        for topic_id, post_date, is_adopted, contributor_id in rows:
+            ordinal = post_date.toordinal() if post_date else 0
+            pool._index(topic_id, ordinal, bool(is_adopted), contributor_id)
+            pool._by_date.append((ordinal, topic_id))
+        pool._by_date.sort()
+        return pool
+
+    def _index(
+        self,
+        topic_id: int,
+        ordinal: int,
+        is_adopted: bool,
+        contributor_id: Optional[int],
+    ) -> None:
+        self._entries[topic_id] = (ordinal, is_adopted, contributor_id)
+        self._all.add(topic_id)
+        if is_adopted:
+            self._adopted.add(topic_id)
+        if contributor_id is not None:
+            self._by_contributor.setdefault(contributor_id, IndexedSet()).add(topic_id)
+
+    def remove(self, topic_id: int) -> None:
+        """
+        remove お題をプールから取り除く
+
+        Args:
+            topic_id (int): お題のID
+        """
+        with self._lock:
+            self._remove(topic_id)
+
+    def _remove(self, topic_id: int) -> None:
+        entry = self._entries.pop(topic_id, None)
+        if entry is None:
+            return
+        ordinal, _, contributor_id = entry
+        self._all.discard(topic_id)
+        self._adopted.discard(topic_id)
+        if contributor_id is not None:
+            bucket = self._by_contributor.get(contributor_id)
+            if bucket is not None:
+                bucket.discard(topic_id)
+                if not bucket:
+                    del self._by_contributor[contributor_id]
+        position = bisect.bisect_left(self._by_date, (ordinal, topic_id))
+        if position < len(self._by_date) and self._by_date[position][1] == topic_id:
+            del self._by_date[position]
+
+    def _matches(
+        self,
+        topic_id: int,
+        adopted: Optional[bool],
+        contributor_id: Optional[int],
+        since: int,
+        until: int,
+    ) -> bool:
+        ordinal, is_adopted, contributor = self._entries[topic_id]
+        if adopted is not None and is_adopted != adopted:
+            return False
+        if contributor_id is not None and contributor != contributor_id:
+            return False
+        return since <= ordinal <= until
+
+    def draw(
+        self,
+        adopted: Optional[bool] = None,
+        contributor_id: Optional[int] = None,
+        since: Optional[datetime.date] = None,
+        until: Optional[datetime.date] = None,
+    ) -> Optional[int]:
+        """
+        draw 条件に合うお題のIDを1つ無作為に引く
+
+        最も絞り込まれた候補から引き、残りの条件は引き直しで満たす。
+        引き直しが MAX_REJECTIONS 回を超えた場合は候補を走査して選ぶ。
+
+        Args:
+            adopted (Optional[bool], optional): 採用済みかで絞り込む。初期値は None。
+            contributor_id (Optional[int], optional): 投稿者で絞り込む。初期値は None。
+            since (Optional[datetime.date], optional): この日以降の投稿に絞り込む。
+            until (Optional[datetime.date], optional): この日以前の投稿に絞り込む。
+
+        Returns:
+            Optional[int]: 引いたお題のID。条件に合うお題が無い場合はNone。
+        """
+        low = since.toordinal() if since else 0
+        high = until.toordinal() if until else datetime.date.max.toordinal()
+        with self._lock:
+            candidates: Union[IndexedSet, _DateRange]
+            if contributor_id is not None:
+                candidates = self._by_contributor.get(contributor_id, IndexedSet())
+            elif since is not None or until is not None:
+                candidates = _DateRange(self._by_date, low, high)
+            elif adopted:
+                candidates = self._adopted
+            else:
+                candidates = self._all
+
+            for _ in range(MAX_REJECTIONS):
+                topic_id = candidates.choice(self._rng)
+                if topic_id is None:
+                    return None
+                if self._matches(topic_id, adopted, contributor_id, low, high):
+                    return topic_id
+
+            matched = [
+                topic_id
+                for topic_id in candidates
+                if self._matches(topic_id, adopted, contributor_id, low, high)
+            ]
+            if not matched:
+                return None
+            return matched[int(self._rng.random() * len(matched))]
+
+
+_pool: Optional[TopicPool] = None
+_stale = False  #: reset_topic_pool で古くなったことが分かっているか
+_checked_at = 0.0  #: 最後に更新番号を確かめた時刻（time.monotonic）
+_pending: Optional[List[Tuple[int, Optional[TopicRow]]]] = None  #: 読み込み中の変更
+_state_lock = threading.Lock()  #: _pool・_stale・_pending の入れ替えを守る
+_rebuild_lock = threading.Lock()  #: 読み込み直すスレッドを1つにする
+_rebuild_thread: Optional[threading.Thread] = None  #: 読み込み直しているスレッド
+
+
+def _apply(pool: TopicPool, topic_id: int, row: Optional[TopicRow]) -> None:
+    if row is None:
+        pool.remove(topic_id)
+    else:
+        _, post_date, is_adopted, contributor_id = row
+        pool.add(topic_id, post_date, is_adopted, contributor_id)
+
+
+def _rebuild(db: Session) -> None:
+    """
+    _rebuild DBからプールを読み込み直して入れ替える
+
+    読み込んでいる間に refresh_topic された変更は _pending に溜め、入れ替える前に
+    新しいプールに反映する。読み込みの結果に含まれていた変更を重ねて反映しても
+    結果は変わらない。更新番号は行より先に読むので、読み込み中に他のプロセスが
+    更新した場合は、次に確かめたときにもう一度読み込み直す。
+
+    Args:
+        db (Session): DB接続
+    """
+    global _pool, _stale, _pending
+    with _state_lock:
+        _stale, _pending = False, []
+    try:
+        version, _ = get_table_version(db, models.Topic.__tablename__)
+        rows = (
+            db.query(
+                models.Topic.id,
+                models.Topic.post_date,
+                models.Topic.is_adopted,
+                models.Topic.contributor_id,
+            )
+            .filter(models.Topic.is_visible)
+            .yield_per(1000)
+        )
+        pool = TopicPool.load(rows)
+        pool.version = version
+    except BaseException:
+        with _state_lock:
+            _stale, _pending = True, None
+        raise
+    with _state_lock:
+        for topic_id, row in _pending:
+            _apply(pool, topic_id, row)
+        _pool, _pending = pool, None
+
+
+def _rebuild_in_background(bind: Any) -> None:
+    """
+    _rebuild_in_background 別のスレッドでプールを読み込み直す
+
+    _rebuild_lock を取った状態で呼び、読み込み終えたらスレッドが解放する。
+    呼び出し元のセッションは別のスレッドから使えないので、同じ接続先に
+    新しいセッションを作る。
+
+    Args:
+        bind (Any): 読み込みに使うエンジン
+    """
+    global _rebuild_thread
+
+    def run() -> None:
+        try:
+            db = Session(bind=bind)
+            try:
+                _rebuild(db)
+            finally:
+                db.close()
+        except Exception:
+            logger.warning("failed to reload the topic pool", exc_info=True)
+        finally:
+            _rebuild_lock.release()
+
+    _rebuild_thread = threading.Thread(target=run, name="topic-pool", daemon=True)
+    _rebuild_thread.start()
+
+
+def _is_stale(db: Session, pool: TopicPool) -> bool:
+    """
+    _is_stale プールを読み込み直すべきか判断する
+
+    reset_topic_pool が呼ばれたか、config.TOPIC_POOL_TTL 秒を過ぎたか、
+    topic テーブルの更新番号が読み込んだときから進んでいれば読み込み直す。
+    更新番号を確かめるのは config.TOPIC_POOL_CHECK_INTERVAL 秒に1回まで。
+
+    Args:
+        db (Session): DB接続
+        pool (TopicPool): 今のプール
+
+    Returns:
+        bool: 読み込み直すべきか
+    """
+    global _checked_at
+    now = time.monotonic()
+    if _stale or now - pool.loaded_at > config.TOPIC_POOL_TTL:
+        return True
+    if now - _checked_at < config.TOPIC_POOL_CHECK_INTERVAL:
+        return False
+    _checked_at = now
+    version, _ = get_table_version(db, models.Topic.__tablename__)
+    return version != pool.version
+
+
+def get_topic_pool(db: Session) -> TopicPool:
+    """
+    get_topic_pool お題ガチャ用のプールを取得する
+
+    古くなったプールは別のスレッドで読み込み直し、その間は古いプールを返すので、
+    リクエストが読み込みを待つのはプールがまだ無い初回だけになる。
+    他のプロセス（Celery のワーカーでの一括登録や毎日の採用など）での変更は、
+    topic テーブルの更新番号が進んだことで分かる。
+
+    Args:
+        db (Session): DB接続
+
+    Returns:
+        TopicPool: お題ガチャ用のプール
+    """
+    pool = _pool
+    if pool is None:
+        with _rebuild_lock:
+            if _pool is None:
+                _rebuild(db)
+    elif _is_stale(db, pool) and _rebuild_lock.acquire(blocking=False):
+        if _pool is pool:
+            _rebuild_in_background(db.get_bind())
+        else:
+            _rebuild_lock.release()
+    assert _pool is not None
+    return _pool
+
+
+def refresh_topic(topic: models.Topic) -> None:
+    """
+    refresh_topic 作成・編集・削除されたお題をプールに反映する
+
+    プールがまだ読み込まれていない場合は何もしない。読み込み直している途中の
+    場合は、新しいプールにも反映されるように変更を記録しておく。
+
+    Args:
+        topic (models.Topic): 反映するお題
+    """
+    row: Optional[TopicRow] = None
+    if topic.is_visible:
+        row = (
+            topic.id,
+            topic.post_date,
+            bool(topic.is_adopted),
+            topic.contributor_id,
+        )
+    with _state_lock:
+        pool = _pool
+        if _pending is not None:
+            _pending.append((topic.id, row))
+    if pool is not None:
+        _apply(pool, topic.id, row)
+
+
+def reset_topic_pool() -> None:
+    """
+    reset_topic_pool 次に使うときにプールをDBから読み込み直させる
+
+    一括登録のように1件ずつ refresh_topic できない更新の後に呼ぶ。
+    読み込み直し終えるまでは今のプールを使い続ける。
+    """
+    global _stale
+    _stale = True
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from app.core import config
+from app.db.bulk_import import decode_lines, import_topics
+from app.db.crud.user_crud import get_user_by_email
+from app.db.session import SessionLocal
+
+
+def main() -> int:
+    """
+    main NDJSON か CSV のファイルからお題を一括登録する
+
+    Returns:
+        int: 終了コード。登録できなかった行があれば 1。
+    """
+    parser = argparse.ArgumentParser(description="お題を一括登録する")
+    parser.add_argument("path", help="NDJSON か CSV のファイル。- なら標準入力")
+    parser.add_argument(
+        "--contributor",
+        required=True,
+        help="contributor_id が無い行の投稿者のメールアドレス",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["ndjson", "csv"],
+        help="ファイルの形式。省略すると拡張子で判断する",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.IMPORT_BATCH_SIZE,
+        help="まとめて登録する件数",
+    )
+    args = parser.parse_args()
+    file_format = args.format or (
+        "csv" if args.path.lower().endswith(".csv") else "ndjson"
+    )
+
+    db = SessionLocal()
+    try:
+        contributor = get_user_by_email(db, args.contributor)
+        if contributor is None:
+            print(f"User {args.contributor} not found", file=sys.stderr)
+            return 2
+        if args.path == "-":
+            result = import_topics(
+                db,
+                decode_lines(sys.stdin.buffer),
+                file_format,
+                contributor.id,
+                args.batch_size,
+            )
+        else:
+            with open(args.path, "rb") as file:
+                result = import_topics(
+                    db, decode_lines(file), file_format, contributor.id, args.batch_size
+                )
+    finally:
+        db.close()
+
+    for error in result.errors:
+        print(f"line {error.line}: {error.message}", file=sys.stderr)
+    print(f"Imported {result.inserted} topics, {result.failed} failed")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
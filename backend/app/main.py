@@ -1,14 +1,28 @@
-import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, status
 from starlette.requests import Request
+from starlette.responses import Response
 
 from app.api.api_v1.routers.auth import auth_router
+from app.api.api_v1.routers.tasks import tasks_router
 from app.api.api_v1.routers.topics import topics_router
 from app.api.api_v1.routers.users import users_router
-from app.core import config
-from app.core.auth import get_current_active_user
-from app.core.celery_app import celery_app
-from app.db.session import SessionLocal
+from app.core import config, security
+from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.instrumentation import log_request, start_request
+from app.core.metrics import CONTENT_TYPE, REGISTRY, observe_request
+from app.core.response_cache import get_response_cache
+from app.core.task_outbox import (
+    OutboxFull,
+    enqueue_task,
+    get_task_outbox,
+    shutdown_task_outbox,
+)
+from app.db.session import (
+    close_request_db,
+    get_engine,
+    pool_status,
+    shutdown_db_executor,
+)
 
 app = FastAPI(title=config.PROJECT_NAME, docs_url="/api/docs", openapi_url="/api")
 
@@ -16,7 +30,33 @@ app = FastAPI(title=config.PROJECT_NAME, docs_url="/api/docs", openapi_url="/api
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
     """
-    db_session_middleware DB接続を生成する
+    db_session_middleware リクエストの終わりにDB接続を閉じる
+
+    DB接続は get_db が必要になったときに作るので、DBを使わないリクエストでは
+    セッションもコネクションも作られない。call_next が例外を投げても必ず閉じる。
+
+    Args:
+        request (Request): リクエスト
+        call_next (Any): 次のリクエストを呼ぶ
+
+    Returns:
+        Any: レスポンス
+    """
+    try:
+        return await call_next(request)
+    finally:
+        await close_request_db(request)
+
+
+@app.middleware("http")
+async def instrumentation_middleware(request: Request, call_next):
+    """
+    instrumentation_middleware リクエストの所要時間とDBへの問い合わせを記録する
+
+    db_session_middleware より外側で動くので、DB接続を閉じるまでの時間も含む。
+    問い合わせの回数と時間を Server-Timing ヘッダーで返し、1行のJSONでログに出す。
+    所要時間はルートごとのヒストグラム（app.core.metrics）にも記録する。
+    ストリーミングのレスポンスは本文を送り始めるまでの時間になる。
 
     Args:
         request (Request): リクエスト
@@ -25,12 +65,40 @@ async def db_session_middleware(request: Request, call_next):
     Returns:
         Any: レスポンス
     """
-    request.state.db = SessionLocal()
+    stats = start_request()
     response = await call_next(request)
-    request.state.db.close()
+    total = stats.elapsed()
+    observe_request(request.scope, response.status_code, total)
+    if config.SERVER_TIMING:
+        response.headers["Server-Timing"] = stats.server_timing(total)
+    log_request(stats, request.method, request.url.path, response.status_code, total)
     return response
 
 
+@app.on_event("startup")
+def init_resources():
+    """
+    init_resources アプリケーションの起動時にエンジンとパスワードのハッシュの設定を作る
+
+    どちらも import のときには作らないので、テストの収集や reload を遅くしない。
+    Celery はタスクを初めて送るときに送信待ちキューのスレッドで作る。
+    """
+    get_engine()
+    security.get_pwd_context()
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    """
+    shutdown_executors アプリケーションの終了時にスレッドプールを止める
+
+    送信待ちのタスクは先に送ってから止める。
+    """
+    shutdown_task_outbox()
+    security.shutdown_hash_executor()
+    shutdown_db_executor()
+
+
 @app.get("/api/v1")
 async def root():
     """
@@ -47,14 +115,86 @@ async def example_task():
     """
     example_task サンプルタスク
 
+    タスクは送信待ちキューに積むだけで、ブローカーには送り終わるのを待たずに返す。
+
+    Raises:
+        HTTPException: 送信待ちが上限に達している旨の HTTP 503 エラー
+
     Returns:
         dict: 成功を表すメッセージ
     """
-    celery_app.send_task("app.tasks.example_task", args=["Hello World"])
+    try:
+        enqueue_task("app.tasks.example_task", args=["Hello World"])
+    except OutboxFull:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending tasks",
+            headers={"Retry-After": "1"},
+        )
 
     return {"message": "success"}
 
 
+@app.get("/api/v1/task/outbox")
+async def task_outbox_stats(current_user=Depends(get_current_active_superuser)):
+    """
+    task_outbox_stats タスクの送信待ちキューの状況を取得する。管理者のみ。
+
+    Args:
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        dict: 送信待ちキューの状況
+    """
+    return get_task_outbox().stats()
+
+
+@app.get("/api/v1/db/pool")
+async def db_pool(current_user=Depends(get_current_active_superuser)):
+    """
+    db_pool DBのコネクションプールの状態を取得する。管理者のみ。
+
+    Args:
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        dict: コネクションプールの状態
+    """
+    return pool_status()
+
+
+@app.get("/api/v1/cache")
+async def response_cache_stats(current_user=Depends(get_current_active_superuser)):
+    """
+    response_cache_stats レスポンスキャッシュのヒット数とミス数を取得する。管理者のみ。
+
+    Args:
+        current_user (Any, optional):
+            現在のユーザー。初期値はDepends(get_current_active_superuser)。
+
+    Returns:
+        dict: レスポンスキャッシュの利用状況
+    """
+    return get_response_cache().stats()
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics():
+    """
+    metrics Prometheus のテキスト形式でメトリクスを返す
+
+    Prometheus から集めるので認証はしない。外部からは nginx で拒否しているので、
+    Prometheus は backend:8888 から直接集める。
+
+    Returns:
+        Response: ルートごとの所要時間、コネクションプール、パスワードの検証、
+        タスクの送信、レスポンスキャッシュのメトリクス
+    """
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 # Routers
 app.include_router(
     users_router,
@@ -68,6 +208,9 @@ app.include_router(
     prefix="/api/v1",
     tags=["topics"],
 )
+app.include_router(tasks_router, prefix="/api/v1", tags=["tasks"])
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="0.0.0.0", reload=True, port=8888)
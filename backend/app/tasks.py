@@ -1,4 +1,39 @@
+import datetime
+import os
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import config
 from app.core.celery_app import celery_app
+from app.core.task_files import task_file_path
+from app.db.bulk_import import decode_lines, import_topics
+from app.db.crud.daily_topic_crud import select_daily_topics
+from app.db.crud.topic_crud import EXPORT_COLUMNS, iter_all_topics
+from app.db.export import csv_chunks, gzip_chunks, ndjson_chunks
+from app.db.search import has_trigram
+from app.db.session import SessionLocal
+from app.db.topic_cache import warm_topic_cache
+
+logger = get_task_logger(__name__)
+
+
+@contextmanager
+def task_session() -> Iterator[Session]:
+    """
+    task_session タスク用のDBセッションを作り、終わったら閉じる
+
+    Yields:
+        Session: DBのセッション
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 
 @celery_app.task(acks_late=True)
@@ -13,3 +48,154 @@ def example_task(word: str) -> str:
         str: テストタスクが返す文字列
     """
     return f"test task returns {word}"
+
+
+@celery_app.task(acks_late=True)
+def run_batch(task_name: str, argsets: List[Sequence]) -> dict:
+    """
+    run_batch send_batched でまとめられた呼び出しを順に実行する
+
+    失敗した呼び出しはログに残して飛ばし、残りの呼び出しは続ける。
+
+    Args:
+        task_name (str): 実行するタスクの名前
+        argsets (List[Sequence]): 1回の呼び出しごとの位置引数
+
+    Returns:
+        dict: 実行した件数と、失敗した呼び出しの位置とエラーの組
+    """
+    task = celery_app.tasks[task_name]
+    failed = []
+    for index, args in enumerate(argsets):
+        try:
+            task(*args)
+        except Exception as exc:
+            logger.exception("%s failed in batch", task_name)
+            failed.append([index, repr(exc)])
+    return {"done": len(argsets) - len(failed), "failed": failed}
+
+
+@celery_app.task(acks_late=True)
+def import_topics_task(
+    path: str, file_format: str, contributor_id: int, batch_size: int
+) -> dict:
+    """
+    import_topics_task アップロードされたファイルからお題を一括登録する
+
+    ファイルは登録が終わったら消す。
+
+    Args:
+        path (str): task_file_path で作ったファイルのパス
+        file_format (str): ndjson か csv
+        contributor_id (int): 投稿者が指定されていない行の投稿者のID
+        batch_size (int): まとめて登録する件数
+
+    Returns:
+        dict: TopicImportResult の内容
+    """
+    try:
+        with task_session() as db, open(path, "rb") as file:
+            result = import_topics(
+                db, decode_lines(file), file_format, contributor_id, batch_size
+            )
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return result.dict()
+
+
+@celery_app.task(bind=True, acks_late=True)
+def export_topics_task(
+    self,
+    file_format: str = "ndjson",
+    compress: bool = False,
+    include_hidden: bool = True,
+) -> dict:
+    """
+    export_topics_task 全てのお題をファイルに書き出す
+
+    書き終わるまでは別名で書き、最後に名前を変えるので、途中のファイルは見えない。
+
+    Args:
+        file_format (str, optional): ndjson か csv。初期値は ndjson。
+        compress (bool, optional): gzip で圧縮するか。初期値は False。
+        include_hidden (bool, optional): 削除済みのお題も含めるか。初期値は True。
+
+    Returns:
+        dict: 書き出したファイルの名前とバイト数
+    """
+    filename = f"{self.request.id}.{file_format}" + (".gz" if compress else "")
+    path = task_file_path("exports", filename)
+    columns = [column.key for column in EXPORT_COLUMNS]
+    size = 0
+    with task_session() as db, open(f"{path}.part", "wb") as file:
+        rows = iter_all_topics(db, include_hidden, config.EXPORT_BATCH_SIZE)
+        if file_format == "csv":
+            chunks = csv_chunks(columns, rows)
+        else:
+            chunks = ndjson_chunks(columns, rows)
+        if compress:
+            chunks = gzip_chunks(chunks)
+        for chunk in chunks:
+            file.write(chunk)
+            size += len(chunk)
+    os.replace(f"{path}.part", path)
+    return {"file": filename, "bytes": size}
+
+
+@celery_app.task(acks_late=True)
+def rebuild_search_index_task() -> dict:
+    """
+    rebuild_search_index_task お題検索用の索引を作り直し、統計情報を更新する
+
+    pg_trgm の GIN 索引は書き込みを止めないように CONCURRENTLY で作り直す。
+    PostgreSQL 以外では統計情報の更新だけを行う。
+
+    Returns:
+        dict: 索引を作り直したか
+    """
+    with task_session() as db:
+        bind = db.get_bind()
+        reindex = bind.dialect.name == "postgresql" and has_trigram(db)
+        with bind.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if reindex:
+                conn.execute(text("REINDEX INDEX CONCURRENTLY ix_topic_topic_trgm"))
+            conn.execute(text("ANALYZE topic"))
+    return {"reindexed": reindex}
+
+
+@celery_app.task(acks_late=True, ignore_result=True)
+def warm_topic_cache_task() -> dict:
+    """
+    warm_topic_cache_task お題一覧と新しいお題の詳細をレスポンスキャッシュに入れておく
+
+    celery beat から config.CACHE_WARM_INTERVAL 秒ごとに呼ばれる。
+    キャッシュが API と共有される Redis の場合だけ意味があるので、それ以外では何もしない。
+
+    Returns:
+        dict: 新しくキャッシュに入れた件数
+    """
+    if config.RESPONSE_CACHE_BACKEND != "redis":
+        return {"warmed": 0}
+    with task_session() as db:
+        warmed = warm_topic_cache(db, config.CACHE_WARM_TOPICS)
+    return {"warmed": warmed}
+
+
+@celery_app.task(acks_late=True)
+def select_daily_topics_task(day: Optional[str] = None, force: bool = False) -> dict:
+    """
+    select_daily_topics_task その日の採用お題を選ぶ。beat で毎日実行する。
+
+    Args:
+        day (Optional[str], optional): ISO 形式の日付。初期値は None（今日）。
+        force (bool, optional): その日の分を選び直すか。初期値は False。
+
+    Returns:
+        dict: 選んだ日と、選ばれたお題のID
+    """
+    selected_day = datetime.date.fromisoformat(day) if day else datetime.date.today()
+    with task_session() as db:
+        topics = select_daily_topics(db, selected_day, force=force)
+        return {"day": selected_day.isoformat(), "topics": [t.id for t in topics]}
@@ -0,0 +1,101 @@
+import io
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import models
+from app.db.bulk_import import (
+    INVALID_ENCODING,
+    TopicImporter,
+    decode_lines,
+    import_topics,
+    iter_csv,
+    iter_ndjson,
+)
+
+
+def test_iter_ndjson():
+    """
+    test_iter_ndjson 読み込めない行を理由付きで返し、空行を飛ばすかのテスト
+    """
+    records = list(iter_ndjson(['{"topic": "a"}\n', "\n", "[1]\n", "{\n"]))
+    assert records[0] == (1, {"topic": "a"})
+    assert records[1] == (3, "Each line must be a JSON object")
+    assert records[2][0] == 4
+    assert records[2][1].startswith("Invalid JSON")
+
+
+def test_iter_csv():
+    """
+    test_iter_csv 空欄を値が無いものとして扱い、行番号が改行を含む値に合わせて進むかのテスト
+    """
+    lines = io.StringIO('topic,picture_url\n"a\nb",\nc,http://x\n', newline="")
+    assert list(iter_csv(lines)) == [
+        (3, {"topic": "a\nb"}),
+        (4, {"topic": "c", "picture_url": "http://x"}),
+    ]
+
+
+def test_invalid_utf8_fails_only_that_line():
+    """
+    test_invalid_utf8_fails_only_that_line UTF-8 として正しくない行だけを失敗にするかのテスト
+    """
+    ndjson = [b'{"topic": "a"}\n', b'{"topic": "\xff"}\n', b'{"topic": "b"}\n']
+    assert [record for _, record in iter_ndjson(decode_lines(ndjson))] == [
+        {"topic": "a"},
+        INVALID_ENCODING,
+        {"topic": "b"},
+    ]
+
+    csv_lines = [b"topic\n", b"a\n", b"\xe3\x81\n", b"b\n"]
+    assert list(iter_csv(decode_lines(csv_lines))) == [
+        (2, {"topic": "a"}),
+        (3, INVALID_ENCODING),
+        (4, {"topic": "b"}),
+    ]
+
+
+def test_import_keeps_empty_topic_in_batch(test_db, test_user, monkeypatch):
+    """
+    test_import_keeps_empty_topic_in_batch 本文が空文字列の行もまとめて登録できるかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+        monkeypatch (Any): モンキーパッチ
+    """
+
+    def fail(self, batch):
+        raise AssertionError("fell back to one-by-one inserts")
+
+    monkeypatch.setattr(TopicImporter, "_insert_one_by_one", fail)
+    file = io.StringIO('{"topic": ""}\n{"topic": "a"}\n')
+    result = import_topics(test_db, file, "ndjson", test_user.id)
+
+    assert result.inserted == 2
+    assert {t.topic for t in test_db.query(models.Topic)} == {"", "a"}
+    assert (
+        test_db.query(models.Topic).filter(models.Topic.picture_url.is_(None)).count()
+        == 2
+    )
+
+
+def test_import_retries_failed_batch_one_by_one(test_db, test_user, monkeypatch):
+    """
+    test_import_retries_failed_batch_one_by_one まとまりの登録に失敗したら1件ずつ登録し直すかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+        monkeypatch (Any): モンキーパッチ
+    """
+
+    def fail(self, rows):
+        raise SQLAlchemyError("batch failed")
+
+    monkeypatch.setattr(TopicImporter, "_insert", fail)
+    file = io.StringIO('{"topic": "a"}\n{"topic": "b"}\n{"topic": "c"}\n')
+    result = import_topics(test_db, file, "ndjson", test_user.id, batch_size=2)
+
+    assert result.inserted == 3
+    assert result.failed == 0
+    assert test_db.query(models.Topic).count() == 3
@@ -0,0 +1,46 @@
+from app.core.cache import TTLCache
+
+
+class FakeTimer:
+    """
+    FakeTimer 手動で進める時計
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires():
+    """
+    test_ttl_cache_expires 有効期限を過ぎた値が取得できないことのテスト
+    """
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+
+    timer.now = 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    timer.now = 5
+    assert "a" not in cache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """
+    test_ttl_cache_evicts_least_recently_used 最も長く使われていない値から捨てるかのテスト
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.pop("c") == 3
+    assert len(cache) == 1
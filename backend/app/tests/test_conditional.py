@@ -0,0 +1,55 @@
+import datetime
+
+from starlette.requests import Request
+
+from app.core.conditional import Validators
+
+
+def make_request(**headers: str) -> Request:
+    """
+    make_request ヘッダーだけを持つリクエストを作る
+
+    Returns:
+        Request: リクエスト
+    """
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.replace("_", "-").lower().encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_if_none_match():
+    """
+    test_if_none_match If-None-Match を弱い比較で判定するかのテスト
+    """
+    validators = Validators('"topic-3"')
+    assert validators.is_not_modified(make_request(if_none_match='W/"topic-3"'))
+    assert validators.is_not_modified(make_request(if_none_match='"a", "topic-3"'))
+    assert validators.is_not_modified(make_request(if_none_match="*"))
+    assert not validators.is_not_modified(make_request(if_none_match='"topic-2"'))
+    assert not validators.is_not_modified(make_request())
+
+
+def test_if_modified_since():
+    """
+    test_if_modified_since If-Modified-Since を秒単位で判定するかのテスト
+    """
+    updated_at = datetime.datetime(
+        2020, 1, 2, 3, 4, 5, 600000, tzinfo=datetime.timezone.utc
+    )
+    validators = Validators('"topic-3"', updated_at)
+    last_modified = validators.headers()["Last-Modified"]
+    assert last_modified == "Thu, 02 Jan 2020 03:04:05 GMT"
+    assert validators.is_not_modified(make_request(if_modified_since=last_modified))
+    assert not validators.is_not_modified(
+        make_request(if_modified_since="Thu, 02 Jan 2020 03:04:04 GMT")
+    )
+    assert not validators.is_not_modified(make_request(if_modified_since="garbage"))
+    assert not validators.is_not_modified(
+        make_request(if_none_match='"topic-2"', if_modified_since=last_modified)
+    )
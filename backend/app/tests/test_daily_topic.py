@@ -0,0 +1,101 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from app.db import models
+from app.db.crud.daily_topic_crud import (
+    Candidate,
+    Weights,
+    get_daily_topics,
+    pick_topics,
+    select_daily_topics,
+)
+
+DAY = date(2021, 1, 1)
+
+
+def test_pick_topics_limits_contributors():
+    """
+    test_pick_topics_limits_contributors 1日に同じ投稿者から選ぶ件数が上限を超えないかのテスト
+    """
+    candidates = [Candidate(i, i % 2, DAY) for i in range(10)]
+    weights = Weights(
+        age=1.0, age_horizon_days=365, fairness=2.0, max_per_contributor=1
+    )
+
+    picked = pick_topics(candidates, {}, DAY, 3, weights)
+
+    assert len(picked) == 2
+    assert {candidate.contributor_id for candidate, _ in picked} == {0, 1}
+    assert picked == pick_topics(candidates, {}, DAY, 3, weights)
+
+
+def test_pick_topics_prefers_weighted_candidates():
+    """
+    test_pick_topics_prefers_weighted_candidates
+    採用されたことの無い投稿者の古いお題が選ばれやすいかのテスト
+    """
+    weights = Weights(
+        age=5.0, age_horizon_days=100, fairness=5.0, max_per_contributor=1
+    )
+    favoured = Candidate(1, 1, date(2020, 1, 1))
+    wins = 0
+    for offset in range(200):
+        day = date.fromordinal(DAY.toordinal() + offset)
+        other = Candidate(2, 2, day)
+        picked = pick_topics([favoured, other], {2: 10}, day, 1, weights)
+        wins += picked[0][0] == favoured
+    assert wins > 150
+
+
+def test_select_daily_topics(test_db, test_topic, test_topic_written_by_superuser):
+    """
+    test_select_daily_topics 採用お題が保存されて採用済みになり、同じ日には選び直さないかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+        test_topic_written_by_superuser (Any): 管理者ユーザーが作成したテスト用お題
+    """
+    weights = Weights(
+        age=1.0, age_horizon_days=365, fairness=2.0, max_per_contributor=1
+    )
+
+    topics = select_daily_topics(test_db, DAY, count=5, weights=weights)
+
+    assert {topic.id for topic in topics} == {
+        test_topic.id,
+        test_topic_written_by_superuser.id,
+    }
+    assert all(topic.is_adopted for topic in topics)
+    assert test_db.query(models.DailyTopic).count() == 2
+    assert select_daily_topics(test_db, DAY, count=5, weights=weights) == topics
+    assert get_daily_topics(test_db, date(2021, 1, 5)) == (DAY, topics)
+    assert get_daily_topics(test_db, date(2020, 12, 31)) == (None, [])
+
+
+def test_select_daily_topics_is_ordered_and_locked(test_db, test_topic):
+    """
+    test_select_daily_topics_is_ordered_and_locked
+    候補をIDの順に読み、PostgreSQL では日付ごとのロックを取るかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    bind = test_db.get_bind()
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        select_daily_topics(test_db, DAY, count=1)
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+    candidate_query = next(s for s in statements if "topic.post_date <=" in s)
+    assert "ORDER BY topic.id" in candidate_query
+    if bind.dialect.name == "postgresql":
+        assert any("pg_advisory_xact_lock" in s for s in statements)
@@ -0,0 +1,51 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+
+from app.db.export import csv_chunks, gzip_chunks, ndjson_chunks
+
+COLUMNS = ["id", "topic", "picture_url", "post_date"]
+ROWS = [(i, f"お題{i}", None, datetime.date(2020, 1, 1)) for i in range(100)]
+
+
+def test_ndjson_chunks():
+    """
+    test_ndjson_chunks 行が分割されずに複数のまとまりで返るかのテスト
+    """
+    chunks = list(ndjson_chunks(COLUMNS, ROWS, chunk_size=256))
+    assert len(chunks) > 1
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert rows[3] == {
+        "id": 3,
+        "topic": "お題3",
+        "picture_url": None,
+        "post_date": "2020-01-01",
+    }
+    assert len(rows) == len(ROWS)
+
+
+def test_csv_chunks():
+    """
+    test_csv_chunks ヘッダー付きの CSV が複数のまとまりで返るかのテスト
+    """
+    chunks = list(csv_chunks(COLUMNS, ROWS, chunk_size=256))
+    assert len(chunks) > 1
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert rows[3] == {
+        "id": "3",
+        "topic": "お題3",
+        "picture_url": "",
+        "post_date": "2020-01-01",
+    }
+    assert len(rows) == len(ROWS)
+
+
+def test_gzip_chunks():
+    """
+    test_gzip_chunks 圧縮したものを展開すると元に戻るかのテスト
+    """
+    chunks = list(ndjson_chunks(COLUMNS, ROWS, chunk_size=256))
+    assert gzip.decompress(b"".join(gzip_chunks(chunks))) == b"".join(chunks)
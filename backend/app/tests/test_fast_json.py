@@ -0,0 +1,62 @@
+import json
+from datetime import date
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.core import fast_json
+from app.core.fast_json import FastJSONResponse, ModelSerializer
+from app.db import models
+from app.db.schemas.topics import Topic, TopicOut
+from app.db.schemas.users import User
+
+
+def test_model_serializer_matches_pydantic(test_db, test_topic):
+    """
+    test_model_serializer_matches_pydantic
+    pydantic のモデルを通した場合と同じ dict になるかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    test_topic.picture_url = None
+    for model in (Topic, TopicOut):
+        expected = jsonable_encoder(model.from_orm(test_topic), exclude_none=True)
+        actual = ModelSerializer(model)(test_topic)
+        assert json.loads(fast_json.dumps(actual)) == expected
+        assert "picture_url" not in actual
+
+    user = test_db.query(models.User).first()
+    expected = jsonable_encoder(User.from_orm(user), exclude_none=True)
+    assert json.loads(fast_json.dumps(ModelSerializer(User)(user))) == expected
+
+
+def test_dumps_without_orjson(monkeypatch):
+    """
+    test_dumps_without_orjson orjson が無くても JSONResponse と同じバイト列になるかのテスト
+
+    Args:
+        monkeypatch (Any): orjson を無いことにする。
+    """
+    monkeypatch.setattr(fast_json, "orjson", None)
+    content = [{"topic": "お題", "post_date": date(2021, 1, 2), "id": 1}]
+
+    expected = JSONResponse(jsonable_encoder(content)).body
+    assert fast_json.dumps(content) == expected
+    assert FastJSONResponse(content).body == expected
+
+
+def test_orjson_matches_fallback(monkeypatch):
+    """
+    test_orjson_matches_fallback orjson と標準の json で同じバイト列になるかのテスト
+
+    Args:
+        monkeypatch (Any): orjson を無いことにする。
+    """
+    pytest.importorskip("orjson")
+    content = [{"topic": "お題 ", "post_date": date(2021, 1, 2), "id": 1}]
+    with_orjson = fast_json.dumps(content)
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.dumps(content) == with_orjson
@@ -0,0 +1,127 @@
+import asyncio
+import contextvars
+import json
+import logging
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.core import config
+from app.core.instrumentation import (
+    RequestStats,
+    current_stats,
+    instrument_engine,
+    log_request,
+    start_request,
+)
+from app.db.crud import topic_crud
+from app.db.session import AsyncSession
+
+
+def test_request_stats_keeps_slowest_statement():
+    """
+    test_request_stats_keeps_slowest_statement 回数と合計と最も遅い問い合わせを記録するかのテスト
+    """
+    stats = RequestStats()
+    stats.record("SELECT 1", 0.002)
+    stats.record("SELECT 2", 0.005)
+    stats.record("SELECT 3", 0.001)
+    assert stats.queries == 3
+    assert abs(stats.db_time - 0.008) < 1e-9
+    assert stats.slowest_statement == "SELECT 2"
+    assert stats.server_timing(0.010) == (
+        'db;dur=8.0;desc="3 queries", app;dur=2.0, total;dur=10.0'
+    )
+
+
+def test_over_budget_logs_warning(monkeypatch, caplog):
+    """
+    test_over_budget_logs_warning 予算を超えたリクエストを WARNING で出すかのテスト
+
+    Args:
+        monkeypatch (Any): monkeypatch
+        caplog (Any): ログの記録
+    """
+    monkeypatch.setattr(config, "REQUEST_TIME_BUDGET_MS", 100.0)
+    monkeypatch.setattr(config, "REQUEST_QUERY_BUDGET", 1)
+    stats = RequestStats()
+    stats.record("SELECT 1", 0.001)
+    with caplog.at_level(logging.INFO, logger="app.request"):
+        log_request(stats, "GET", "/api/v1/topics", 200, 0.05)
+        stats.record("SELECT\n  2", 0.002)
+        log_request(stats, "GET", "/api/v1/topics", 200, 0.2)
+
+    fast, slow = caplog.records
+    assert fast.levelno == logging.INFO
+    assert "over_budget" not in json.loads(fast.getMessage())
+    assert slow.levelno == logging.WARNING
+    record = json.loads(slow.getMessage())
+    assert record["over_budget"] == ["latency", "queries"]
+    assert record["db_queries"] == 2
+    assert record["slowest_statement"] == "SELECT 2"
+
+    monkeypatch.setattr(config, "REQUEST_TIME_BUDGET_MS", 0.0)
+    monkeypatch.setattr(config, "REQUEST_QUERY_BUDGET", 0)
+    assert stats.over_budget(10.0) == []
+
+
+def test_queries_in_db_executor_are_counted(test_db, test_topic):
+    """
+    test_queries_in_db_executor_are_counted DB専用のスレッドでの問い合わせも数えるかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    instrument_engine(test_db.get_bind())
+
+    async def handle():
+        stats = start_request()
+        await topic_crud.get_topic_async(AsyncSession(test_db), test_topic.id)
+        return stats
+
+    stats = asyncio.run(handle())
+    assert stats.queries >= 1
+    assert "topic" in stats.slowest_statement
+    assert current_stats() is None
+
+
+def test_failed_statement_does_not_leak_start_time():
+    """
+    test_failed_statement_does_not_leak_start_time
+    失敗した問い合わせの開始時刻がコネクションに残らないかのテスト
+    """
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    def handle():
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute("SELECT * FROM missing_table")
+            stats = start_request()
+            conn.execute("SELECT 1")
+            assert not conn.info.get("query_started")
+        return stats
+
+    stats = contextvars.copy_context().run(handle)
+    assert stats.queries == 1
+    assert stats.slowest_statement == "SELECT 1"
+
+
+def test_server_timing_header(client, test_db, test_topic):
+    """
+    test_server_timing_header レスポンスに Server-Timing ヘッダーが付くかのテスト
+
+    Args:
+        client (Any): テスト用クライアント
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    instrument_engine(test_db.get_bind())
+    response = client.get(f"/api/v1/topics/{test_topic.id}")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert 'desc="0 queries"' not in timing
+    assert "total;dur=" in timing
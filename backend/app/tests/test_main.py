@@ -1,3 +1,8 @@
+from app.core import config, task_outbox
+from app.db import session
+from app.main import app
+
+
 def test_read_main(client):
     """
     test_read_main APIのルートアドレスにアクセスできるかのテスト
@@ -8,3 +13,116 @@ def test_read_main(client):
     response = client.get("/api/v1")
     assert response.status_code == 200
     assert response.json() == {"message": "Hello World"}
+
+
+class CountingSession:
+    """
+    CountingSession テスト用DB接続に処理を任せ、close の回数だけ数えるセッション
+
+    Args:
+        db (Any): テスト用DB接続
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self.closed = 0
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def close(self):
+        self.closed += 1
+
+
+def test_db_session_is_lazy_and_shared(client, test_db, test_topic, monkeypatch):
+    """
+    test_db_session_is_lazy_and_shared
+    DBセッションが必要なときだけ1つ作られ、リクエストの終わりに閉じられるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+        monkeypatch (Any): セッションの生成を数える。
+    """
+    sessions = []
+
+    def session_local():
+        sessions.append(CountingSession(test_db))
+        return sessions[-1]
+
+    monkeypatch.delitem(app.dependency_overrides, session.get_db)
+    monkeypatch.setattr(session, "SessionLocal", session_local)
+
+    assert client.get("/api/v1").status_code == 200
+    assert sessions == []
+
+    assert client.get(f"/api/v1/topics/{test_topic.id}").status_code == 200
+    assert len(sessions) == 1
+    assert sessions[0].closed == 1
+
+    assert client.get("/api/v1/topics/9999").status_code == 404
+    assert len(sessions) == 2
+    assert sessions[1].closed == 1
+
+
+def test_db_pool(client, superuser_token_headers, user_token_headers):
+    """
+    test_db_pool コネクションプールの状態を管理者だけが取得できるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+        user_token_headers (Any): テスト用一般ユーザーの認証用JWTトークンヘッダー
+    """
+    response = client.get("/api/v1/db/pool", headers=superuser_token_headers)
+    assert response.status_code == 200
+    assert response.json()["pool_class"] == "TimedQueuePool"
+    assert "checked_out" in response.json()
+
+    response = client.get("/api/v1/db/pool", headers=user_token_headers)
+    assert response.status_code == 403
+
+
+def test_response_cache_stats(client, test_topic, superuser_token_headers):
+    """
+    test_response_cache_stats レスポンスキャッシュのヒット数とミス数を取得できるかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        test_topic (Any): テスト用お題
+        superuser_token_headers (Any): テスト用管理者ユーザーの認証用JWTトークンヘッダー
+    """
+    client.get("/api/v1/topics")
+    client.get("/api/v1/topics")
+
+    response = client.get("/api/v1/cache", headers=superuser_token_headers)
+    assert response.status_code == 200
+    assert response.json()["backend"] == config.RESPONSE_CACHE_BACKEND
+    assert response.json()["hits"] == 1
+    assert response.json()["misses"] == 1
+
+
+def test_example_task_is_queued(client, monkeypatch):
+    """
+    test_example_task_is_queued サンプルタスクが送信待ちキューに積まれ、
+    上限に達したら 503 を返すかのテスト
+
+    Args:
+        client (Any): HTTPクライアント
+        monkeypatch (Any): 送信待ちキューを差し替える。
+    """
+    sent = []
+    outbox = task_outbox.TaskOutbox(maxsize=1, batch_size=10, publish=sent.extend)
+    monkeypatch.setattr(task_outbox, "_outbox", outbox)
+
+    response = client.get("/api/v1/task")
+    assert response.status_code == 200
+    assert outbox.flush(timeout=5)
+    assert [message.name for message in sent] == ["app.tasks.example_task"]
+
+    outbox.maxsize = 0
+    response = client.get("/api/v1/task")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    outbox.close()
@@ -0,0 +1,122 @@
+from app.core import security
+from app.core.metrics import (
+    PASSWORD_VERIFY_SECONDS,
+    REGISTRY,
+    Counter,
+    Histogram,
+    Registry,
+    observe_request,
+)
+
+
+def test_registry_renders_prometheus_text():
+    """
+    test_registry_renders_prometheus_text メトリクスを Prometheus のテキスト形式で出すかのテスト
+    """
+    registry = Registry()
+    sent = Counter("sent", "Sent messages.", registry=registry)
+    latency = Histogram(
+        "latency_seconds",
+        "Latency.",
+        ("route",),
+        buckets=(0.1, 1.0),
+        registry=registry,
+    )
+    registry.add_collector(lambda: [("queue_size", "Queue size.", 3)])
+
+    sent.inc()
+    sent.inc(2)
+    latency.labels('/a"b').observe(0.05)
+    latency.labels('/a"b').observe(0.5)
+    latency.labels('/a"b').observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP sent_total Sent messages.",
+        "# TYPE sent_total counter",
+        "sent_total 3",
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a\\"b",le="1"} 2',
+        'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a\\"b"} 5.55',
+        'latency_seconds_count{route="/a\\"b"} 3',
+        "# HELP queue_size Queue size.",
+        "# TYPE queue_size gauge",
+        "queue_size 3",
+    ]
+
+
+def test_counter_collector_renders_total():
+    """
+    test_counter_collector_renders_total 増えるだけの値を counter として _total を付けて出すかのテスト
+    """
+    registry = Registry()
+    registry.add_collector(lambda: [("cache_hits", "Cache hits.", 5)], "counter")
+    assert registry.render().splitlines() == [
+        "# HELP cache_hits_total Cache hits.",
+        "# TYPE cache_hits_total counter",
+        "cache_hits_total 5",
+    ]
+
+
+def test_unknown_method_is_labelled_other():
+    """
+    test_unknown_method_is_labelled_other 知らないメソッドを OTHER にまとめるかのテスト
+    """
+    observe_request({"method": "BREW"}, 405, 0.01)
+    body = REGISTRY.render()
+    assert 'method="BREW"' not in body
+    assert (
+        'odaikun_http_request_duration_seconds_count{method="OTHER",route="unmatched",'
+        'status="4xx"}' in body
+    )
+
+
+def test_failing_collector_is_skipped():
+    """
+    test_failing_collector_is_skipped 例外を投げた collector を飛ばして出力するかのテスト
+    """
+    registry = Registry()
+
+    def broken():
+        raise ConnectionError("redis is down")
+
+    registry.add_collector(broken)
+    registry.add_collector(lambda: [("up", "Up.", 1)])
+    assert registry.render().endswith("up 1\n")
+
+
+def test_verify_password_is_timed():
+    """
+    test_verify_password_is_timed パスワードの検証時間を記録するかのテスト
+    """
+    hashed = security.get_password_hash("secret")
+    before = sum(PASSWORD_VERIFY_SECONDS._default.counts)
+    assert security.verify_password("secret", hashed)
+    assert sum(PASSWORD_VERIFY_SECONDS._default.counts) == before + 1
+
+
+def test_metrics_endpoint(client, test_topic):
+    """
+    test_metrics_endpoint /api/metrics でルートごとの所要時間とプールの状態が取れるかのテスト
+
+    Args:
+        client (Any): テスト用クライアント
+        test_topic (Any): テスト用お題
+    """
+    client.get(f"/api/v1/topics/{test_topic.id}")
+    client.get("/api/v1/topics/0")
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    labels = 'method="GET",route="/api/v1/topics/{topic_id}"'
+    assert f'odaikun_http_request_duration_seconds_count{{{labels},status="2xx"}}' in (
+        body
+    )
+    assert f'odaikun_http_request_duration_seconds_count{{{labels},status="4xx"}}' in (
+        body
+    )
+    assert "odaikun_db_pool_" in body
+    assert "# TYPE odaikun_db_pool_checkouts_total counter" in body
@@ -0,0 +1,60 @@
+from app.benchmarks.micro import Result, compare, environment_mismatches, measure
+
+
+def test_measure_runs_at_least_min_time():
+    """
+    test_measure_runs_at_least_min_time 1ラウンドが min_time 以上になる回数で測るかのテスト
+    """
+    calls = []
+    result = measure("append", lambda: calls.append(1), rounds=3, min_time=0.001)
+    assert result.rounds == 3
+    assert result.loops > 1
+    assert len(calls) >= result.loops * 3
+    assert 0 < result.min_us <= result.median_us
+
+
+def test_compare_reports_regressions_only():
+    """
+    test_compare_reports_regressions_only 許容を超えて遅くなったものだけを報告するかのテスト
+    """
+    stored = {
+        "results": {
+            "fast": {"median_us": 10.0},
+            "slow": {"median_us": 10.0},
+            "faster": {"median_us": 10.0},
+        }
+    }
+    results = [
+        Result("fast", 1, 1, 11.0, 11.5),
+        Result("slow", 1, 1, 12.0, 13.0),
+        Result("faster", 1, 1, 5.0, 5.0),
+        Result("new", 1, 1, 100.0, 100.0),
+    ]
+    regressions = compare(results, stored, max_regression=20.0)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow: 10.0 us -> 13.0 us (+30.0%")
+
+
+def test_compare_skips_zero_baseline():
+    """
+    test_compare_skips_zero_baseline 保存した中央値が 0 のものを比べずに飛ばすかのテスト
+    """
+    stored = {"results": {"noop": {"median_us": 0.0}}}
+    assert compare([Result("noop", 1, 1, 0.1, 0.1)], stored, max_regression=20.0) == []
+
+
+def test_environment_mismatches():
+    """
+    test_environment_mismatches DB の種類か Python のマイナーバージョンが違う結果を比べないかのテスト
+    """
+    stored = {"python": "3.9.18", "database": "sqlite"}
+    assert (
+        environment_mismatches(stored, {"python": "3.9.2", "database": "sqlite"}) == []
+    )
+
+    mismatches = environment_mismatches(
+        stored, {"python": "3.10.1", "database": "postgresql"}
+    )
+    assert len(mismatches) == 2
+    assert mismatches[0].startswith("database: sqlite (stored) != postgresql")
+    assert mismatches[1].startswith("python: 3.9.18 (stored) != 3.10.1")
@@ -0,0 +1,52 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import content_range, parse_filter, parse_range, parse_sort
+from app.db.crud.user_crud import count_users, estimate_user_count
+
+
+def test_parse_list_params():
+    """
+    test_parse_list_params react-admin の range・sort・filter を解釈できるかのテスト
+    """
+    assert parse_range(None, 5, 10) == (5, 10)
+    assert parse_range("[10, 19]", 0, 100) == (10, 10)
+    assert parse_sort(None, "id") == ("id", False)
+    assert parse_sort('["email", "DESC"]', "id") == ("email", True)
+    assert parse_sort("-email", "id") == ("email", True)
+    assert parse_filter('{"q": "a"}') == {"q": "a"}
+    for parse, value in (
+        (lambda v: parse_range(v, 0, 10), "[5, 1]"),
+        (lambda v: parse_sort(v, "id"), '["email", "UP"]'),
+        (parse_filter, "[1]"),
+    ):
+        with pytest.raises(HTTPException):
+            parse(value)
+
+
+def test_content_range():
+    """
+    test_content_range Content-Range ヘッダーの値が正しいかのテスト
+    """
+    assert content_range("users", 0, 10, 25) == "users 0-9/25"
+    assert content_range("users", 20, 5, 25) == "users 20-24/25"
+    assert content_range("users", 30, 0, 25) == "users */25"
+
+
+def test_count_users(test_db, test_user, test_superuser):
+    """
+    test_count_users 件数を数えられ、見積もりは閾値以上のときだけ使うかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+        test_superuser (Any): テスト用管理者
+    """
+    assert count_users(test_db, estimate_threshold=0) == 2
+    assert count_users(test_db, {"is_superuser": True}, estimate_threshold=1) == 1
+
+    estimate = estimate_user_count(test_db)
+    if estimate is not None and estimate >= 1:
+        assert count_users(test_db, estimate_threshold=1) == estimate
+    else:
+        assert count_users(test_db, estimate_threshold=1) == 2
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+import redis
+
+from app.core import config
+from app.core.response_cache import (
+    CachedResponse,
+    MemoryBackend,
+    RedisBackend,
+    ResponseCache,
+)
+
+
+def test_cached_response_pack():
+    """
+    test_cached_response_pack Redis に保存する形式から元に戻せるかのテスト
+    """
+    cached = CachedResponse(b'[{"topic":"\\n"}]', {"X-Next-Cursor": "abc"})
+    assert CachedResponse.unpack(cached.pack()) == cached
+
+
+def test_memory_backend_invalidates_by_tag():
+    """
+    test_memory_backend_invalidates_by_tag タグの付いたレスポンスだけが捨てられるかのテスト
+    """
+    backend = MemoryBackend(maxsize=10, ttl=60)
+    backend.set("list", CachedResponse(b"[]", {}), ["topics"])
+    backend.set("detail", CachedResponse(b"{}", {}), ["topics", "topic:1"])
+    backend.set("other", CachedResponse(b"{}", {}), ["topic:2"])
+
+    backend.invalidate(["topic:1"])
+    assert backend.get("detail") is None
+    assert backend.get("list") is not None
+
+    backend.invalidate(["topics"])
+    assert backend.get("list") is None
+    assert backend.get("other") is not None
+
+
+def test_redis_backend_invalidates_by_tag():
+    """
+    test_redis_backend_invalidates_by_tag Redis バックエンドでタグの付いたレスポンスが捨てられるかのテスト
+
+    Redis に繋がらない環境ではスキップする。
+    """
+    backend = RedisBackend(config.REDIS_URL, ttl=60, prefix="odaikun:test-cache:")
+    try:
+        backend._client.ping()
+    except redis.RedisError:
+        pytest.skip("Redis is not available")
+    try:
+        backend.set("list", CachedResponse(b"[]", {"X-Next-Cursor": "a"}), ["topics"])
+        backend.set("other", CachedResponse(b"{}", {}), ["topic:2"])
+        assert backend.get("list") == CachedResponse(b"[]", {"X-Next-Cursor": "a"})
+
+        backend.invalidate(["topics"])
+        assert backend.get("list") is None
+        assert backend.get("other") is not None
+    finally:
+        backend.clear()
+
+
+def test_fill_after_invalidation_is_not_stored():
+    """
+    test_fill_after_invalidation_is_not_stored 作っている間に無効化されたレスポンスを保存しないかのテスト
+    """
+    cache = ResponseCache(MemoryBackend(maxsize=10, ttl=60))
+    generation = cache.generation
+    cache.invalidate("topics")
+    cache.set("list", CachedResponse(b"[]", {}), ["topics"], generation)
+    assert cache.get("list") is None
+
+    cache.set("list", CachedResponse(b"[]", {}), ["topics"], cache.generation)
+    assert cache.get("list") is not None
+
+
+def test_blocking_backend_runs_in_thread():
+    """
+    test_blocking_backend_runs_in_thread I/Oで待つバックエンドをイベントループの外で呼ぶかのテスト
+    """
+
+    class RecordingBackend(MemoryBackend):
+        blocking = True
+
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+    threads: list = []
+    cache = ResponseCache(RecordingBackend(maxsize=10, ttl=60))
+    asyncio.run(cache.set_async("list", CachedResponse(b"[]", {}), ["topics"]))
+    assert asyncio.run(cache.get_async("list")) is not None
+    assert threads != [threading.main_thread()]
+
+
+def test_invalidate_async_runs_blocking_backend_in_thread():
+    """
+    test_invalidate_async_runs_blocking_backend_in_thread
+    I/Oで待つバックエンドの無効化をイベントループの外で呼び、generation はすぐ進めるかのテスト
+    """
+
+    class RecordingBackend(MemoryBackend):
+        blocking = True
+
+        def invalidate(self, tags):
+            threads.append(threading.current_thread())
+            super().invalidate(tags)
+
+    threads: list = []
+    cache = ResponseCache(RecordingBackend(maxsize=10, ttl=60))
+    cache.set("list", CachedResponse(b"[]", {}), ["topics"])
+    generation = cache.generation
+    asyncio.run(cache.invalidate_async("topics"))
+    assert cache.generation == generation + 1
+    assert cache.get("list") is None
+    assert threads and threads != [threading.main_thread()]
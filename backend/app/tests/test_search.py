@@ -0,0 +1,51 @@
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models, search
+from app.db.session import Base
+
+
+def test_ngram_index():
+    """
+    test_ngram_index n-gram 索引の追加・検索・削除のテスト
+    """
+    index = search.NgramIndex()
+    index.add(1, "今日のお題")
+    index.add(2, "今日のお題は猫")
+    index.add(3, "昨日のお題", is_visible=False)
+
+    assert [topic_id for topic_id, _ in index.search("のお題")] == [1, 2]
+    assert [topic_id for topic_id, _ in index.search("のお題", True)] == [3, 1, 2]
+    assert [topic_id for topic_id, _ in index.search("猫")] == [2]
+
+    index.remove(1)
+    assert [topic_id for topic_id, _ in index.search("今日")] == [2]
+    assert len(index) == 2
+
+
+def test_search_topics_fallback(monkeypatch):
+    """
+    test_search_topics_fallback SQLite で n-gram 索引を使って検索するテスト
+    """
+    monkeypatch.setattr(search, "_fallback_index", None)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        [
+            models.Topic(topic="山の景色", post_date=date(2020, 1, 1), is_visible=True),
+            models.Topic(topic="海の景色", post_date=date(2020, 1, 2), is_visible=True),
+        ]
+    )
+    db.commit()
+
+    assert [t.topic for t in search.search_topics(db, "景色")] == ["海の景色", "山の景色"]
+
+    topic = models.Topic(topic="景色", post_date=date(2020, 1, 3), is_visible=True)
+    db.add(topic)
+    db.commit()
+    search.index_topic(db, topic)
+    assert [t.topic for t in search.search_topics(db, "景色", limit=1)] == ["景色"]
+    db.close()
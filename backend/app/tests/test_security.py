@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from app.core import security
+
+
+def test_verify_password_async_runs_off_event_loop(monkeypatch):
+    """
+    test_verify_password_async_runs_off_event_loop
+    パスワードの照合がイベントループ以外のスレッドで行われるかのテスト
+
+    Args:
+        monkeypatch (Any): 照合した時のスレッド名を記録する。
+    """
+    threads = []
+
+    def verify_password_mock(first: str, second: str) -> bool:
+        threads.append(threading.current_thread().name)
+        return first == second
+
+    monkeypatch.setattr(security, "verify_password", verify_password_mock)
+
+    assert asyncio.run(security.verify_password_async("a", "a"))
+    assert not asyncio.run(security.verify_password_async("a", "b"))
+    assert all(name.startswith("bcrypt") for name in threads)
+
+
+def test_get_password_hash_async():
+    """
+    test_get_password_hash_async スレッドプールで計算したハッシュが照合できるかのテスト
+    """
+    hashed = asyncio.run(security.get_password_hash_async("password"))
+    assert security.verify_password("password", hashed)
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from app.benchmarks.import_time import DEFAULT_FORBIDDEN, parse_importtime, run
+
+#: app.main の import にかける時間の予算（ミリ秒）。測った中央値は約 265 ms。
+#: 時間はマシンや同時に動いているサービスで大きく変わるので、設定したときだけ調べる。
+#: 手元では IMPORT_TIME_BUDGET_MS=350 pytest app/tests/test_startup.py のように使う。
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "0"))
+
+
+def test_parse_importtime():
+    """
+    test_parse_importtime -X importtime の出力から累積時間と自身の時間を読むかのテスト
+    """
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   json.decoder",
+            "import time:      1500 |       2500 | app.main",
+        ]
+    )
+    total, self_ms = parse_importtime(output, "app.main")
+    assert total == 2.5
+    assert self_ms == {"json.decoder": 0.12, "app.main": 1.5}
+
+
+def test_app_main_import_skips_heavy_modules():
+    """
+    test_app_main_import_skips_heavy_modules app.main の import で Celery やDBドライバーなどを読み込まないかのテスト
+    """
+    assert run("app.main", 1, 0, DEFAULT_FORBIDDEN, top=0) == []
+
+
+@pytest.mark.skipif(
+    not IMPORT_TIME_BUDGET_MS, reason="IMPORT_TIME_BUDGET_MS is not set"
+)
+def test_app_main_import_is_within_budget():
+    """
+    test_app_main_import_is_within_budget app.main の import が予算内で終わるかのテスト
+    """
+    assert run("app.main", 3, IMPORT_TIME_BUDGET_MS, (), top=0) == []
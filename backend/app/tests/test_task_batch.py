@@ -0,0 +1,64 @@
+import importlib
+
+from app import tasks
+from app.core import celery_config, config
+from app.core.celery_app import celery_app
+from app.core.task_batch import chunked, send_batched
+
+
+def test_chunked():
+    """
+    test_chunked 指定した件数ずつに分けられるかのテスト
+    """
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+
+def test_run_batch():
+    """
+    test_run_batch まとめた呼び出しを実行し、失敗した呼び出しを飛ばせるかのテスト
+    """
+    result = tasks.run_batch("app.tasks.example_task", [["a"], ["b", "extra"], ["c"]])
+    assert result["done"] == 2
+    assert [index for index, _ in result["failed"]] == [1]
+
+
+def test_send_batched(monkeypatch):
+    """
+    test_send_batched 指定した件数ずつ1通のメッセージにまとめて送れるかのテスト
+    """
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    argsets = [(str(i),) for i in range(5)]
+    task_ids = send_batched("app.tasks.example_task", argsets, batch_size=2)
+    assert len(task_ids) == 3
+
+
+def test_task_routes():
+    """
+    test_task_routes CPU を使うタスクと I/O 待ちのタスクが別のキューに振り分けられるかのテスト
+    """
+
+    def queue_of(name):
+        return celery_app.amqp.router.route({}, name)["queue"].name
+
+    assert queue_of("app.tasks.export_topics_task") == celery_config.CPU_QUEUE
+    assert queue_of("app.tasks.rebuild_search_index_task") == celery_config.IO_QUEUE
+    assert queue_of("app.tasks.example_task") == celery_config.DEFAULT_QUEUE
+
+
+def test_warm_up_is_scheduled_only_with_redis_cache(monkeypatch):
+    """
+    test_warm_up_is_scheduled_only_with_redis_cache
+    レスポンスキャッシュが Redis のときだけ温めるタスクを beat に登録するかのテスト
+
+    Args:
+        monkeypatch (Any): キャッシュのバックエンドを書き換える。
+    """
+    try:
+        monkeypatch.setattr(config, "RESPONSE_CACHE_BACKEND", "memory")
+        assert "warm-topic-cache" not in importlib.reload(celery_config).beat_schedule
+        monkeypatch.setattr(config, "RESPONSE_CACHE_BACKEND", "redis")
+        assert "warm-topic-cache" in importlib.reload(celery_config).beat_schedule
+    finally:
+        monkeypatch.undo()
+        importlib.reload(celery_config)
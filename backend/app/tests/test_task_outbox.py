@@ -0,0 +1,166 @@
+import threading
+from typing import List
+
+import pytest
+
+from app.core.task_outbox import OutboxFull, PublishError, TaskOutbox
+
+
+class FakeBroker:
+    """
+    FakeBroker 送られたタスクを記録する。指定した回数だけ送信に失敗する。
+
+    Args:
+        failures (int, optional): 失敗させる回数。初期値は 0。
+    """
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches: List[list] = []
+
+    def publish(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker is down")
+        self.batches.append([message.args[0] for message in messages])
+
+
+def test_enqueue_and_flush():
+    """
+    test_enqueue_and_flush 積んだタスクがまとめて順番どおりに送られるかのテスト
+    """
+    broker = FakeBroker()
+    outbox = TaskOutbox(maxsize=100, batch_size=3, publish=broker.publish)
+    task_ids = [outbox.enqueue("app.tasks.example_task", args=[i]) for i in range(7)]
+
+    assert outbox.flush(timeout=5)
+    assert len(set(task_ids)) == 7
+    assert [i for batch in broker.batches for i in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in broker.batches)
+    assert outbox.stats()["sent"] == 7
+    outbox.close()
+
+
+def test_enqueue_rejects_when_full():
+    """
+    test_enqueue_rejects_when_full 送信待ちが上限に達したら拒否するかのテスト
+    """
+    release = threading.Event()
+    outbox = TaskOutbox(
+        maxsize=2, batch_size=1, publish=lambda messages: release.wait(5)
+    )
+    accepted = 0
+    with pytest.raises(OutboxFull):
+        for i in range(10):
+            outbox.enqueue("app.tasks.example_task", args=[i])
+            accepted += 1
+    assert 2 <= accepted <= 3
+    assert outbox.stats()["rejected"] == 1
+
+    release.set()
+    assert outbox.flush(timeout=5)
+    outbox.close()
+
+
+def test_failed_publish_is_retried():
+    """
+    test_failed_publish_is_retried 送信に失敗したタスクが順番を保って送り直されるかのテスト
+    """
+    broker = FakeBroker(failures=2)
+    outbox = TaskOutbox(
+        maxsize=100, batch_size=10, publish=broker.publish, retry_interval=0.1
+    )
+    for i in range(3):
+        outbox.enqueue("app.tasks.example_task", args=[i])
+
+    assert outbox.flush(timeout=5)
+    assert broker.batches[0][0] == 0
+    assert [i for batch in broker.batches for i in batch] == [0, 1, 2]
+    assert outbox.stats()["failures"] == 2
+    outbox.close()
+
+
+def test_partially_sent_batch_is_not_sent_twice():
+    """
+    test_partially_sent_batch_is_not_sent_twice 途中で失敗したバッチのうち送れたタスクを送り直さないかのテスト
+    """
+    sent: List[int] = []
+    failed = []
+
+    def publish(messages):
+        for count, message in enumerate(messages):
+            if message.args[0] == 2 and not failed:
+                failed.append(message)
+                raise PublishError(count)
+            sent.append(message.args[0])
+
+    outbox = TaskOutbox(maxsize=100, batch_size=10, publish=publish, retry_interval=0.1)
+    for i in range(5):
+        outbox.enqueue("app.tasks.example_task", args=[i])
+
+    assert outbox.flush(timeout=5)
+    assert sent == [0, 1, 2, 3, 4]
+    assert outbox.stats()["sent"] == 5
+    outbox.close()
+
+
+def test_poison_task_is_dropped():
+    """
+    test_poison_task_is_dropped 送り直しても成功しないタスクを捨てて後ろのタスクを送るかのテスト
+    """
+    sent: List[int] = []
+
+    def publish(messages):
+        for count, message in enumerate(messages):
+            if message.args[0] == 1:
+                raise PublishError(count, permanent=True)
+            sent.append(message.args[0])
+
+    outbox = TaskOutbox(maxsize=100, batch_size=10, publish=publish, retry_interval=0.1)
+    for i in range(3):
+        outbox.enqueue("app.tasks.example_task", args=[i])
+
+    assert outbox.flush(timeout=5)
+    assert sent == [0, 2]
+    assert outbox.stats()["dropped"] == 1
+    outbox.close()
+
+
+def test_task_is_dropped_after_max_attempts():
+    """
+    test_task_is_dropped_after_max_attempts 失敗し続けるタスクを max_attempts 回で諦めるかのテスト
+    """
+    sent: List[int] = []
+
+    def publish(messages):
+        for count, message in enumerate(messages):
+            if message.args[0] == 0:
+                raise ConnectionError("broker is down")
+            sent.append(message.args[0])
+
+    outbox = TaskOutbox(
+        maxsize=100,
+        batch_size=10,
+        publish=publish,
+        retry_interval=0.01,
+        max_attempts=3,
+    )
+    for i in range(2):
+        outbox.enqueue("app.tasks.example_task", args=[i])
+
+    assert outbox.flush(timeout=5)
+    assert sent == [1]
+    assert outbox.stats()["failures"] == 3
+    assert outbox.stats()["dropped"] == 1
+    outbox.close()
+
+
+def test_close_rejects_new_tasks():
+    """
+    test_close_rejects_new_tasks close 後は新しいタスクを受け付けないかのテスト
+    """
+    outbox = TaskOutbox(maxsize=10, batch_size=10, publish=FakeBroker().publish)
+    outbox.close()
+
+    with pytest.raises(RuntimeError):
+        outbox.enqueue("app.tasks.example_task")
@@ -1,4 +1,14 @@
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
 from app import tasks
+from app.core import config, response_cache
+from app.db import models
 
 
 def test_example_task():
@@ -7,3 +17,123 @@ def test_example_task():
     """
     task_output = tasks.example_task("Hello World")
     assert task_output == "test task returns Hello World"
+
+
+@pytest.fixture
+def task_db(test_db, monkeypatch, tmp_path):
+    """
+    task_db タスクがテスト用DBとテスト用の一時ディレクトリを使うようにする
+
+    Args:
+        test_db (Any): テスト用DB接続
+        monkeypatch (Any): モンキーパッチ
+        tmp_path (Any): 一時ディレクトリ
+
+    Returns:
+        Any: テスト用DB接続
+    """
+
+    @contextmanager
+    def task_session():
+        yield test_db
+
+    monkeypatch.setattr(tasks, "task_session", task_session)
+    monkeypatch.setattr(config, "TASK_FILE_DIR", str(tmp_path))
+    return test_db
+
+
+def test_import_topics_task(task_db, test_user):
+    """
+    test_import_topics_task ファイルからお題を登録し、ファイルを消すかのテスト
+
+    Args:
+        task_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+    """
+    path = tasks.task_file_path("imports", "upload.ndjson")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"topic": "a"}\n{"topic": ""}\n{"bad"\n')
+
+    result = tasks.import_topics_task(path, "ndjson", test_user.id, 100)
+
+    assert result["inserted"] == 2
+    assert [error["line"] for error in result["errors"]] == [3]
+    assert not os.path.exists(path)
+
+
+def test_export_topics_task(task_db, test_user):
+    """
+    test_export_topics_task 全てのお題をファイルに書き出すかのテスト
+
+    Args:
+        task_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+    """
+    task_db.add(
+        models.Topic(
+            topic="お題", post_date=date(2020, 1, 1), contributor_id=test_user.id
+        )
+    )
+    task_db.commit()
+
+    result = tasks.export_topics_task.apply(
+        kwargs={"compress": True}, task_id="export-1"
+    ).get()
+
+    assert result["file"] == "export-1.ndjson.gz"
+    with open(tasks.task_file_path("exports", result["file"]), "rb") as file:
+        content = file.read()
+    assert result["bytes"] == len(content)
+    assert json.loads(gzip.decompress(content))["topic"] == "お題"
+
+
+def test_rebuild_search_index_task(task_db):
+    """
+    test_rebuild_search_index_task 索引の作り直しが失敗しないかのテスト
+
+    Args:
+        task_db (Any): テスト用DB接続
+    """
+    assert "reindexed" in tasks.rebuild_search_index_task()
+
+
+def test_warm_topic_cache_task(task_db, test_user, monkeypatch):
+    """
+    test_warm_topic_cache_task お題一覧と詳細がキャッシュに入るかのテスト
+
+    Args:
+        task_db (Any): テスト用DB接続
+        test_user (Any): テスト用ユーザー
+        monkeypatch (Any): モンキーパッチ
+    """
+    for day in (1, 2):
+        task_db.add(
+            models.Topic(
+                topic=f"お題{day}",
+                post_date=date(2020, 1, day),
+                is_visible=True,
+                contributor_id=test_user.id,
+            )
+        )
+    task_db.commit()
+    monkeypatch.setattr(config, "RESPONSE_CACHE_BACKEND", "redis")
+    monkeypatch.setattr(
+        response_cache,
+        "_cache",
+        response_cache.ResponseCache(response_cache.MemoryBackend(10, 60)),
+    )
+
+    assert tasks.warm_topic_cache_task() == {"warmed": 3}
+    assert tasks.warm_topic_cache_task() == {"warmed": 0}
+
+
+def test_select_daily_topics_task(task_db, test_topic):
+    """
+    test_select_daily_topics_task 指定した日の採用お題を選べるかのテスト
+
+    Args:
+        task_db (Any): タスクが使うテスト用DB接続
+        test_topic (Any): テスト用お題
+    """
+    result = tasks.select_daily_topics_task("2021-01-01")
+    assert result == {"day": "2021-01-01", "topics": [test_topic.id]}
@@ -0,0 +1,71 @@
+import time
+
+from app.core import config, token_cache
+from app.db import models
+
+
+def _user(user_id: int) -> models.User:
+    return models.User(id=user_id, email=f"user{user_id}@example.com")
+
+
+def test_invalidate_user_drops_cached_tokens():
+    """
+    test_invalidate_user_drops_cached_tokens 無効化する前にキャッシュしたトークンを使わないかのテスト
+    """
+    token_cache.clear()
+    generation = token_cache.current_generation()
+    token_cache.cache_user("a", {}, _user(1), generation)
+    token_cache.cache_user("b", {}, _user(2), generation)
+    assert token_cache.get_cached_user("a").email == "user1@example.com"
+
+    token_cache.invalidate_user(1)
+    assert token_cache.get_cached_user("a") is None
+    assert token_cache.get_cached_user("b") is not None
+
+    token_cache.cache_user("a", {}, _user(1), token_cache.current_generation())
+    assert token_cache.get_cached_user("a") is not None
+
+
+def test_user_read_before_invalidation_is_not_cached():
+    """
+    test_user_read_before_invalidation_is_not_cached
+    読んでいる間に無効化されたユーザーをキャッシュし直さないかのテスト
+    """
+    token_cache.clear()
+    generation = token_cache.current_generation()
+    token_cache.invalidate_user(1)
+    token_cache.cache_user("a", {}, _user(1), generation)
+    assert token_cache.get_cached_user("a") is None
+
+
+def test_cached_user_expires_after_ttl(monkeypatch):
+    """
+    test_cached_user_expires_after_ttl
+    他のプロセスでの無効化が届かなくても、AUTH_CACHE_TTL を過ぎれば使わなくなるかのテスト
+
+    Args:
+        monkeypatch (Any): AUTH_CACHE_TTL を短くする。
+    """
+    token_cache.clear()
+    monkeypatch.setattr(config, "AUTH_CACHE_TTL", 0.05)
+    token_cache.cache_user("a", {}, _user(1), token_cache.current_generation())
+    assert token_cache.get_cached_user("a") is not None
+    time.sleep(0.06)
+    assert token_cache.get_cached_user("a") is None
+
+
+def test_invalidation_records_are_bounded_by_ttl(monkeypatch):
+    """
+    test_invalidation_records_are_bounded_by_ttl
+    無効化の記録が AUTH_CACHE_TTL を過ぎたら捨てられるかのテスト
+
+    Args:
+        monkeypatch (Any): AUTH_CACHE_TTL を短くする。
+    """
+    token_cache.clear()
+    monkeypatch.setattr(config, "AUTH_CACHE_TTL", 0.05)
+    for user_id in range(100):
+        token_cache.invalidate_user(user_id)
+    time.sleep(0.06)
+    token_cache.invalidate_user(100)
+    assert list(token_cache._invalidated) == [100]
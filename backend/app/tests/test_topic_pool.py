@@ -0,0 +1,117 @@
+import random
+from datetime import date
+
+from app.core import config
+from app.db import topic_pool
+from app.db.topic_pool import IndexedSet, TopicPool
+
+
+def test_indexed_set():
+    """
+    test_indexed_set 追加・削除を繰り返しても要素が正しく保たれるかのテスト
+    """
+    items = IndexedSet()
+    for item in range(10):
+        items.add(item)
+    for item in (0, 9, 4):
+        items.discard(item)
+    items.discard(100)
+
+    assert sorted(items) == [1, 2, 3, 5, 6, 7, 8]
+    assert 4 not in items
+    assert items.choice(random.Random(0)) in items
+
+
+def test_topic_pool_draw():
+    """
+    test_topic_pool_draw 条件を指定してお題を引けるかのテスト
+    """
+    pool = TopicPool(random.Random(0))
+    pool.add(1, date(2020, 1, 1), False, 10)
+    pool.add(2, date(2020, 1, 2), True, 10)
+    pool.add(3, date(2020, 1, 3), False, 20)
+
+    assert {pool.draw() for _ in range(100)} == {1, 2, 3}
+    assert pool.draw(adopted=True) == 2
+    assert pool.draw(adopted=False, contributor_id=10) == 1
+    assert pool.draw(since=date(2020, 1, 2), until=date(2020, 1, 2)) == 2
+    assert pool.draw(contributor_id=30) is None
+
+    pool.add(2, date(2020, 1, 2), False, 10)
+    assert pool.draw(adopted=True) is None
+
+    pool.remove(1)
+    pool.remove(2)
+    assert pool.draw(contributor_id=10) is None
+    assert pool.draw(until=date(2020, 1, 2)) is None
+    assert len(pool) == 1
+
+
+def test_topic_pool_load():
+    """
+    test_topic_pool_load 並んでいない行から作ったプールで投稿日の範囲指定が使えるかのテスト
+    """
+    rows = [
+        (3, date(2020, 1, 3), False, 20),
+        (1, date(2020, 1, 1), False, 10),
+        (4, None, False, None),
+        (2, date(2020, 1, 2), True, 10),
+    ]
+    pool = TopicPool.load(rows, random.Random(0))
+
+    assert len(pool) == 4
+    assert pool.draw(adopted=True) == 2
+    assert pool.draw(since=date(2020, 1, 2), until=date(2020, 1, 2)) == 2
+    assert pool.draw(since=date(2020, 1, 3)) == 3
+    assert pool.draw(since=date(2020, 1, 4)) is None
+
+
+def test_rebuild_keeps_concurrent_changes(test_db, test_topic, monkeypatch):
+    """
+    test_rebuild_keeps_concurrent_changes 読み込み直している間の変更が失われないかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+        monkeypatch (Any): 他のテストで読み込まれたプールを捨てる。
+    """
+    monkeypatch.setattr(topic_pool, "_pool", None)
+    monkeypatch.setattr(topic_pool, "_stale", False)
+    load = TopicPool.load
+
+    def load_while_deleting(rows, rng=None):
+        pool = load(rows, rng)
+        test_topic.is_visible = False
+        topic_pool.refresh_topic(test_topic)
+        return pool
+
+    monkeypatch.setattr(TopicPool, "load", load_while_deleting)
+    pool = topic_pool.get_topic_pool(test_db)
+    assert test_topic.id not in pool
+
+    topic_pool.reset_topic_pool()
+    assert topic_pool.get_topic_pool(test_db) is pool
+    topic_pool._rebuild_thread.join()
+    assert topic_pool.get_topic_pool(test_db) is not pool
+
+
+def test_version_change_rebuilds_in_background(test_db, test_topic, monkeypatch):
+    """
+    test_version_change_rebuilds_in_background
+    topic テーブルの更新番号が進んだら、古いプールを返しつつ別のスレッドで読み込み直すかのテスト
+
+    Args:
+        test_db (Any): テスト用DB接続
+        test_topic (Any): テスト用お題
+        monkeypatch (Any): 他のテストで読み込まれたプールを捨てる。
+    """
+    monkeypatch.setattr(topic_pool, "_pool", None)
+    monkeypatch.setattr(topic_pool, "_stale", False)
+    monkeypatch.setattr(config, "TOPIC_POOL_CHECK_INTERVAL", 0)
+    pool = topic_pool.get_topic_pool(test_db)
+    assert topic_pool.get_topic_pool(test_db) is pool
+
+    pool.version -= 1
+    assert topic_pool.get_topic_pool(test_db) is pool
+    topic_pool._rebuild_thread.join()
+    assert topic_pool._pool is not pool
@@ -7,10 +7,9 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import create_database, database_exists, drop_database
 
-from app.core import config, security
+from app.core import config, response_cache, security, token_cache
 from app.db import models
-from app.db.session import Base, get_db
-from app.main import app
+from app.db.session import AsyncSession, Base, get_db, get_streaming_db
 
 
 def get_test_db_url() -> str:
@@ -78,11 +77,20 @@ def client(test_db):
     """
     Get a TestClient instance that reads/write to the test database.
     """
+    # app.main の import は重いので、API を使うテストになってから読み込む
+    from app.main import app
 
     def get_test_db():
         yield test_db
 
-    app.dependency_overrides[get_db] = get_test_db
+    def get_request_test_db():
+        # get_db と同じく、config.DB_ASYNC_MODE に合わせて包む
+        yield AsyncSession(test_db) if config.DB_ASYNC_MODE else test_db
+
+    app.dependency_overrides[get_db] = get_request_test_db
+    app.dependency_overrides[get_streaming_db] = get_test_db
+    token_cache.clear()
+    response_cache.clear()
 
     yield TestClient(app)
 